@@ -0,0 +1,341 @@
+"""
+Offline benchmarks for the pipeline hot paths on synthetic data.
+
+    python -m benchmarks.run_benchmarks                  # quick scales
+    python -m benchmarks.run_benchmarks --scale full     # 10/500/5000 mines, 20-300 steps
+    python -m benchmarks.run_benchmarks --compare outputs/benchmarks/<old>.json
+
+Each case is timed (best of `--repeat` runs) and run once more under
+tracemalloc for peak Python/NumPy allocation (Arrow and GDAL buffers
+are not traced). Results are written as JSON so runs can be diffed;
+`--compare` exits non-zero on regressions.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from rasterio.transform import from_origin
+
+from benchmarks.synthetic import (
+    stack_ndvi, synthetic_metrics, synthetic_mines, synthetic_stack, write_mine_layer
+)
+from src.ingestion.load_mines import load_mine_polygons
+from src.ingestion.sentinel_access import prepare_mine_aois
+from src.processing import sentinel_preprocess as prep
+from src.processing.alert_and_ranking_gee import rank_mines
+from src.processing.compliance_classification_gee import classify_mines
+from src.processing.masks import PackedMaskStack, scl_valid
+from src.processing.parallel import WORKERS
+from src.processing.risk_scoring import RiskRanking, score_mines
+from src.processing.streaming_baseline import StreamingBaseline
+
+# =========================
+# CONFIG
+# =========================
+OUT_DIR = Path("outputs/benchmarks")
+
+SCALES = {
+    "quick": {"mines": [10, 500], "steps": [20, 60], "size": 128},
+    "full": {"mines": [10, 500, 5000], "steps": [20, 100, 300], "size": 256},
+}
+
+REPEAT = 3
+REGRESSION_TOLERANCE = 0.25  # 25 % slower (or larger peak) than the baseline run
+MIN_SECONDS = 0.005          # ignore timing noise below this
+
+
+# =========================
+# MEASUREMENT
+# =========================
+def measure(func, repeat=REPEAT):
+    """
+    Best-of-`repeat` wall time plus peak traced allocation (MB) of
+    one extra run. `func` takes no arguments.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "seconds": min(times),
+        "seconds_all": times,
+        "peak_mb": peak / 2**20,
+    }
+
+
+# =========================
+# CASES
+# =========================
+def mine_cases(n_mines, work_dir):
+    """
+    Mine loading and AOI construction for a synthetic layer.
+    """
+    layer_dir = write_mine_layer(synthetic_mines(n_mines), work_dir / f"mines_{n_mines}")
+    cache_dir = work_dir / f"cache_{n_mines}"
+    mines = load_mine_polygons(layer_dir, cache_dir=None)
+
+    def load_cold():
+        load_mine_polygons(layer_dir, cache_dir=None)
+
+    def load_warm():
+        load_mine_polygons(layer_dir, cache_dir=cache_dir / "mines")
+
+    def load_subset():
+        load_mine_polygons(layer_dir, cache_dir=cache_dir / "mines",
+                           mine_ids=mines["mine_id"].iloc[:10], columns=[])
+
+    load_warm()  # populate the GeoParquet cache
+
+    cases = [
+        ("load_mine_polygons", "uncached", load_cold),
+        ("load_mine_polygons", "cached", load_warm),
+        ("load_mine_polygons", "cached_10_ids", load_subset),
+    ]
+
+    for mode in ("bbox", "polygon"):
+        aoi_cache = cache_dir / f"aoi_{mode}"
+        prepare_mine_aois(mines, cache_dir=aoi_cache, mode=mode)
+        cases += [
+            ("prepare_mine_aois", f"{mode}_uncached",
+             lambda mode=mode: prepare_mine_aois(mines, cache_dir=None, mode=mode)),
+            ("prepare_mine_aois", f"{mode}_cached",
+             lambda mode=mode, c=aoi_cache: prepare_mine_aois(mines, cache_dir=c, mode=mode)),
+        ]
+
+    return [(g, c, {"mines": n_mines}, f) for g, c, f in cases]
+
+
+def preprocess_cases(n_steps, size, work_dir):
+    """
+    Every function in sentinel_preprocess on a (time, size, size) stack.
+    """
+    stack = synthetic_stack(n_steps, size, size)
+    ndvi = stack_ndvi(stack)
+    scl = stack["SCL"]
+    valid = scl_valid(scl)
+
+    masked_ndvi = np.where(valid, ndvi, np.nan).astype(np.float32)
+    scaled = np.where(valid, np.round(ndvi * 10_000), -32768).astype(np.int16)
+
+    packed = PackedMaskStack(work_dir / f"masks_{n_steps}_{size}.bits", (size, size))
+    for mask in valid:
+        packed.append(mask)
+
+    baseline = StreamingBaseline.from_stack(masked_ndvi)
+    streaming = StreamingBaseline.from_stack(masked_ndvi[:-1])
+
+    def ingest_and_normalize():
+        # monitoring step: add the newest scene, re-read the median
+        streaming.update(masked_ndvi[-1])
+        return prep.normalize_scene(masked_ndvi[-1], streaming)
+
+    coarse = stack["B8"][0, ::2, ::2].astype(np.float32)
+    src_transform = from_origin(500_000, 2_000_000, 20, 20)
+    dst_transform = from_origin(500_000, 2_000_000, 10, 10)
+
+    harmonizer = prep.BandHarmonizer((size, size), dst_transform, "EPSG:32644")
+    scene = {"B4": stack["B4"][0], "B8": stack["B8"][0], "B11": coarse,
+             "B12": coarse.copy(), "SCL": scl[0, ::2, ::2]}
+    transforms = {"B4": dst_transform, "B8": dst_transform, "B11": src_transform,
+                  "B12": src_transform, "SCL": src_transform}
+
+    params = {"steps": n_steps, "size": size}
+    cases = [
+        ("apply_cloud_mask", "copy",
+         lambda: prep.apply_cloud_mask(ndvi[0], scl[0])),
+        ("apply_cloud_mask", "inplace",
+         lambda: prep.apply_cloud_mask(ndvi[0].copy(), scl[0], inplace=True)),
+        ("resample_to_10m", "bilinear_20m",
+         lambda: prep.resample_to_10m(coarse, src_transform, "EPSG:32644",
+                                      (size, size), dst_transform)),
+        ("BandHarmonizer", "b11_b12_scl_20m",
+         lambda: harmonizer.harmonize(scene, transforms)),
+        ("temporal_normalization", "in_memory",
+         lambda: prep.temporal_normalization(masked_ndvi)),
+        ("temporal_normalization", "int16_blocked",
+         lambda: prep.temporal_normalization(scaled, nodata=-32768, block_rows=64)),
+        ("normalize_scene", "streaming_baseline",
+         lambda: prep.normalize_scene(masked_ndvi[-1], baseline)),
+        ("normalize_scene", "streaming_update",
+         ingest_and_normalize),
+        ("compute_seasonal_baseline", "month_median",
+         lambda: prep.compute_seasonal_baseline(stack["dates"], masked_ndvi)),
+        ("compute_seasonal_baseline", "season_median",
+         lambda: prep.compute_seasonal_baseline(stack["dates"], masked_ndvi, by="season")),
+        ("build_valid_mask", "bool_stack",
+         lambda: prep.build_valid_mask(valid)),
+        ("build_valid_mask", "packed",
+         lambda: prep.build_valid_mask(packed)),
+    ]
+    return [(g, c, params, f) for g, c, f in cases]
+
+
+def parallel_cases(n_steps, size, n_mines=8):
+    """
+    normalize_mines over `n_mines` int16 stacks, in-process and on a
+    pool of WORKERS processes (spawn start-up included).
+    """
+    stack = synthetic_stack(n_steps, size, size)
+    scaled = np.round(stack_ndvi(stack) * 10_000).astype(np.int16)
+    stacks = {f"MINE_{i:04d}": scaled.copy() for i in range(n_mines)}
+
+    cases = []
+    for workers in sorted({1, 2, WORKERS}):
+        params = {"steps": n_steps, "size": size, "mines": n_mines, "workers": workers}
+        cases.append(("normalize_mines", "int16", params,
+                      lambda w=workers: prep.normalize_mines(stacks, workers=w)))
+    return cases
+
+
+def ranking_cases(n_mines):
+    metrics = synthetic_metrics(n_mines)
+    classified = classify_mines(metrics)
+    ranking = RiskRanking(metrics)
+    updates = synthetic_metrics(n_mines, seed=1).sample(min(n_mines, 100), random_state=0)
+
+    def rescore():
+        for row in updates.itertuples():
+            ranking.update(row.mine_id, row.area_ha, row.severity)
+
+    return [
+        ("classify_mines", "default", {"mines": n_mines},
+         lambda: classify_mines(metrics)),
+        ("rank_mines", "default", {"mines": n_mines},
+         lambda: rank_mines(classified)),
+        ("score_mines", "columnar", {"mines": n_mines},
+         lambda: score_mines(metrics)),
+        ("RiskRanking", "update_100", {"mines": n_mines}, rescore),
+        ("RiskRanking", "top_10_high", {"mines": n_mines},
+         lambda: ranking.top(10, risk="HIGH")),
+    ]
+
+
+def build_cases(scale, work_dir):
+    config = SCALES[scale]
+    cases = []
+    for n_mines in config["mines"]:
+        cases += mine_cases(n_mines, work_dir)
+        cases += ranking_cases(n_mines)
+    for n_steps in config["steps"]:
+        cases += preprocess_cases(n_steps, config["size"], work_dir)
+    cases += parallel_cases(config["steps"][-1], config["size"])
+    return cases
+
+
+# =========================
+# RESULTS
+# =========================
+def case_id(result):
+    params = ",".join(f"{k}={v}" for k, v in sorted(result["params"].items()))
+    return f"{result['group']}/{result['case']}[{params}]"
+
+
+def run_metadata(scale, repeat):
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "scale": scale,
+        "repeat": repeat,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+    }
+
+
+def compare_runs(current, baseline, tolerance=REGRESSION_TOLERANCE):
+    """
+    Cases that got slower or used more memory than `baseline` by more
+    than `tolerance` (relative), as a list of dicts.
+    """
+    previous = {case_id(r): r for r in baseline["results"]}
+    regressions = []
+
+    for r in current["results"]:
+        old = previous.get(case_id(r))
+        if old is None:
+            continue
+        for metric in ("seconds", "peak_mb"):
+            if metric == "seconds" and old[metric] < MIN_SECONDS:
+                continue
+            ratio = r[metric] / old[metric] if old[metric] else 1.0
+            if ratio > 1 + tolerance:
+                regressions.append({"case": case_id(r), "metric": metric,
+                                    "before": old[metric], "after": r[metric],
+                                    "ratio": ratio})
+    return regressions
+
+
+# =========================
+# MAIN
+# =========================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pipeline hot paths")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="quick")
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--only", default=None,
+                        help="run only cases whose id contains this text")
+    parser.add_argument("--out", type=Path, default=None)
+    parser.add_argument("--compare", type=Path, default=None,
+                        help="earlier results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    run = {"meta": run_metadata(args.scale, args.repeat), "results": []}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for group, case, params, func in build_cases(args.scale, Path(tmp)):
+            result = {"group": group, "case": case, "params": params}
+            if args.only and args.only not in case_id(result):
+                continue
+
+            result.update(measure(func, args.repeat))
+            run["results"].append(result)
+            print(f"⏱ {case_id(result):<70} {result['seconds'] * 1000:9.2f} ms "
+                  f"{result['peak_mb']:8.1f} MB")
+
+    out = args.out or OUT_DIR / f"bench_{args.scale}_{datetime.now():%Y%m%d_%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(run, indent=2))
+    print(f"📄 Results written to {out}")
+
+    if args.compare:
+        regressions = compare_runs(run, json.loads(args.compare.read_text()),
+                                   args.tolerance)
+        for r in regressions:
+            print(f"🚨 {r['case']} {r['metric']}: {r['before']:.4g} -> "
+                  f"{r['after']:.4g} (x{r['ratio']:.2f})")
+        if regressions:
+            sys.exit(1)
+        print("✅ No regressions")
+
+    return run
+
+
+if __name__ == "__main__":
+    main()
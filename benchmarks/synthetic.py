@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+from datetime import date, timedelta
+from pathlib import Path
+
+# =========================
+# CONFIG
+# =========================
+# Rough extent of the CILS mines (EPSG:4326)
+MINE_EXTENT = (76.5, 19.6, 83.0, 25.0)
+
+SCL_WEIGHTS = {  # class -> share of pixels per scene
+    4: 0.45, 5: 0.25, 6: 0.05, 7: 0.05,   # valid
+    3: 0.05, 8: 0.06, 9: 0.06, 10: 0.03,  # shadow, cloud, cirrus
+}
+
+
+# =========================
+# MINE LAYERS
+# =========================
+def synthetic_mines(n_mines, seed=0, extent=MINE_EXTENT):
+    """
+    `n_mines` elongated, rotated open-pit-like polygons (EPSG:4326),
+    0.3–4 km long, with the `area` / `perimeter` columns of the CILS layer.
+    """
+    rng = np.random.default_rng(seed)
+
+    cx = rng.uniform(extent[0], extent[2], n_mines)
+    cy = rng.uniform(extent[1], extent[3], n_mines)
+    length = rng.uniform(300, 4000, n_mines) / 111_000  # degrees
+    width = length * rng.uniform(0.15, 0.6, n_mines)
+    angle = rng.uniform(0, np.pi, n_mines)
+
+    # 24-vertex wobbly ellipse per mine
+    theta = np.linspace(0, 2 * np.pi, 24, endpoint=False)
+    wobble = rng.uniform(0.85, 1.15, (n_mines, theta.size))
+    x = (length / 2)[:, None] * np.cos(theta) * wobble
+    y = (width / 2)[:, None] * np.sin(theta) * wobble
+    xr = cx[:, None] + x * np.cos(angle)[:, None] - y * np.sin(angle)[:, None]
+    yr = cy[:, None] + x * np.sin(angle)[:, None] + y * np.cos(angle)[:, None]
+
+    rings = np.stack([xr, yr], axis=-1)
+    geoms = shapely.polygons(np.concatenate([rings, rings[:, :1]], axis=1))
+
+    return gpd.GeoDataFrame(
+        {"area": shapely.area(geoms), "perimeter": shapely.length(geoms)},
+        geometry=geoms,
+        crs="EPSG:4326"
+    )
+
+
+def write_mine_layer(mines, out_dir, name="mines_synthetic"):
+    """
+    Write a layer where `load_mine_polygons` will find it.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    mines.to_file(out_dir / f"{name}.shp")
+    return out_dir
+
+
+# =========================
+# SENTINEL-2 STACKS
+# =========================
+def synthetic_dates(n_steps, start="2022-01-01", revisit_days=5):
+    start = date.fromisoformat(start)
+    return [start + timedelta(days=revisit_days * t) for t in range(n_steps)]
+
+
+def synthetic_stack(n_steps, height=256, width=256, seed=0, mined_fraction=0.2):
+    """
+    Synthetic B4 / B8 reflectance (uint16, scaled by 1e4) and SCL
+    stacks of shape (time, height, width).
+
+    NDVI follows a seasonal cycle; a block of pixels loses vegetation
+    from halfway through the series (the "mine"), and SCL marks a
+    random share of pixels as cloud or shadow per scene.
+    """
+    rng = np.random.default_rng(seed)
+    dates = synthetic_dates(n_steps)
+    doy = np.array([d.timetuple().tm_yday for d in dates], dtype=np.float32)
+
+    season = 0.15 * np.sin(2 * np.pi * (doy - 150) / 365)[:, None, None]
+    ndvi = 0.55 + season + rng.normal(0, 0.03, (n_steps, height, width))
+
+    mined_rows = int(height * mined_fraction)
+    ndvi[n_steps // 2:, :mined_rows, :] -= 0.4
+    ndvi = np.clip(ndvi, -0.2, 0.95).astype(np.float32)
+
+    red = rng.uniform(0.03, 0.12, (n_steps, height, width)).astype(np.float32)
+    nir = red * (1 + ndvi) / (1 - ndvi)
+
+    b4 = np.clip(red * 10_000, 1, 10_000).astype(np.uint16)
+    b8 = np.clip(nir * 10_000, 1, 10_000).astype(np.uint16)
+
+    classes = np.array(list(SCL_WEIGHTS), dtype=np.uint8)
+    weights = np.array(list(SCL_WEIGHTS.values()))
+    scl = rng.choice(classes, size=(n_steps, height, width), p=weights / weights.sum())
+
+    return {"dates": dates, "B4": b4, "B8": b8, "SCL": scl}
+
+
+def stack_ndvi(stack):
+    red = stack["B4"].astype(np.float32)
+    nir = stack["B8"].astype(np.float32)
+    return (nir - red) / (nir + red)
+
+
+# =========================
+# PHASE 4.3 TABLES
+# =========================
+def synthetic_metrics(n_mines, seed=0):
+    """
+    mine_id / area_ha / severity table as produced by Phase 4.3,
+    with ~10 % of mines lacking persistent change (severity None).
+    """
+    rng = np.random.default_rng(seed)
+    severity = rng.normal(-0.06, 0.05, n_mines).astype(object)
+    severity[rng.random(n_mines) < 0.1] = None
+
+    return pd.DataFrame({
+        "mine_id": ["MINE_{:04d}".format(i) for i in range(n_mines)],
+        "area_ha": rng.gamma(1.5, 60, n_mines).round(2),
+        "severity": severity,
+    })
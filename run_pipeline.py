@@ -1,14 +1,182 @@
+import argparse
+from datetime import date, timedelta
+from pathlib import Path
+
+from src import instrumentation
+from src.catalog import config_hash
+from src.pipeline import Phase, file_fingerprint, run_dag
 from src.ingestion.load_mines import load_mine_polygons
-from src.ingestion.sentinel_access import prepare_mine_aois
+from src.ingestion.sentinel_access import (
+    MAX_AOI_VERTICES, aoi_pixel_savings, prepare_mine_aois
+)
+from src.processing import area_severity_ndvi_gee as phase43
+from src.processing import compliance_classification_gee as phase51
+from src.processing.cube_store import CUBE_DIR, META_FILE, RAW_DATA_DIR
+from src.processing.incremental_monitoring import INDEX_FILE, STATE_DIR
+from src.processing.alert_and_ranking_gee import rank_mines
+from src.reporting.final_results_table import (
+    OUT_DIR, build_final_table, write_final_table
+)
+from src.reporting.history_store import append_run
+
+# =========================
+# CONFIG
+# =========================
+MINES_DIR = Path("data/vectors/CILS_mines_polygon")
+
+CONFIG = {
+    "mines_dir": str(MINES_DIR),
+    "buffer_m": 500,
+    "aoi_mode": "bbox",
+    "max_vertices": MAX_AOI_VERTICES,
+    "max_mines": phase43.MAX_MINES,
+    "backend": phase43.BACKEND,
+    "start_date": phase43.START_DATE,
+    "end_date": phase43.END_DATE,
+    "max_cloud": phase43.MAX_CLOUD,
+    "ndvi_drop_threshold": phase43.NDVI_DROP_THRESHOLD,
+    "min_persistence": phase43.MIN_PERSISTENCE,
+    "compact": False,  # int16 NDVI and change maps on the local backend
+    "area_high": phase51.AREA_HIGH,
+    "area_med": phase51.AREA_MED,
+    "severity_high": phase51.SEVERITY_HIGH,
+    "severity_med": phase51.SEVERITY_MED,
+}
+
+
+# =========================
+# PHASES
+# =========================
+def load_mines(config):
+    return load_mine_polygons(config["mines_dir"])
+
+
+def build_aois(config, mines):
+    aois = prepare_mine_aois(mines, buffer_m=config["buffer_m"],
+                             mode=config["aoi_mode"],
+                             max_vertices=config["max_vertices"])
+    if config["max_mines"]:
+        aois = aois.head(config["max_mines"])
+
+    if config["aoi_mode"] == "polygon":
+        report = aoi_pixel_savings(mines[mines["mine_id"].isin(aois["mine_id"])],
+                                   buffer_m=config["buffer_m"],
+                                   max_vertices=config["max_vertices"])
+        saved = report["saved_pixels"].sum() / report["bbox_pixels"].sum()
+        print(f"📐 Polygon AOIs: {saved:.1%} fewer pixels than bbox mode")
+    return aois
+
+
+def area_severity(config, aois):
+    return phase43.compute_area_severity(
+        aois,
+        backend=config["backend"],
+        start_date=config["start_date"],
+        end_date=config["end_date"],
+        max_cloud=config["max_cloud"],
+        threshold=config["ndvi_drop_threshold"],
+        min_persistence=config["min_persistence"],
+        compact=config["compact"],
+    )
+
+
+def scene_sources(config, aois):
+    """
+    Files the local backends read for the selected mines: downloaded
+    scenes and their masks, the cube date index and the monitoring
+    state index. Earth Engine reads nothing local.
+    """
+    if config["backend"] == "gee":
+        return []
+    paths = []
+    for mine_id in aois["mine_id"]:
+        paths += Path(RAW_DATA_DIR, mine_id).glob("*")
+        if config["backend"] == "incremental":
+            paths += Path(CUBE_DIR, mine_id).glob(META_FILE)
+    if config["backend"] == "incremental":
+        paths += STATE_DIR.glob(INDEX_FILE)
+    return paths
+
+
+def classification(config, area_severity):
+    return phase51.classify_mines(
+        area_severity,
+        area_high=config["area_high"],
+        area_med=config["area_med"],
+        severity_high=config["severity_high"],
+        severity_med=config["severity_med"],
+    )
+
+
+def ranking(config, classification):
+    return rank_mines(classification)
+
+
+def final_table(config, ranking):
+    df = build_final_table(ranking)
+    write_final_table(df)
+    # Runs only when the ranking changed, so history holds one row per new result
+    append_run(ranking, config_hash(config), (config["start_date"], config["end_date"]))
+    return df
+
+
+PHASES = [
+    Phase("mines", load_mines, config=["mines_dir", "mines_source"], version=2),
+    Phase("aois", build_aois, inputs=["mines"],
+          config=["buffer_m", "max_mines", "aoi_mode", "max_vertices"], version=2),
+    Phase("area_severity", area_severity, inputs=["aois"],
+          config=["backend", "start_date", "end_date", "max_cloud",
+                  "ndvi_drop_threshold", "min_persistence", "compact"],
+          sources=scene_sources, version=2),
+    Phase("classification", classification, inputs=["area_severity"],
+          config=["area_high", "area_med", "severity_high", "severity_med"],
+          version=2),
+    Phase("ranking", ranking, inputs=["classification"], version=2),
+    Phase("final_table", final_table, inputs=["ranking"],
+          files=[OUT_DIR / "final_mine_assessment.csv"], version=2),
+]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the mining monitoring DAG")
+    parser.add_argument("--backend", choices=["gee", "local", "incremental"],
+                        default=CONFIG["backend"])
+    parser.add_argument("--aoi-mode", choices=["bbox", "polygon"],
+                        default=CONFIG["aoi_mode"])
+    parser.add_argument("--compact", action="store_true", default=CONFIG["compact"],
+                        help="local backend: int16 NDVI and change maps")
+    parser.add_argument("--since-last-run", action="store_true",
+                        help="monitoring mode: only process new acquisitions")
+    parser.add_argument("--force", nargs="*", default=[],
+                        help="phase names to re-run even if cached")
+    parser.add_argument("--metrics", nargs="?", const=str(instrumentation.METRICS_DIR),
+                        default=None, metavar="DIR",
+                        help="write JSON-lines and Prometheus metrics to DIR")
+    args = parser.parse_args(argv)
+
+    if args.metrics:
+        instrumentation.enable(args.metrics)
+    else:
+        instrumentation.enable_from_env()
+
+    config = dict(CONFIG, backend=args.backend, aoi_mode=args.aoi_mode,
+                  compact=args.compact)
+    if args.since_last_run:
+        # Results depend on today's acquisitions, so the date is the key
+        config["backend"] = "incremental"
+        config["end_date"] = (date.today() + timedelta(days=1)).isoformat()
+    config["mines_source"] = file_fingerprint(MINES_DIR.glob("mines_cils.*"))
 
-def main():
-    print("Starting Phase 2 – AOI preparation")
+    print("Starting mining monitoring pipeline")
+    try:
+        report = run_dag(PHASES, config, force=set(args.force))
+    finally:
+        instrumentation.disable()
 
-    mines = load_mine_polygons("data/vectors/CILS_mines_polygon")
-    aois = prepare_mine_aois(mines, buffer_m=500)
+    ran = [name for name, r in report.items() if r["status"] == "ran"]
+    print(f"🎉 Pipeline complete — ran: {', '.join(ran) or 'nothing'}")
+    return report
 
-    print(f"Prepared AOIs for {len(aois)} mines")
-    print(aois.head())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,226 @@
+import hashlib
+import json
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+
+CATALOG_PATH = Path("data/catalog.sqlite")
+
+# complete : artifact exists at `location`
+# empty    : produced nothing (e.g. scene does not cover the mine); don't retry
+# pending  : submitted (export task running), check `task_id`
+# failed   : last attempt failed; retried on the next run
+DONE_STATUSES = ("complete", "empty")
+
+COLUMNS = ["mine_id", "date", "product", "config_hash", "status",
+           "location", "size", "sha256", "task_id", "updated"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    mine_id     TEXT NOT NULL,
+    date        TEXT NOT NULL,
+    product     TEXT NOT NULL,
+    config_hash TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    location    TEXT,
+    size        INTEGER,
+    sha256      TEXT,
+    task_id     TEXT,
+    updated     TEXT NOT NULL,
+    PRIMARY KEY (product, config_hash, mine_id, date)
+);
+CREATE INDEX IF NOT EXISTS artifacts_task ON artifacts (task_id);
+"""
+
+
+def config_hash(config):
+    """
+    Short stable hash of the settings that shape an artifact.
+    """
+    blob = json.dumps(config, sort_keys=True, default=str).encode()
+    return hashlib.sha256(blob).hexdigest()[:16]
+
+
+def aoi_config_hashes(config, aois):
+    """
+    {mine_id: config hash} with the mine's AOI geometry in each hash,
+    for per-mine artifacts clipped to their AOI. A different AOI mode,
+    buffer or vertex budget, or an edited mine, changes the hash of
+    just the mines whose AOI changed.
+    """
+    from src.ingestion.sentinel_access import geometry_hashes
+
+    return {
+        mine_id: config_hash({**config, "aoi": aoi})
+        for mine_id, aoi in zip(aois["mine_id"], geometry_hashes(aois.geometry.values))
+    }
+
+
+def _hash_of(config_hash, mine_id):
+    return config_hash[mine_id] if isinstance(config_hash, dict) else config_hash
+
+
+def file_info(path):
+    """
+    Size and SHA-256 of a local file, reusing a `.sha256` sidecar.
+    """
+    from src.ingestion.download_engine import file_sha256, read_checksum
+
+    path = Path(path)
+    return {
+        "location": str(path),
+        "size": path.stat().st_size,
+        "sha256": read_checksum(path) or file_sha256(path),
+    }
+
+
+class ArtifactCatalog:
+    """
+    SQLite record of every produced artifact, keyed by
+    (product, config_hash, mine_id, date).
+
+    Schedulers ask for the finished keys of a product in one query
+    (`done_keys`) and only queue the rest, so a re-run with nothing
+    new costs a single catalog lookup.
+
+    Wherever a `config_hash` is taken, a `{mine_id: hash}` dict from
+    `aoi_config_hashes` works too.
+    """
+
+    def __init__(self, path=CATALOG_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    # -------------------------
+    # Writes
+    # -------------------------
+    def record_many(self, product, config_hash, rows):
+        """
+        Upsert artifacts; `rows` are dicts with mine_id, date, status
+        and optionally location, size, sha256, task_id.
+        """
+        now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        values = [
+            (r["mine_id"], str(r["date"]), product, _hash_of(config_hash, r["mine_id"]),
+             r["status"],
+             r.get("location"), r.get("size"), r.get("sha256"), r.get("task_id"), now)
+            for r in rows
+        ]
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                values
+            )
+
+    def record(self, product, config_hash, mine_id, date, status, **fields):
+        self.record_many(product, config_hash,
+                         [{"mine_id": mine_id, "date": date, "status": status, **fields}])
+
+    def forget(self, product, keys, keep):
+        """
+        Delete the rows of (mine_id, date) `keys` under any config but
+        `keep`, e.g. once the file they describe has been replaced.
+        """
+        values = [(product, m, str(d), _hash_of(keep, m)) for m, d in keys]
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "DELETE FROM artifacts WHERE product = ? AND mine_id = ? AND date = ? "
+                "AND config_hash != ?",
+                values
+            )
+
+    # -------------------------
+    # Bulk queries
+    # -------------------------
+    def query(self, product, config_hash=None, status=None):
+        """
+        Catalog rows for a product as a DataFrame.
+        """
+        sql = "SELECT * FROM artifacts WHERE product = ?"
+        params = [product]
+        if config_hash is not None:
+            sql += " AND config_hash = ?"
+            params.append(config_hash)
+        if status is not None:
+            statuses = [status] if isinstance(status, str) else list(status)
+            sql += f" AND status IN ({', '.join('?' * len(statuses))})"
+            params.extend(statuses)
+
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return pd.DataFrame(rows, columns=COLUMNS)
+
+    def done_keys(self, product, config_hash, statuses=DONE_STATUSES):
+        """
+        {(mine_id, date)} already produced with this config.
+        """
+        if isinstance(config_hash, dict):
+            df = self.query(product, status=statuses)
+            df = df[df["config_hash"] == df["mine_id"].map(config_hash)]
+        else:
+            df = self.query(product, config_hash, status=statuses)
+        return set(zip(df["mine_id"], df["date"]))
+
+    def known_keys(self, product):
+        """
+        {(mine_id, date)} with a row under any config, to tell files
+        from before the catalog existed from ones made with another config.
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT DISTINCT mine_id, date FROM artifacts WHERE product = ?", (product,)
+            ).fetchall()
+        return set(rows)
+
+    def reconcile_tasks(self, product, statuses):
+        """
+        Settle `pending` rows from a `{task_id: {"state", "error"}}`
+        listing (one batched status call), e.g. exports started by
+        a run that exited before they finished. Tasks no longer listed
+        are marked failed so the next run re-submits them.
+        """
+        pending = self.query(product, status="pending")
+        updates = []
+        for _, row in pending.iterrows():
+            state = (statuses.get(row["task_id"]) or {}).get("state", "MISSING")
+            if state == "COMPLETED":
+                updates.append({**row.to_dict(), "status": "complete"})
+            elif state in ("FAILED", "CANCELLED", "MISSING"):
+                updates.append({**row.to_dict(), "status": "failed"})
+
+        for config_hash, group in pd.DataFrame(updates, columns=COLUMNS).groupby("config_hash"):
+            self.record_many(product, config_hash, group.to_dict("records"))
+        return len(updates)
+
+
+# Export task state -> catalog status
+EXPORT_STATUS = {"RUNNING": "pending", "COMPLETED": "complete", "FAILED": "failed"}
+
+
+def export_tracker(catalog, product, config_hash):
+    """
+    `on_update` callback for an ExportManager whose jobs carry
+    mine_id / date / location metadata.
+    """
+    def on_update(job):
+        catalog.record(product, config_hash, job.meta["mine_id"], job.meta["date"],
+                       EXPORT_STATUS[job.state], location=job.meta.get("location"),
+                       task_id=job.task_id)
+    return on_update
@@ -0,0 +1,204 @@
+import geopandas as gpd
+import numpy as np
+import shapely
+from shapely.strtree import STRtree
+
+
+# -------------------------------
+# Config
+# -------------------------------
+
+MAX_GAP_M = 250              # merge AOIs closer than this
+MAX_REGION_PIXELS = 4_000_000  # at 10 m -> 400 km2 per shared region
+MAX_TILE_PIXELS = 1_000_000  # AOIs above this are reduced tile by tile
+SCALE = 10                   # meters per pixel
+
+M_PER_DEG_LAT = 110_574.0
+M_PER_DEG_LON_EQ = 111_320.0
+
+
+# -------------------------------
+# Pixel estimates
+# -------------------------------
+
+def bbox_pixels(bounds, scale=SCALE):
+    """
+    Approximate number of `scale`-meter pixels covered by lon/lat
+    bounding boxes. `bounds` is an (N, 4) array of minx, miny, maxx, maxy.
+    """
+    bounds = np.atleast_2d(bounds)
+    lat_mid = np.radians((bounds[:, 1] + bounds[:, 3]) / 2)
+
+    width_m = (bounds[:, 2] - bounds[:, 0]) * M_PER_DEG_LON_EQ * np.cos(lat_mid)
+    height_m = (bounds[:, 3] - bounds[:, 1]) * M_PER_DEG_LAT
+
+    return np.ceil(width_m / scale) * np.ceil(height_m / scale)
+
+
+def _union_bounds(a, b):
+    return np.array([min(a[0], b[0]), min(a[1], b[1]),
+                     max(a[2], b[2]), max(a[3], b[3])])
+
+
+# -------------------------------
+# Clustering
+# -------------------------------
+
+def cluster_mine_aois(aois, max_gap_m=MAX_GAP_M,
+                      max_region_pixels=MAX_REGION_PIXELS, scale=SCALE):
+    """
+    Group overlapping or nearby mine AOIs into shared processing regions.
+
+    Candidate pairs come from an STRtree query and are merged closest
+    first. A merge is accepted only if the combined bounding box stays
+    under `max_region_pixels` and does not request more pixels than the
+    two regions did separately, so total pixels never grow by merging.
+
+    Returns
+    -------
+    aois : GeoDataFrame
+        Input AOIs with an added `region_id` column.
+    regions : GeoDataFrame
+        One row per region: `region_id`, `mine_ids`, `n_pixels`, bbox geometry.
+    """
+    geoms = aois.geometry.values
+    n = len(geoms)
+
+    bounds = shapely.bounds(geoms)
+    pixels = bbox_pixels(bounds, scale=scale)
+
+    # STRtree works in degrees; use the latitude scale as a
+    # conservative conversion for the search distance
+    gap_deg = max_gap_m / M_PER_DEG_LAT
+    tree = STRtree(geoms)
+    left, right = tree.query(geoms, predicate="dwithin", distance=gap_deg)
+
+    keep = left < right
+    left, right = left[keep], right[keep]
+    dist = shapely.distance(geoms[left], geoms[right])
+    order = np.argsort(dist, kind="stable")
+
+    # Union-find with per-root bounds and pixel counts
+    parent = np.arange(n)
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    region_bounds = {i: bounds[i] for i in range(n)}
+    region_pixels = {i: pixels[i] for i in range(n)}
+
+    for k in order:
+        a, b = find(left[k]), find(right[k])
+        if a == b:
+            continue
+
+        merged = _union_bounds(region_bounds[a], region_bounds[b])
+        merged_pixels = bbox_pixels(merged, scale=scale)[0]
+
+        if merged_pixels > max_region_pixels:
+            continue
+        if merged_pixels > region_pixels[a] + region_pixels[b]:
+            continue
+
+        parent[b] = a
+        region_bounds[a] = merged
+        region_pixels[a] = merged_pixels
+        del region_bounds[b], region_pixels[b]
+
+    roots = np.array([find(i) for i in range(n)])
+    region_roots, region_idx = np.unique(roots, return_inverse=True)
+
+    aois = aois.copy()
+    aois["region_id"] = ["REGION_{:04d}".format(i) for i in region_idx]
+
+    regions = gpd.GeoDataFrame(
+        {
+            "region_id": ["REGION_{:04d}".format(i)
+                          for i in range(len(region_roots))],
+            "mine_ids": [aois["mine_id"].to_numpy()[region_idx == i].tolist()
+                         for i in range(len(region_roots))],
+            "n_pixels": [int(region_pixels[r]) for r in region_roots],
+        },
+        geometry=shapely.box(*np.array([region_bounds[r] for r in region_roots]).T),
+        crs=aois.crs
+    )
+
+    return aois, regions
+
+
+def clustering_summary(aois, regions, scale=SCALE):
+    """
+    Pixels requested per-mine vs per-region.
+    """
+    per_mine = int(bbox_pixels(shapely.bounds(aois.geometry.values), scale).sum())
+    shared = int(regions["n_pixels"].sum())
+
+    return {
+        "mines": len(aois),
+        "regions": len(regions),
+        "per_mine_pixels": per_mine,
+        "shared_pixels": shared,
+        "pixel_ratio": shared / per_mine if per_mine else 1.0
+    }
+
+
+# -------------------------------
+# Tiling of large AOIs
+# -------------------------------
+
+def tile_grid(bounds, n_tiles, aspect):
+    """
+    Boxes of an nx x ny grid over `bounds` with at least `n_tiles`
+    cells, shaped so cells are roughly square for a width/height `aspect`.
+    """
+    nx = max(1, int(round(np.sqrt(n_tiles * aspect))))
+    ny = int(np.ceil(n_tiles / nx))
+
+    xs = np.linspace(bounds[0], bounds[2], nx + 1)
+    ys = np.linspace(bounds[1], bounds[3], ny + 1)
+    x0, y0 = np.meshgrid(xs[:-1], ys[:-1])
+    x1, y1 = np.meshgrid(xs[1:], ys[1:])
+
+    return shapely.box(x0.ravel(), y0.ravel(), x1.ravel(), y1.ravel())
+
+
+def tile_aois(aois, max_pixels=MAX_TILE_PIXELS, scale=SCALE):
+    """
+    Split AOIs larger than `max_pixels` into grid tiles clipped to the
+    AOI. Smaller AOIs are kept whole as tile 0.
+
+    Returns one row per tile: `mine_id`, `tile_id`, geometry. Tiles of a
+    mine partition it, so per-tile sums add up to the whole-mine sum.
+    """
+    bounds = shapely.bounds(aois.geometry.values)
+    pixels = bbox_pixels(bounds, scale=scale)
+
+    lat_mid = np.radians((bounds[:, 1] + bounds[:, 3]) / 2)
+    width_m = (bounds[:, 2] - bounds[:, 0]) * M_PER_DEG_LON_EQ * np.cos(lat_mid)
+    height_m = (bounds[:, 3] - bounds[:, 1]) * M_PER_DEG_LAT
+
+    mine_ids, tile_ids, geoms = [], [], []
+    for i, (mine_id, geom) in enumerate(zip(aois["mine_id"], aois.geometry.values)):
+        if pixels[i] <= max_pixels:
+            mine_ids.append(mine_id)
+            tile_ids.append(0)
+            geoms.append(geom)
+            continue
+
+        cells = tile_grid(bounds[i], int(np.ceil(pixels[i] / max_pixels)),
+                          width_m[i] / max(height_m[i], scale))
+        parts = shapely.intersection(cells, geom)
+        parts = parts[shapely.area(parts) > 0]
+
+        mine_ids.extend([mine_id] * len(parts))
+        tile_ids.extend(range(len(parts)))
+        geoms.extend(parts)
+
+    return gpd.GeoDataFrame(
+        {"mine_id": mine_ids, "tile_id": tile_ids},
+        geometry=geoms,
+        crs=aois.crs
+    )
@@ -0,0 +1,207 @@
+import math
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import rasterio
+import rasterio.shutil
+from rasterio.enums import Resampling
+
+from src import instrumentation
+from src.ingestion.download_engine import CHECKSUM_SUFFIX
+from src.processing.parallel import gdal_threads
+
+# =========================
+# CONFIG
+# =========================
+RAW_DATA_DIR = Path("data/raw/sentinel2")
+MAPS_DIR = Path("outputs/maps")
+
+COG_BLOCKSIZE = 256        # internal tile edge in pixels, also the overview stop size
+COG_COMPRESS = "DEFLATE"
+PREVIEW_SIZE = 512         # longest edge of a low-zoom preview
+
+# Overviews of categorical bands must keep class values
+CATEGORICAL_BANDS = {"SCL"}
+
+
+# =========================
+# COG CHECK / CONVERSION
+# =========================
+def is_cog(path):
+    """
+    True when GDAL reports a Cloud-Optimized GeoTIFF layout
+    with this repo's block size.
+    """
+    with rasterio.open(path) as src:
+        layout = src.tags(ns="IMAGE_STRUCTURE").get("LAYOUT")
+        return layout == "COG" and set(src.block_shapes) == {(COG_BLOCKSIZE, COG_BLOCKSIZE)}
+
+
+def overview_resampling(src):
+    """
+    GDAL builds all overviews of a file with one method: nearest when
+    any band is categorical (SCL), average otherwise.
+    """
+    if CATEGORICAL_BANDS & set(d for d in src.descriptions if d):
+        return Resampling.nearest
+    return Resampling.average
+
+
+@instrumentation.timed("local.to_cog")
+def to_cog(path, out_path=None, blocksize=COG_BLOCKSIZE, compress=COG_COMPRESS):
+    """
+    Rewrite a GeoTIFF as a tiled, compressed COG with internal
+    overviews. Converts in place when `out_path` is None; the result
+    only replaces the target once it is complete.
+
+    Returns {"bytes_before", "bytes_after", "overviews"}.
+    """
+    path = Path(path)
+    out_path = Path(out_path or path)
+    bytes_before = path.stat().st_size
+
+    with rasterio.open(path) as src:
+        floating = np.dtype(src.dtypes[0]).kind == "f"
+        tmp_path = out_path.with_name(out_path.name + ".cog")
+        rasterio.shutil.copy(
+            src, tmp_path, driver="COG",
+            BLOCKSIZE=blocksize,
+            COMPRESS=compress,
+            PREDICTOR="FLOATING_POINT" if floating else "YES",
+            OVERVIEWS="AUTO",
+            OVERVIEW_RESAMPLING=overview_resampling(src).name.upper(),
+            BIGTIFF="IF_SAFER",
+            NUM_THREADS=str(gdal_threads()),
+        )
+
+    os.replace(tmp_path, out_path)
+
+    # a rewritten scene no longer matches its download checksum
+    if out_path == path:
+        path.with_name(path.name + CHECKSUM_SUFFIX).unlink(missing_ok=True)
+
+    with rasterio.open(out_path) as dst:
+        overviews = len(dst.overviews(1))
+
+    return {"bytes_before": bytes_before,
+            "bytes_after": out_path.stat().st_size,
+            "overviews": overviews}
+
+
+# =========================
+# READS
+# =========================
+def aligned_block_size(src, block_rows, block_cols):
+    """
+    Round a window size up to whole internal blocks, so every block
+    is decoded once instead of once per window that touches it.
+    """
+    bh, bw = src.block_shapes[0]
+    if bh == 1:  # stripped file: nothing to align to
+        return block_rows, block_cols
+    return (max(1, math.ceil(block_rows / bh)) * bh,
+            max(1, math.ceil(block_cols / bw)) * bw)
+
+
+def preview_shape(height, width, max_size=PREVIEW_SIZE):
+    factor = max(1, math.ceil(max(height, width) / max_size))
+    return math.ceil(height / factor), math.ceil(width / factor)
+
+
+def read_preview(path, max_size=PREVIEW_SIZE, indexes=None, masked=True):
+    """
+    Low-zoom read whose longest edge is at most `max_size` pixels.
+    GDAL serves decimated reads from the closest internal overview,
+    so full-resolution data is never decoded for a COG. Bands with a
+    scale or offset (e.g. compact int16 change maps) come back as
+    float32 physical values.
+
+    Returns (array, transform of the preview grid).
+    """
+    with rasterio.open(path) as src:
+        height, width = preview_shape(src.height, src.width, max_size)
+        count = 1 if isinstance(indexes, int) else len(indexes or src.indexes)
+        shape = (height, width) if isinstance(indexes, int) else (count, height, width)
+
+        data = src.read(indexes, out_shape=shape, masked=masked,
+                        resampling=Resampling.nearest)
+
+        bands = [indexes] if isinstance(indexes, int) else list(indexes or src.indexes)
+        scales = np.array([src.scales[i - 1] for i in bands], dtype=np.float32)
+        offsets = np.array([src.offsets[i - 1] for i in bands], dtype=np.float32)
+        if (scales != 1).any() or (offsets != 0).any():
+            if not isinstance(indexes, int):
+                scales, offsets = scales[:, None, None], offsets[:, None, None]
+            data = data.astype(np.float32) * scales + offsets
+        transform = src.transform * src.transform.scale(src.width / width,
+                                                        src.height / height)
+    return data, transform
+
+
+def decoded_pixels(path, max_size=PREVIEW_SIZE):
+    """
+    Pixels per band GDAL decodes for a preview: the size of the
+    smallest overview still at least the preview size, or the full
+    image when the file has no overviews.
+    """
+    with rasterio.open(path) as src:
+        height, width = preview_shape(src.height, src.width, max_size)
+        level = 1
+        for factor in src.overviews(1):
+            if math.ceil(src.width / factor) >= width and math.ceil(src.height / factor) >= height:
+                level = factor
+        return math.ceil(src.width / level) * math.ceil(src.height / level), src.width * src.height
+
+
+# =========================
+# INGEST STAGE
+# =========================
+def convert_tree(root, pattern="*/*.tif", max_size=PREVIEW_SIZE):
+    """
+    Convert every GeoTIFF under `root` that is not yet a COG and
+    report the I/O savings per file: on-disk bytes, and pixels decoded
+    by a preview read before (whole image) and after (overview).
+    """
+    rows = []
+    for path in sorted(Path(root).glob(pattern)):
+        if is_cog(path):
+            continue
+
+        _, full_pixels = decoded_pixels(path, max_size)
+        result = to_cog(path)
+        preview_pixels, _ = decoded_pixels(path, max_size)
+        rows.append({"path": str(path), **result,
+                     "full_pixels": full_pixels, "preview_pixels": preview_pixels})
+
+    report = pd.DataFrame(rows, columns=[
+        "path", "bytes_before", "bytes_after", "overviews", "full_pixels", "preview_pixels"
+    ])
+    report["saved_pct"] = (100 * (1 - report["bytes_after"] / report["bytes_before"])).round(1)
+    report["preview_saved_pct"] = (
+        100 * (1 - report["preview_pixels"] / report["full_pixels"])
+    ).round(1)
+    return report
+
+
+def print_savings(report, label):
+    if report.empty:
+        print(f"⏭ {label}: all files already COG")
+        return
+
+    before, after = report["bytes_before"].sum(), report["bytes_after"].sum()
+    pixels = report["full_pixels"].sum()
+    print(f"🗜 {label}: {len(report)} files → COG, "
+          f"{before / 1e6:.1f} MB → {after / 1e6:.1f} MB "
+          f"({100 * (1 - after / before):.1f}% smaller), preview reads decode "
+          f"{100 * (1 - report['preview_pixels'].sum() / pixels):.1f}% fewer pixels")
+
+
+def main():
+    print_savings(convert_tree(RAW_DATA_DIR), "Scenes")
+    print_savings(convert_tree(MAPS_DIR, pattern="**/*.tif"), "Change maps")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+import contextvars
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src import instrumentation
+
+
+# =========================
+# CONFIG
+# =========================
+MAX_WORKERS = 4
+MAX_RETRIES = 5
+BACKOFF = 5  # seconds, multiplied by the attempt number
+TIMEOUT = 120
+CHUNK_SIZE = 1 << 16  # 64 KiB
+PART_SUFFIX = ".part"
+CHECKSUM_SUFFIX = ".sha256"
+
+# 4xx responses worth retrying (timeout, rate limit); any other 4xx
+# (404, 403, expired signed URL...) fails without retrying
+RETRYABLE_4XX = {408, 429}
+
+
+class DownloadError(RuntimeError):
+    """Raised when a file cannot be downloaded and verified."""
+
+
+def is_permanent(error):
+    """
+    True for HTTP errors that retrying cannot fix.
+    """
+    response = getattr(error, "response", None)
+    if not isinstance(error, requests.HTTPError) or response is None:
+        return False
+    return 400 <= response.status_code < 500 and response.status_code not in RETRYABLE_4XX
+
+
+# =========================
+# BANDWIDTH LIMIT
+# =========================
+class RateLimiter:
+    """
+    Token bucket shared by all download threads.
+    `bytes_per_sec=None` disables throttling.
+    """
+
+    def __init__(self, bytes_per_sec=None):
+        self.rate = bytes_per_sec
+        self.tokens = float(bytes_per_sec or 0)
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, n):
+        if not self.rate:
+            return
+
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= n
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+        if wait > 0:
+            time.sleep(wait)
+
+
+# =========================
+# CHECKSUMS
+# =========================
+def file_sha256(path, chunk_size=CHUNK_SIZE):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_checksum(path):
+    """
+    Checksum recorded next to a completed download, or None.
+    """
+    sidecar = Path(str(path) + CHECKSUM_SUFFIX)
+    if not sidecar.exists():
+        return None
+    return sidecar.read_text().split()[0]
+
+
+def is_complete(path):
+    """
+    A download is complete once it has been renamed into place
+    and its checksum sidecar has been written.
+    """
+    path = Path(path)
+    return path.exists() and read_checksum(path) is not None
+
+
+# =========================
+# DOWNLOAD ENGINE
+# =========================
+class DownloadEngine:
+    """
+    Concurrent, resumable HTTP downloader.
+
+    - bounded thread pool sharing one pooled `requests.Session`
+    - data is streamed to `<out>.part` and renamed atomically when verified
+    - partial `.part` files are resumed with an HTTP Range request
+    - size is checked against Content-Length / Content-Range and a
+      SHA-256 sidecar is written (or compared when one is expected)
+    - throughput is capped by `max_bytes_per_sec`, not by sleeps
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, max_bytes_per_sec=None,
+                 max_retries=MAX_RETRIES, timeout=TIMEOUT,
+                 chunk_size=CHUNK_SIZE, session=None, backoff=BACKOFF):
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.limiter = RateLimiter(max_bytes_per_sec)
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=max_workers,
+                                  pool_maxsize=max_workers)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    # -------------------------
+    # Single file
+    # -------------------------
+    def fetch(self, url, out_path, expected_sha256=None):
+        """
+        Download `url` to `out_path`, retrying with backoff.
+        Permanent 4xx responses fail on the first attempt.
+        `url` may be a callable so expensive URL generation runs
+        on the worker thread. Returns a result dict.
+        """
+        out_path = Path(out_path)
+        if is_complete(out_path):
+            instrumentation.record("download.skipped")
+            return {"path": out_path, "status": "skipped",
+                    "bytes": 0, "sha256": read_checksum(out_path)}
+
+        start = time.perf_counter()
+        received_total = 0
+
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        part_path = Path(str(out_path) + PART_SUFFIX)
+
+        last_error = None
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                if callable(url):
+                    url = url()
+                received = self._stream(url, part_path)
+                received_total += received
+                sha256 = self._verify(part_path, expected_sha256)
+
+                os.replace(part_path, out_path)
+                Path(str(out_path) + CHECKSUM_SUFFIX).write_text(
+                    f"{sha256}  {out_path.name}\n"
+                )
+                instrumentation.record("download", time.perf_counter() - start,
+                                       bytes=received_total, retries=attempt - 1)
+                return {"path": out_path, "status": "downloaded",
+                        "bytes": received, "sha256": sha256,
+                        "attempts": attempt}
+
+            except Exception as e:
+                last_error = e
+                print(f"⚠ Download failed (attempt {attempt}): {out_path.name}")
+                if is_permanent(e):
+                    break
+                if attempt < self.max_retries:
+                    time.sleep(self.backoff * attempt)  # ⏳ backoff
+
+        instrumentation.record("download", time.perf_counter() - start,
+                               bytes=received_total, retries=attempt - 1,
+                               error=True)
+        raise DownloadError(f"{out_path.name}: {last_error}") from last_error
+
+    def _stream(self, url, part_path):
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+        with self.session.get(url, stream=True, timeout=self.timeout,
+                              headers=headers) as r:
+            if r.status_code == 416:
+                # Range not satisfiable: the part file is already whole
+                return 0
+            r.raise_for_status()
+
+            if offset and r.status_code != 206:
+                offset = 0  # server ignored Range; start over
+            total = self._expected_total(r, offset)
+
+            received = 0
+            with open(part_path, "ab" if offset else "wb") as f:
+                for chunk in r.iter_content(chunk_size=self.chunk_size):
+                    if chunk:
+                        self.limiter.consume(len(chunk))
+                        f.write(chunk)
+                        received += len(chunk)
+
+        size = part_path.stat().st_size
+        if total is not None and size != total:
+            if size > total:
+                part_path.unlink()  # stale part file; restart from zero
+            raise DownloadError(
+                f"size mismatch for {part_path.name}: {size} != {total}"
+            )
+        return received
+
+    @staticmethod
+    def _expected_total(response, offset):
+        content_range = response.headers.get("Content-Range")
+        if content_range and "/" in content_range:
+            total = content_range.rsplit("/", 1)[1]
+            if total != "*":
+                return int(total)
+
+        length = response.headers.get("Content-Length")
+        if length is not None and "Content-Encoding" not in response.headers:
+            return offset + int(length)
+        return None
+
+    def _verify(self, part_path, expected_sha256):
+        sha256 = file_sha256(part_path, self.chunk_size)
+        if expected_sha256 and sha256 != expected_sha256:
+            part_path.unlink()
+            raise DownloadError(f"checksum mismatch for {part_path.name}")
+        return sha256
+
+    # -------------------------
+    # Many files
+    # -------------------------
+    def run(self, jobs):
+        """
+        Download `(url, out_path)` jobs on the thread pool and yield
+        result dicts in completion order. Failures are yielded with
+        `status="failed"` instead of aborting the batch.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {
+                pool.submit(contextvars.copy_context().run,
+                            self.fetch, url, out_path): out_path
+                for url, out_path in jobs
+            }
+            for future in as_completed(futures):
+                try:
+                    yield future.result()
+                except DownloadError as e:
+                    print(f"❌ Skipping {Path(futures[future]).name}")
+                    yield {"path": Path(futures[future]), "status": "failed",
+                           "bytes": 0, "error": str(e)}
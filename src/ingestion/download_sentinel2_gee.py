@@ -1,12 +1,26 @@
 print("SCRIPT STARTED")
 
 import ee
+import numpy as np
 import os
-import requests
+import rasterio
 from pathlib import Path
+from rasterio.errors import WindowError
+from rasterio.features import geometry_mask
+from rasterio.windows import Window, from_bounds
 
+from src import instrumentation
+from src.catalog import ArtifactCatalog, aoi_config_hashes, file_info
+from src.ingestion.cog import is_cog, to_cog
 from src.ingestion.load_mines import load_mine_polygons
 from src.ingestion.sentinel_access import prepare_mine_aois
+from src.ingestion.aoi_clustering import cluster_mine_aois
+from src.ingestion.download_engine import DownloadEngine, DownloadError
+from src.ingestion.scene_metadata import fetch_scene_metadata_many, scene_image
+from src.processing.cube_store import update_cube
+from src.processing.masks import (
+    VALID_SCL, mask_scl_ee, save_scene_mask, scene_mask_path, scene_valid
+)
 
 # =========================
 # CONFIG
@@ -17,6 +31,18 @@ END_DATE = "2022-12-31"
 MAX_CLOUD = 20
 
 RAW_DATA_DIR = Path("data/raw/sentinel2")
+REGION_DATA_DIR = RAW_DATA_DIR / "_regions"
+
+DOWNLOAD_WORKERS = 4
+MAX_BANDWIDTH = None  # bytes/s shared by all workers, None = unlimited
+
+SCENE_PRODUCT = "s2_scene"
+SCENE_CONFIG = {
+    "collection": "COPERNICUS/S2_SR_HARMONIZED",
+    "mask": "SCL " + ",".join(map(str, VALID_SCL)),
+    "scale": 10,
+    "format": "GEO_TIFF",
+}
 
 
 # =========================
@@ -36,97 +62,270 @@ def init_gee():
 # CLOUD MASK
 # =========================
 def mask_s2_clouds(image):
-    scl = image.select("SCL")
-    valid = (
-        scl.eq(4)  # vegetation
-        .Or(scl.eq(5))  # bare soil
-        .Or(scl.eq(6))  # water
-        .Or(scl.eq(7))  # unclassified
-    )
-    return image.updateMask(valid)
+    return mask_scl_ee(image)  # VALID_SCL, same classes as the local backend
 
 
 # =========================
 # DOWNLOAD IMAGE (SAFE METHOD)
 # =========================
-import time
-import requests
-
-def download_image(image, geom, out_path, scale=10, max_retries=5):
-    url = image.getDownloadURL({
+@instrumentation.timed("ee.download_url")
+def download_url(image, geom, scale=10):
+    return image.getDownloadURL({
         "scale": scale,
         "region": geom,
         "format": "GEO_TIFF"
     })
 
-    for attempt in range(1, max_retries + 1):
-        try:
-            r = requests.get(url, stream=True, timeout=120)
-            r.raise_for_status()
 
-            with open(out_path, "wb") as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+@instrumentation.timed("download_image")
+def download_image(image, geom, out_path, scale=10, max_retries=5, engine=None):
+    """
+    Download one image through the resumable engine.
+    The file only appears at `out_path` once it is complete.
+    """
+    own_engine = engine is None
+    if own_engine:
+        engine = DownloadEngine(max_workers=1, max_retries=max_retries)
+
+    try:
+        return engine.fetch(lambda: download_url(image, geom, scale), out_path)
+    except DownloadError:
+        print(f"❌ Skipping {out_path.name}")
+    finally:
+        if own_engine:
+            engine.close()
+
+
+# =========================
+# SPLIT REGION SCENE PER MINE
+# =========================
+def crop_valid_mask(src, data):
+    """
+    Valid pixels of a cropped (band, rows, cols) masked scene: inside
+    the AOI, B4 + B8 > 0 and a usable SCL class.
+    """
+    names = {d: i for i, d in enumerate(src.descriptions) if d}
+    filled = data.filled(0)
+    scl = filled[names["SCL"]] if "SCL" in names else None
+    valid = scene_valid(filled[names.get("B4", 3)], filled[names.get("B8", 7)], scl)
+    return valid & ~np.ma.getmaskarray(data).any(axis=0)
+
+
+@instrumentation.timed("split_region_scene")
+def split_region_scene(region_path, members, date, overwrite=()):
+    """
+    Crop a downloaded region scene into one COG per member mine
+    under RAW_DATA_DIR/<mine_id>/<date>.tif, with its bit-packed
+    valid mask next to it (<date>.tif.mask.npz, see masks.py).
+    Existing crops are kept, except those of the mines in `overwrite`
+    (cropped for an older AOI), which are removed and redone.
+
+    The mine AOIs are reprojected to the scene's CRS first: Earth
+    Engine returns single-tile scenes in the tile's UTM zone.
+
+    Returns {mine_id: path}, with None for mines the scene does not cover.
+    """
+    written = {}
+    with rasterio.open(region_path) as src:
+        same_crs = (src.crs is None or members.crs is None
+                    or members.crs.equals(src.crs.to_wkt(), ignore_axis_order=True))
+        geoms = members.geometry if same_crs else members.geometry.to_crs(src.crs.to_wkt())
+
+        for (_, mine), geom in zip(members.iterrows(), geoms):
+            out_path = RAW_DATA_DIR / mine["mine_id"] / f"{date}.tif"
+            written[mine["mine_id"]] = None
+            if mine["mine_id"] in overwrite:
+                out_path.unlink(missing_ok=True)
+                scene_mask_path(out_path).unlink(missing_ok=True)
+            if out_path.exists():
+                written[mine["mine_id"]] = out_path
+                continue
+
+            try:
+                window = (
+                    from_bounds(*geom.bounds, transform=src.transform)
+                    .round_offsets()
+                    .round_lengths()
+                    .intersection(Window(0, 0, src.width, src.height))
+                )
+            except WindowError:
+                continue  # mine lies outside the downloaded region
+
+            data = src.read(window=window, masked=True)
 
-            return  # ✅ success
+            if not mine.geometry.equals(mine.geometry.envelope):
+                # polygon AOI: blank pixels whose centre is outside it
+                outside = geometry_mask(
+                    [geom], out_shape=(window.height, window.width),
+                    transform=src.window_transform(window)
+                )
+                data = np.ma.masked_array(data, mask=np.ma.getmaskarray(data) | outside)
 
-        except Exception as e:
-            print(f"⚠ Download failed (attempt {attempt}): {out_path.name}")
-            if attempt == max_retries:
-                print(f"❌ Skipping {out_path.name}")
-                return
-            time.sleep(5 * attempt)  # ⏳ backoff
+            if data.mask.all():
+                continue  # scene does not cover this mine
+
+            profile = src.profile.copy()
+            profile.update(
+                width=window.width,
+                height=window.height,
+                transform=src.window_transform(window)
+            )
+
+            out_path.parent.mkdir(parents=True, exist_ok=True)
+            part_path = out_path.with_name(out_path.name + ".part")
+            with rasterio.open(part_path, "w", **profile) as dst:
+                dst.write(data.filled(src.nodata if src.nodata is not None else 0))
+                dst.descriptions = src.descriptions  # band names for the local backend
+            to_cog(part_path, out_path)
+            os.remove(part_path)
+            save_scene_mask(out_path, crop_valid_mask(src, data))
+            written[mine["mine_id"]] = out_path
+
+    return written
 
 
 # =========================
-# MAIN PIPELINE
+# DOWNLOAD SCENES FOR AOIS
 # =========================
-def main():
-    print("ENTERED main()")
+def download_scenes(aois, start_date=START_DATE, end_date=END_DATE,
+                    max_cloud=MAX_CLOUD, catalog=None):
+    """
+    Download every scene in [start_date, end_date) for the AOIs,
+    split it per mine and append it to each mine's cube.
 
-    init_gee()
-    print("GEE INITIALIZED")
+    Mine/date pairs already in the artifact catalog are skipped after
+    one bulk query; every split result is recorded there, keyed by
+    SCENE_CONFIG plus the mine's AOI geometry. A crop on disk is only
+    reused when it is catalogued under that key or not at all (files
+    from before the catalog); one made for another AOI is redone.
+    """
+    own_catalog = catalog is None
+    catalog = catalog or ArtifactCatalog()
+    scene_hash = aoi_config_hashes(SCENE_CONFIG, aois)
+    done = catalog.done_keys(SCENE_PRODUCT, scene_hash)
+    cataloged = catalog.known_keys(SCENE_PRODUCT)
 
-    mines = load_mine_polygons("data/vectors/CILS_mines_polygon")
-    print("Mines loaded:", len(mines))
+    def reusable(mine_id, date):
+        return (mine_id, date) in done or (mine_id, date) not in cataloged
 
-    aois = prepare_mine_aois(mines)
-    print("AOIs prepared:", len(aois))
+    # Nearby mines share one download per scene
+    aois, regions = cluster_mine_aois(aois)
+    print("Shared regions:", len(regions))
 
     s2 = (
         ee.ImageCollection("COPERNICUS/S2_SR_HARMONIZED")
-        .filterDate(START_DATE, END_DATE)
-        .filter(ee.Filter.lt("CLOUDY_PIXEL_PERCENTAGE", MAX_CLOUD))
+        .filterDate(start_date, end_date)
+        .filter(ee.Filter.lt("CLOUDY_PIXEL_PERCENTAGE", max_cloud))
         .map(mask_s2_clouds)
     )
 
-    for _, row in aois.head(5).iterrows():
-        mine_id = row["mine_id"]
+    region_geoms = {
+        region["region_id"]: ee.Geometry(region.geometry.__geo_interface__)
+        for _, region in regions.iterrows()
+    }
 
-        # ✅ FIXED LINE
-        geom = ee.Geometry.Polygon(list(row.geometry.exterior.coords))
+    # One request for every scene of every region
+    # (the metadata `mine_id` column holds the region ID here)
+    scenes = fetch_scene_metadata_many({
+        region_id: s2.filterBounds(geom)
+        for region_id, geom in region_geoms.items()
+    })
+    print("Scenes found:", len(scenes))
+
+    jobs = []
+    pending = {}
+    adopted = []
 
-        out_dir = RAW_DATA_DIR / mine_id
+    for region_id, region_scenes in scenes.groupby("mine_id"):
+        members = aois[aois["region_id"] == region_id]
+        geom = region_geoms[region_id]
+
+        out_dir = REGION_DATA_DIR / region_id
         out_dir.mkdir(parents=True, exist_ok=True)
 
-        images = s2.filterBounds(geom).toList(100)
-        count = images.size().getInfo()
+        dates = region_scenes.groupby("date")["image_id"].agg(list)
+
+        print(f"Queueing {len(dates)} dates for {region_id} "
+              f"({len(members)} mines)")
 
-        print(f"Downloading {count} images for {mine_id}")
+        for date, image_ids in dates.items():
+            if all((m, date) in done for m in members["mine_id"]):
+                continue
+
+            # Scenes on disk from before the catalog existed
+            paths = {m: RAW_DATA_DIR / m / f"{date}.tif" for m in members["mine_id"]}
+            if all(p.exists() and reusable(m, date) for m, p in paths.items()):
+                legacy = {m: p for m, p in paths.items() if (m, date) not in done}
+                for p in legacy.values():
+                    if not is_cog(p):
+                        to_cog(p)
+                adopted += [{"mine_id": m, "date": date, "status": "complete", **file_info(p)}
+                            for m, p in legacy.items()]
+                continue
 
-        for i in range(count):
-            img = ee.Image(images.get(i))
-            date = ee.Date(img.get("system:time_start")).format("YYYY-MM-dd").getInfo()
+            stale = {m for m, p in paths.items() if p.exists() and not reusable(m, date)}
 
             out_path = out_dir / f"{date}.tif"
-            if out_path.exists():
+            clipped = scene_image(image_ids, prepare=mask_s2_clouds).clip(geom)
+            jobs.append((
+                lambda image=clipped, g=geom: download_url(image, g),
+                out_path
+            ))
+            pending[out_path] = (members, date, stale)
+
+    if adopted:
+        catalog.record_many(SCENE_PRODUCT, scene_hash, adopted)
+
+    print(f"Downloading {len(jobs)} scenes with {DOWNLOAD_WORKERS} workers")
+
+    with DownloadEngine(max_workers=DOWNLOAD_WORKERS,
+                        max_bytes_per_sec=MAX_BANDWIDTH) as engine:
+        for result in engine.run(jobs):
+            members, date, stale = pending[result["path"]]
+            if result["status"] == "failed":
+                catalog.record_many(SCENE_PRODUCT, scene_hash, [
+                    {"mine_id": m, "date": date, "status": "failed"}
+                    for m in members["mine_id"]
+                ])
                 continue
 
-            print(f"  Downloading {date}")
-            clipped = img.clip(geom)
-            download_image(clipped, geom, out_path)
-            time.sleep(2)
+            print(f"  {result['status'].capitalize()} {result['path']}")
+            written = split_region_scene(result["path"], members, date, overwrite=stale)
+            catalog.record_many(SCENE_PRODUCT, scene_hash, [
+                {"mine_id": m, "date": date, "status": "complete", **file_info(p)}
+                if p is not None else
+                {"mine_id": m, "date": date, "status": "empty"}
+                for m, p in written.items()
+            ])
+            # the old crops are gone, and so is what was done with them
+            catalog.forget(SCENE_PRODUCT, [(m, date) for m in stale], keep=scene_hash)
+
+    # Append new acquisitions to each mine's time-series cube
+    for mine_id in aois["mine_id"]:
+        update_cube(mine_id, raw_dir=RAW_DATA_DIR)
+
+    if own_catalog:
+        catalog.close()
+
+    return scenes
+
+
+# =========================
+# MAIN PIPELINE
+# =========================
+def main():
+    print("ENTERED main()")
+
+    init_gee()
+    print("GEE INITIALIZED")
+
+    mines = load_mine_polygons("data/vectors/CILS_mines_polygon")
+    print("Mines loaded:", len(mines))
+
+    aois = prepare_mine_aois(mines).head(5)
+    print("AOIs prepared:", len(aois))
+
+    download_scenes(aois)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,293 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+
+import pandas as pd
+
+from src import instrumentation
+
+
+# =========================
+# CONFIG
+# =========================
+MAX_RUNNING = 4        # concurrent export tasks (EE per-user quota)
+POLL_INTERVAL = 15     # seconds between batched status polls
+MAX_RETRIES = 3        # re-submissions after a failed/cancelled task
+BACKOFF_BASE = 30      # seconds, doubled per retry
+BACKOFF_MAX = 600
+TASK_TIMEOUT = 6 * 3600  # seconds per attempt before the task is cancelled
+MAX_UNLISTED_POLLS = 4   # polls a started task may be missing from the task list
+
+ACTIVE_STATES = {"UNSUBMITTED", "READY", "RUNNING", "CANCEL_REQUESTED"}
+DONE_STATE = "COMPLETED"
+FAILED_STATES = {"FAILED", "CANCELLED"}
+
+
+# =========================
+# BACKENDS
+# =========================
+class EarthEngineBackend:
+    """
+    Earth Engine batch tasks. A job spec is a zero-argument callable
+    returning an unstarted `ee.batch.Task` (e.g. a lambda around
+    `ee.batch.Export.image.toDrive(...)`), so each retry builds a fresh task.
+    """
+
+    def start(self, spec):
+        task = spec()
+        task.start()
+        return task.id
+
+    def list_statuses(self):
+        """
+        States of all of the user's recent tasks in one request.
+        """
+        import ee
+
+        return {
+            t["id"]: {"state": t["state"], "error": t.get("error_message")}
+            for t in ee.data.getTaskList()
+        }
+
+    def cancel(self, task_id):
+        import ee
+
+        ee.data.cancelTask(task_id)
+
+
+class LocalBackend:
+    """
+    In-process stand-in for Earth Engine: a job spec is a callable run
+    on a thread pool, and raising marks the task FAILED. Used to test
+    the manager without network access.
+    """
+
+    def __init__(self, max_workers=8):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.lock = threading.Lock()
+        self.tasks = {}
+        self.ids = count(1)
+        self.list_calls = 0
+        self.max_running_seen = 0
+
+    def start(self, spec):
+        task_id = f"LOCAL_{next(self.ids):06d}"
+        with self.lock:
+            self.tasks[task_id] = {"state": "READY", "error": None}
+        self.pool.submit(self._run, task_id, spec)
+        return task_id
+
+    def _run(self, task_id, spec):
+        with self.lock:
+            self.tasks[task_id]["state"] = "RUNNING"
+            running = sum(t["state"] == "RUNNING" for t in self.tasks.values())
+            self.max_running_seen = max(self.max_running_seen, running)
+        try:
+            spec()
+            state, error = DONE_STATE, None
+        except Exception as e:
+            state, error = "FAILED", str(e)
+        with self.lock:
+            if self.tasks[task_id]["state"] != "CANCELLED":
+                self.tasks[task_id] = {"state": state, "error": error}
+
+    def list_statuses(self):
+        with self.lock:
+            self.list_calls += 1
+            return {task_id: dict(t) for task_id, t in self.tasks.items()}
+
+    def cancel(self, task_id):
+        # the thread cannot be stopped; its result is ignored
+        with self.lock:
+            self.tasks[task_id] = {"state": "CANCELLED", "error": "cancelled"}
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+
+# =========================
+# TASK MANAGER
+# =========================
+class ExportJob:
+    def __init__(self, name, spec, meta=None):
+        self.name = name
+        self.spec = spec
+        self.meta = meta or {}
+        self.state = "QUEUED"
+        self.task_id = None
+        self.attempts = 0
+        self.error = None
+        self.not_before = 0.0
+        self.started = None
+        self.attempt_started = None
+        self.unlisted = 0
+        self.finished = None
+
+
+class ExportManager:
+    """
+    Runs export jobs with at most `max_running` tasks in flight.
+
+    - queued jobs are started as slots free up
+    - all running tasks are checked with one `list_statuses()` call
+      per poll instead of one status request per task
+    - FAILED / CANCELLED tasks are re-submitted up to `max_retries`
+      times, waiting `backoff_base * 2**(attempt-1)` seconds (capped)
+    - so are tasks running longer than `task_timeout` (cancelled
+      first) and tasks missing from `max_unlisted_polls` polls in a
+      row, so a lost task cannot keep `run()` waiting forever
+    - `run()` returns a per-job completion report
+    - `on_update(job)` is called whenever a job starts, completes or
+      fails, e.g. to keep an artifact catalog in sync
+    """
+
+    def __init__(self, backend=None, max_running=MAX_RUNNING,
+                 poll_interval=POLL_INTERVAL, max_retries=MAX_RETRIES,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX,
+                 task_timeout=TASK_TIMEOUT, max_unlisted_polls=MAX_UNLISTED_POLLS,
+                 on_update=None, sleep=time.sleep, clock=time.monotonic):
+        self.backend = backend or EarthEngineBackend()
+        self.max_running = max_running
+        self.poll_interval = poll_interval
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.task_timeout = task_timeout
+        self.max_unlisted_polls = max_unlisted_polls
+        self.on_update = on_update or (lambda job: None)
+        self.sleep = sleep
+        self.clock = clock
+        self.jobs = []
+
+    def submit(self, name, spec, **meta):
+        job = ExportJob(name, spec, meta)
+        self.jobs.append(job)
+        return job
+
+    # -------------------------
+    # Scheduling
+    # -------------------------
+    def _running(self):
+        return [j for j in self.jobs if j.state == "RUNNING"]
+
+    def _start_ready(self):
+        free = self.max_running - len(self._running())
+        now = self.clock()
+
+        for job in self.jobs:
+            if free <= 0:
+                break
+            if job.state != "QUEUED" or job.not_before > now:
+                continue
+
+            job.attempts += 1
+            try:
+                job.task_id = self.backend.start(job.spec)
+            except Exception as e:
+                # submission itself failed (quota, bad region, ...)
+                instrumentation.record("export.submit", error=True)
+                self._failed(job, str(e))
+                continue
+
+            instrumentation.record("export.submit")
+            job.state = "RUNNING"
+            job.started = job.started or now
+            job.attempt_started = now
+            job.unlisted = 0
+            free -= 1
+            self.on_update(job)
+            print(f"⬆ Export started: {job.name} ({job.task_id}, attempt {job.attempts})")
+
+    def _failed(self, job, error):
+        job.error = error
+        if job.attempts <= self.max_retries:
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (job.attempts - 1))
+            job.state = "QUEUED"
+            job.not_before = self.clock() + delay
+            print(f"⚠ Export failed: {job.name} ({error}); retrying in {delay:.0f}s")
+        else:
+            job.state = "FAILED"
+            job.finished = self.clock()
+            job.started = job.started or job.finished
+            instrumentation.record("export.task", job.finished - job.started,
+                                   retries=job.attempts - 1, error=True)
+            self.on_update(job)
+            print(f"❌ Export failed for good: {job.name} ({error})")
+
+    def _poll(self):
+        start = time.perf_counter()
+        statuses = self.backend.list_statuses()
+        instrumentation.record("export.poll", time.perf_counter() - start)
+
+        now = self.clock()
+        for job in self._running():
+            status = statuses.get(job.task_id)
+            if status is None:
+                # new tasks can take a poll or two to show up
+                job.unlisted += 1
+                if job.unlisted >= self.max_unlisted_polls:
+                    self._failed(job, f"task not listed in {job.unlisted} polls")
+                continue
+            job.unlisted = 0
+
+            if status["state"] in ACTIVE_STATES:
+                if now - job.attempt_started > self.task_timeout:
+                    self._cancel(job)
+                    self._failed(job, f"timed out after {self.task_timeout:.0f}s")
+                continue
+
+            if status["state"] == DONE_STATE:
+                job.state = DONE_STATE
+                job.error = None
+                job.finished = self.clock()
+                instrumentation.record("export.task", job.finished - job.started,
+                                       retries=job.attempts - 1)
+                self.on_update(job)
+                print(f"✅ Export complete: {job.name}")
+            elif status["state"] in FAILED_STATES:
+                self._failed(job, status.get("error") or status["state"])
+
+    def _cancel(self, job):
+        try:
+            self.backend.cancel(job.task_id)
+        except Exception as e:
+            print(f"⚠ Could not cancel {job.name} ({job.task_id}): {e}")
+
+    # -------------------------
+    # Main loop
+    # -------------------------
+    def run(self):
+        """
+        Start, poll and retry until every job is COMPLETED or FAILED.
+        """
+        while any(j.state in ("QUEUED", "RUNNING") for j in self.jobs):
+            self._start_ready()
+            self.sleep(self.poll_interval)
+            self._poll()
+
+        report = self.report()
+        done = int((report["state"] == DONE_STATE).sum())
+        print(f"📋 Exports: {done}/{len(report)} completed, "
+              f"{len(report) - done} failed, "
+              f"{int(report['attempts'].sum() - len(report))} retries")
+        return report
+
+    def report(self):
+        columns = ["name", "state", "task_id", "attempts", "seconds", "error"]
+        meta = list(dict.fromkeys(k for j in self.jobs for k in j.meta))
+
+        rows = [
+            {
+                **j.meta,
+                "name": j.name,
+                "state": j.state,
+                "task_id": j.task_id,
+                "attempts": j.attempts,
+                "seconds": (j.finished - j.started)
+                if j.finished is not None and j.started is not None else None,
+                "error": j.error,
+            }
+            for j in self.jobs
+        ]
+        return pd.DataFrame(rows, columns=meta + columns)
@@ -1,13 +1,18 @@
+import hashlib
+import json
 import geopandas as gpd
 import pandas as pd
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import shapely
 from pathlib import Path
 
 
-def load_mine_polygons(vector_dir: str, target_crs: str = "EPSG:4326"):
-    """
-    Load mine polygon data, validate CRS, and assign unique mine IDs.
-    """
+MINES_CACHE_DIR = Path("data/cache/mines")
+CACHE_ROW_GROUP_SIZE = 2048  # rows; small groups let ID/bbox filters skip data
+
 
+def find_polygon_file(vector_dir):
     vector_dir = Path(vector_dir)
 
     # Load polygon data (supports SHP or GeoJSON)
@@ -16,7 +21,27 @@ def load_mine_polygons(vector_dir: str, target_crs: str = "EPSG:4326"):
     if not polygon_files:
         raise FileNotFoundError("No polygon files found in directory")
 
-    gdf = gpd.read_file(polygon_files[0])
+    return polygon_files[0]
+
+
+def source_fingerprint(source, target_crs):
+    """
+    Hash of the layer's files (name, size, mtime) and target CRS.
+    Any edit to the shapefile or its sidecars changes it.
+    """
+    source = Path(source)
+    files = sorted(p for p in source.parent.glob(source.stem + ".*") if p.is_file())
+    entries = [[p.name, p.stat().st_size, p.stat().st_mtime_ns] for p in files]
+    blob = json.dumps([entries, target_crs]).encode()
+    return hashlib.sha1(blob).hexdigest()[:16]
+
+
+def read_validated_layer(source, target_crs):
+    """
+    Full layer read through the Arrow-backed pyogrio engine, reprojected,
+    with mine IDs assigned and invalid geometries dropped.
+    """
+    gdf = gpd.read_file(source, engine="pyogrio", use_arrow=True)
 
     # CRS validation
     if gdf.crs is None:
@@ -35,6 +60,89 @@ def load_mine_polygons(vector_dir: str, target_crs: str = "EPSG:4326"):
     return gdf
 
 
+def load_mine_polygons(vector_dir: str, target_crs: str = "EPSG:4326",
+                       columns=None, bbox=None, mine_ids=None,
+                       cache_dir=MINES_CACHE_DIR):
+    """
+    Load mine polygon data, validate CRS, and assign unique mine IDs.
+
+    The validated, reprojected layer is cached as GeoParquet keyed by
+    the source files' fingerprint, so later calls only read the
+    requested `columns` and the row groups matching `mine_ids` or
+    `bbox` (minx, miny, maxx, maxy in `target_crs`). Cached and
+    uncached calls return the same rows.
+    """
+    source = find_polygon_file(vector_dir)
+
+    if cache_dir is None:
+        return _filter(read_validated_layer(source, target_crs),
+                       columns, bbox, mine_ids)
+
+    key = source_fingerprint(source, target_crs)
+    cache_path = Path(cache_dir) / f"{source.stem}_{key}.parquet"
+
+    if not cache_path.exists():
+        gdf = read_validated_layer(source, target_crs)
+
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        for stale in cache_path.parent.glob(f"{source.stem}_*.parquet"):
+            stale.unlink()
+
+        tmp = cache_path.with_suffix(".tmp")
+        gdf.to_parquet(tmp, index=True, write_covering_bbox=True,
+                       row_group_size=CACHE_ROW_GROUP_SIZE)
+        tmp.replace(cache_path)
+
+        return _filter(gdf, columns, bbox, mine_ids)
+
+    return _filter(read_cache(cache_path, target_crs, columns, bbox, mine_ids),
+                   columns, bbox, None)
+
+
+def read_cache(cache_path, target_crs, columns=None, bbox=None, mine_ids=None):
+    """
+    Cached layer read straight through pyarrow, with `mine_ids` and the
+    covering `bbox` pushed down to row groups. The CRS is the one the
+    cache was built for rather than the stored PROJJSON: pyproj takes
+    about 30 ms to parse it, longer than reading 5000 mines.
+    """
+    schema = pq.read_schema(cache_path)
+    keep = [c for c in schema.names
+            if c != "bbox" and not c.startswith("__index_level_")]
+    if columns is not None:
+        keep = [c for c in keep if c in set(columns) | {"mine_id", "geometry"}]
+
+    filters = None
+    if mine_ids is not None:
+        filters = pc.field("mine_id").isin(list(mine_ids))
+    if bbox is not None:
+        overlaps = ~((pc.field(("bbox", "xmin")) > bbox[2])
+                     | (pc.field(("bbox", "ymin")) > bbox[3])
+                     | (pc.field(("bbox", "xmax")) < bbox[0])
+                     | (pc.field(("bbox", "ymax")) < bbox[1]))
+        filters = overlaps if filters is None else filters & overlaps
+
+    df = pq.read_table(cache_path, columns=keep, filters=filters,
+                       use_pandas_metadata=True).to_pandas()
+    df["geometry"] = gpd.GeoSeries.from_wkb(df["geometry"], index=df.index,
+                                            crs=target_crs)
+    return gpd.GeoDataFrame(df, geometry="geometry", crs=target_crs)
+
+
+def _filter(gdf, columns, bbox, mine_ids):
+    """
+    In-memory filters; `bbox` keeps mines that actually intersect the
+    box, not only those whose bounds overlap it.
+    """
+    if mine_ids is not None:
+        gdf = gdf[gdf["mine_id"].isin(list(mine_ids))]
+    if bbox is not None:
+        gdf = gdf[gdf.intersects(shapely.box(*bbox))]
+    if columns is not None:
+        gdf = gdf[list(dict.fromkeys(list(columns) + ["mine_id", "geometry"]))]
+    return gdf
+
+
 def create_mine_metadata(gdf: gpd.GeoDataFrame):
     """
     Create mine metadata table (non-geometry attributes).
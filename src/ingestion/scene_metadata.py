@@ -0,0 +1,89 @@
+import ee
+import pandas as pd
+
+from src import instrumentation
+from src.ingestion.sentinel_access import build_time_series_metadata
+
+
+# =========================
+# CONFIG
+# =========================
+S2_COLLECTION = "COPERNICUS/S2_SR_HARMONIZED"
+
+METADATA_PROPERTIES = [
+    "system:index",
+    "system:time_start",
+    "CLOUDY_PIXEL_PERCENTAGE",
+    "system:footprint",
+]
+
+
+# =========================
+# BATCHED METADATA FETCH
+# =========================
+def scene_metadata_query(collection):
+    """
+    Server-side list of [id, time_start, cloud, footprint] rows for
+    every image in `collection`. Not evaluated until getInfo().
+    """
+    return collection.reduceColumns(
+        ee.Reducer.toList(len(METADATA_PROPERTIES)),
+        METADATA_PROPERTIES
+    ).get("list")
+
+
+def rows_to_metadata(mine_id, rows):
+    """
+    Turn reduceColumns rows into the acquisition metadata table.
+    """
+    rows = rows or []
+    time_start = pd.to_datetime([r[1] for r in rows], unit="ms", utc=True)
+
+    df = build_time_series_metadata(
+        mine_id,
+        dates=time_start.strftime("%Y-%m-%d"),
+        cloud_covers=[r[2] for r in rows],
+        image_ids=[r[0] for r in rows],
+        footprints=[r[3] for r in rows],
+    )
+    return df.sort_values(["date", "image_id"], ignore_index=True)
+
+
+def fetch_scene_metadata(collection, mine_id):
+    """
+    Dates, image IDs, cloud percentages and footprints for a whole
+    filtered collection in a single round trip (no toList cap).
+    """
+    rows = instrumentation.get_info(scene_metadata_query(collection), "ee.scene_metadata")
+    return rows_to_metadata(mine_id, rows)
+
+
+def fetch_scene_metadata_many(collections):
+    """
+    Metadata for several `{mine_id: collection}` entries in one request.
+    """
+    query = instrumentation.get_info(ee.Dictionary({
+        mine_id: scene_metadata_query(ic)
+        for mine_id, ic in collections.items()
+    }), "ee.scene_metadata")
+
+    frames = [rows_to_metadata(mine_id, query.get(mine_id))
+              for mine_id in collections]
+    return pd.concat(frames, ignore_index=True) if frames else rows_to_metadata(None, [])
+
+
+# =========================
+# IMAGES BY DATE
+# =========================
+def scene_image(image_ids, prepare=None):
+    """
+    Image for one acquisition date. Several tiles on the same date
+    are mosaicked so each date yields a single product.
+    """
+    images = [ee.Image(f"{S2_COLLECTION}/{i}") for i in image_ids]
+    if prepare is not None:
+        images = [prepare(img) for img in images]
+
+    if len(images) == 1:
+        return images[0]
+    return ee.ImageCollection(images).mosaic()
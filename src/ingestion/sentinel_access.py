@@ -1,58 +1,305 @@
+import hashlib
 import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
 from shapely.geometry import box
 from pathlib import Path
-import pandas as pd
 
 
-def build_mine_aoi(mine_geom, source_crs, buffer_m=500):
+AOI_CACHE_DIR = Path("data/cache/aoi")
+
+AOI_MODES = ("bbox", "polygon")
+MAX_AOI_VERTICES = 64    # per buffered polygon, keeps ee.Geometry payloads small
+SIMPLIFY_START_M = 5     # first simplification tolerance (half a 10 m pixel)
+SIMPLIFY_MAX_STEPS = 12  # tolerance doubles each step (5 m .. ~10 km)
+SIMPLIFY_MAX_BUFFER_FRACTION = 0.5  # tolerance cap, as a share of the buffer
+
+
+# -------------------------------
+# Local metric CRS
+# -------------------------------
+
+def utm_epsg(lon, lat):
     """
-    Build AOI by buffering in a projected CRS (meters),
-    then return bounding box in EPSG:4326.
+    EPSG code of the WGS84 UTM zone containing each lon/lat point.
+    Works element-wise on arrays.
+    """
+    lon = np.asarray(lon, dtype=float)
+    lat = np.asarray(lat, dtype=float)
+
+    zone = (np.floor((lon + 180.0) / 6.0).astype(int) % 60) + 1
+    return np.where(lat >= 0, 32600 + zone, 32700 + zone)
+
+
+def utm_zones(geoms):
+    """
+    UTM EPSG code per EPSG:4326 geometry, from its centroid.
+    """
+    centroids = shapely.centroid(np.asarray(geoms, dtype=object))
+    return utm_epsg(shapely.get_x(centroids), shapely.get_y(centroids))
+
+
+def geometry_hashes(geoms):
+    """
+    Stable per-geometry hash (SHA-1 of the WKB) used as AOI cache key.
+    """
+    wkbs = shapely.to_wkb(np.asarray(geoms), hex=False)
+    return np.array([hashlib.sha1(w).hexdigest() for w in wkbs], dtype=object)
+
+
+# -------------------------------
+# Batched AOI construction
+# -------------------------------
+
+def buffer_mines(mines_gdf, buffer_m=500):
     """
+    Buffer every mine by `buffer_m` meters in its local UTM zone
+    and return the buffered geometries in EPSG:4326.
 
-    # Create temporary GeoDataFrame
-    gdf = gpd.GeoDataFrame(
-        geometry=[mine_geom],
-        crs=source_crs
+    Mines are grouped by UTM zone so each zone is reprojected,
+    buffered and reprojected back in a single vectorized pass.
+    """
+    geoms = mines_gdf.geometry
+    if geoms.crs is not None and geoms.crs.to_epsg() != 4326:
+        geoms = geoms.to_crs(epsg=4326)
+
+    epsg = utm_zones(geoms.values)
+
+    buffered = np.empty(len(geoms), dtype=object)
+    for code in np.unique(epsg):
+        sel = np.flatnonzero(epsg == code)
+        zone = geoms.iloc[sel].to_crs(epsg=int(code))
+        buffered[sel] = zone.buffer(buffer_m).to_crs(epsg=4326).values
+
+    return gpd.GeoSeries(buffered, index=mines_gdf.index, crs="EPSG:4326")
+
+
+def _cached_per_geometry(keys, cache_path, columns, compute):
+    """
+    Per-geometry CSV cache keyed by geometry hash. `compute(missing)`
+    returns rows (in `columns` order) for the boolean `missing` selection.
+    """
+    cached = pd.DataFrame(columns=columns)
+    if cache_path is not None and cache_path.exists():
+        cached = pd.read_csv(cache_path, index_col="geom_hash",
+                             float_precision="round_trip")
+
+    missing = ~pd.Index(keys).isin(cached.index)
+
+    if missing.any():
+        fresh = pd.DataFrame(
+            compute(missing),
+            index=pd.Index(keys[missing], name="geom_hash"),
+            columns=columns
+        )
+        cached = fresh if cached.empty else pd.concat([cached, fresh])
+        cached = cached[~cached.index.duplicated(keep="last")]
+
+        if cache_path is not None:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            cached.rename_axis("geom_hash").to_csv(cache_path)
+
+    return cached.loc[keys, columns]
+
+
+def build_mine_aoi_bounds(mines_gdf, buffer_m=500, cache_dir=AOI_CACHE_DIR):
+    """
+    Buffered AOI bounds (minx, miny, maxx, maxy) in EPSG:4326
+    for every mine, as an (N, 4) array.
+
+    Bounds are cached on disk per `buffer_m`, keyed by geometry hash,
+    so only new or edited geometries are buffered on repeat runs.
+    """
+    keys = geometry_hashes(mines_gdf.geometry.values)
+    cache_path = None
+    if cache_dir is not None:
+        cache_path = Path(cache_dir) / f"aoi_bounds_{buffer_m}m.csv"
+
+    bounds = _cached_per_geometry(
+        keys, cache_path, ["minx", "miny", "maxx", "maxy"],
+        lambda missing: buffer_mines(mines_gdf[missing], buffer_m=buffer_m).bounds.values
     )
+    return bounds.to_numpy(dtype=float)
 
-    # Reproject to a metric CRS (Web Mercator)
-    gdf_proj = gdf.to_crs(epsg=3857)
 
-    # Buffer in meters
-    buffered = gdf_proj.buffer(buffer_m)
+# -------------------------------
+# Polygon AOIs with a vertex budget
+# -------------------------------
 
-    # Back to lat/lon
-    buffered_latlon = buffered.to_crs(epsg=4326)
+def simplify_to_budget(geoms, max_vertices=MAX_AOI_VERTICES,
+                       start_tolerance=SIMPLIFY_START_M,
+                       max_steps=SIMPLIFY_MAX_STEPS, max_tolerance=np.inf):
+    """
+    Topology-preserving simplification of projected (metric) geometries
+    until each has at most `max_vertices` coordinates.
 
-    minx, miny, maxx, maxy = buffered_latlon.total_bounds
-    return box(minx, miny, maxx, maxy)
+    The tolerance doubles per step up to `max_tolerance` and is applied
+    to the original geometry each time, only for geometries still over
+    budget, so some may end up over budget.
+    Returns (simplified geometries, tolerance used per geometry in m).
+    """
+    geoms = np.asarray(geoms, dtype=object)
+    out = geoms.copy()
+    tolerance = np.zeros(len(geoms))
+
+    over = shapely.get_num_coordinates(out) > max_vertices
+    tol = min(float(start_tolerance), max_tolerance)
+    for _ in range(max_steps):
+        if not over.any() or tol <= 0:
+            break
+        out[over] = shapely.simplify(geoms[over], tol, preserve_topology=True)
+        tolerance[over] = tol
+        over &= shapely.get_num_coordinates(out) > max_vertices
+        if tol >= max_tolerance:
+            break
+        tol = min(tol * 2, max_tolerance)
+
+    return out, tolerance
 
 
-def prepare_mine_aois(mines_gdf, buffer_m=500):
-    aois = []
+def buffer_mines_simplified(mines_gdf, buffer_m=500, max_vertices=MAX_AOI_VERTICES):
+    """
+    Buffered mine polygons (EPSG:4326) simplified in their UTM zone to
+    at most `max_vertices` coordinates, plus the tolerance used (m).
+
+    The tolerance stays below `buffer_m`, so simplification cannot cut
+    into the mine. Mines still over budget, or not covered by their
+    simplified polygon, get the bounding box of the buffered mine.
+    """
+    geoms = mines_gdf.geometry
+    if geoms.crs is not None and geoms.crs.to_epsg() != 4326:
+        geoms = geoms.to_crs(epsg=4326)
 
-    for _, mine in mines_gdf.iterrows():
-        aoi_geom = build_mine_aoi(
-            mine.geometry,
-            source_crs=mines_gdf.crs,
-            buffer_m=buffer_m
+    epsg = utm_zones(geoms.values)
+
+    simplified = np.empty(len(geoms), dtype=object)
+    tolerance = np.zeros(len(geoms))
+    for code in np.unique(epsg):
+        sel = np.flatnonzero(epsg == code)
+        zone = geoms.iloc[sel].to_crs(epsg=int(code)).buffer(buffer_m)
+        simple, tolerance[sel] = simplify_to_budget(
+            zone.values, max_vertices,
+            max_tolerance=buffer_m * SIMPLIFY_MAX_BUFFER_FRACTION
         )
+        simple = gpd.GeoSeries(simple, crs=zone.crs).to_crs(epsg=4326).values
+
+        fallback = ((shapely.get_num_coordinates(simple) > max_vertices)
+                    | ~shapely.covers(simple, geoms.values[sel]))
+        buffered = zone[fallback].to_crs(epsg=4326).values
+        simple[fallback] = shapely.envelope(buffered)
+        simplified[sel] = simple
+
+    return gpd.GeoSeries(simplified, index=mines_gdf.index, crs="EPSG:4326"), tolerance
+
+
+def build_mine_aoi_polygons(mines_gdf, buffer_m=500, max_vertices=MAX_AOI_VERTICES,
+                            cache_dir=AOI_CACHE_DIR):
+    """
+    Simplified buffered AOI polygons in EPSG:4326 for every mine,
+    cached like `build_mine_aoi_bounds` (as WKB) per buffer and budget.
+    """
+    keys = geometry_hashes(mines_gdf.geometry.values)
+    cache_path = None
+    if cache_dir is not None:
+        # v2: tolerance capped below the buffer, bbox fallback
+        cache_path = Path(cache_dir) / f"aoi_polygons_v2_{buffer_m}m_{max_vertices}v.csv"
+
+    def compute(missing):
+        simplified, _ = buffer_mines_simplified(
+            mines_gdf[missing], buffer_m=buffer_m, max_vertices=max_vertices
+        )
+        return shapely.to_wkb(simplified.values, hex=True)
+
+    wkb = _cached_per_geometry(keys, cache_path, ["wkb"], compute)
+    return shapely.from_wkb(wkb["wkb"].to_numpy())
+
+
+def utm_areas(geoms):
+    """
+    Area in m² of EPSG:4326 geometries, each measured in its UTM zone.
+    """
+    geoms = gpd.GeoSeries(np.asarray(geoms, dtype=object), crs="EPSG:4326")
+    epsg = utm_zones(geoms.values)
+
+    areas = np.zeros(len(geoms))
+    for code in np.unique(epsg):
+        sel = np.flatnonzero(epsg == code)
+        areas[sel] = geoms.iloc[sel].to_crs(epsg=int(code)).area.values
+    return areas
 
-        aois.append({
-            "mine_id": mine["mine_id"],
-            "geometry": aoi_geom
-        })
 
-    return gpd.GeoDataFrame(aois, crs="EPSG:4326")
+def aoi_pixel_savings(mines_gdf, buffer_m=500, max_vertices=MAX_AOI_VERTICES,
+                      scale=10, cache_dir=AOI_CACHE_DIR):
+    """
+    Per-mine pixels processed in bbox vs polygon AOI mode at `scale`.
+    """
+    bboxes = shapely.box(*build_mine_aoi_bounds(mines_gdf, buffer_m, cache_dir).T)
+    polygons = build_mine_aoi_polygons(mines_gdf, buffer_m, max_vertices, cache_dir)
+
+    pixel_area = scale * scale
+    report = pd.DataFrame({
+        "mine_id": mines_gdf["mine_id"].to_numpy(),
+        "n_vertices": shapely.get_num_coordinates(polygons),
+        "bbox_pixels": np.round(utm_areas(bboxes) / pixel_area).astype(int),
+        "polygon_pixels": np.round(utm_areas(polygons) / pixel_area).astype(int),
+    })
+    report["saved_pixels"] = report["bbox_pixels"] - report["polygon_pixels"]
+    report["saved_pct"] = 100 * report["saved_pixels"] / report["bbox_pixels"]
+    return report
+
+
+def build_mine_aoi(mine_geom, source_crs, buffer_m=500):
+    """
+    Build AOI by buffering in the local UTM zone (meters),
+    then return bounding box in EPSG:4326.
+    """
+    gdf = gpd.GeoDataFrame(geometry=[mine_geom], crs=source_crs)
+    minx, miny, maxx, maxy = buffer_mines(gdf, buffer_m=buffer_m).total_bounds
+    return box(minx, miny, maxx, maxy)
 
 
-def build_time_series_metadata(mine_id, dates, cloud_covers):
+def prepare_mine_aois(mines_gdf, buffer_m=500, cache_dir=AOI_CACHE_DIR,
+                      mode="bbox", max_vertices=MAX_AOI_VERTICES):
+    """
+    Build AOIs for all mines in one batched pass.
+
+    mode="bbox"    : bounding box of the buffered mine
+    mode="polygon" : buffered mine polygon, simplified to `max_vertices`
+    """
+    if mode not in AOI_MODES:
+        raise ValueError(f"Unknown AOI mode {mode!r}, expected one of {AOI_MODES}")
+
+    if mode == "polygon":
+        geometry = build_mine_aoi_polygons(mines_gdf, buffer_m=buffer_m,
+                                           max_vertices=max_vertices,
+                                           cache_dir=cache_dir)
+    else:
+        bounds = build_mine_aoi_bounds(mines_gdf, buffer_m=buffer_m,
+                                       cache_dir=cache_dir)
+        geometry = shapely.box(*bounds.T)
+
+    return gpd.GeoDataFrame(
+        {"mine_id": mines_gdf["mine_id"].to_numpy()},
+        geometry=geometry,
+        crs="EPSG:4326"
+    )
+
+
+def build_time_series_metadata(mine_id, dates, cloud_covers,
+                               image_ids=None, footprints=None):
     """
     Create metadata table for Sentinel-2 acquisitions.
     """
-    return pd.DataFrame({
+    df = pd.DataFrame({
         "mine_id": mine_id,
         "date": dates,
         "cloud_cover": cloud_covers
     })
+
+    if image_ids is not None:
+        df["image_id"] = list(image_ids)
+    if footprints is not None:
+        df["footprint"] = list(footprints)
+
+    return df
@@ -0,0 +1,370 @@
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:  # optional; /proc covers Linux
+    psutil = None
+
+
+METRICS_DIR = Path("outputs/metrics")
+METRICS_FILE = "metrics.jsonl"
+PROMETHEUS_FILE = "metrics.prom"
+ENV_VAR = "MINING_METRICS_DIR"
+PREFIX = "mining"
+
+# Active Recorder, or None when instrumentation is off (the default).
+# Every hook checks this first, so disabled runs pay one global lookup.
+_recorder = None
+
+# Labels (phase, mine_id, ...) of the enclosing scope
+_labels = contextvars.ContextVar("metric_labels", default={})
+
+
+def peak_rss_bytes():
+    """
+    Process high-water-mark RSS in bytes (None where unsupported).
+    Only ever grows, so on its own it says nothing about one scope.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def rss_bytes():
+    """
+    Current process RSS in bytes (None where unsupported).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, AttributeError, ValueError):
+        pass
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    return None
+
+
+def memory_snapshot():
+    return rss_bytes(), peak_rss_bytes()
+
+
+def memory_change(before):
+    """
+    (RSS delta, high-water-mark growth) in bytes since `before`, a
+    memory_snapshot(); either is None where unsupported. The growth
+    is how far the scope pushed the process peak, so it is non-zero
+    only for scopes that used more memory than anything before them.
+    """
+    after = memory_snapshot()
+    return tuple(None if a is None or b is None else a - b
+                 for a, b in zip(after, before))
+
+
+# =========================
+# RECORDER
+# =========================
+class Recorder:
+    """
+    Aggregates per-(operation, labels) calls, seconds, bytes, retries
+    and errors, streams each observation to a JSON-lines file and
+    writes a Prometheus text-format snapshot on flush().
+    """
+
+    def __init__(self, out_dir=METRICS_DIR):
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.totals = {}
+        self.memory = {}
+        self.events = open(self.out_dir / METRICS_FILE, "a")
+
+    def emit(self, event):
+        self.events.write(json.dumps(event, default=str) + "\n")
+
+    def observe(self, op, seconds=0.0, bytes=0, retries=0, error=False,
+                calls=1, **labels):
+        labels = {**_labels.get(), **labels}
+        key = (op, tuple(sorted(labels.items())))
+
+        event = {"ts": time.time(), "op": op, "seconds": seconds, "bytes": bytes,
+                 "retries": retries, "error": error, **labels}
+
+        with self.lock:
+            total = self.totals.setdefault(
+                key, {"calls": 0, "seconds": 0.0, "bytes": 0, "retries": 0, "errors": 0}
+            )
+            total["calls"] += calls
+            total["seconds"] += seconds
+            total["bytes"] += bytes
+            total["retries"] += retries
+            total["errors"] += int(error)
+            self.emit(event)
+
+    def scope_memory(self, rss_delta, peak_growth, **labels):
+        """
+        RSS change and peak growth of one scope; the largest per labels
+        is kept for the snapshot.
+        """
+        labels = {**_labels.get(), **labels}
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            delta, growth = self.memory.get(key, (rss_delta, peak_growth))
+            self.memory[key] = (max(delta, rss_delta), max(growth, peak_growth))
+            self.emit({"ts": time.time(), "op": "memory", "rss_delta": rss_delta,
+                       "peak_growth": peak_growth, **labels})
+
+    def replay(self, events):
+        """
+        Fold in events a worker process recorded with a BufferedRecorder.
+        """
+        for event in events:
+            event = dict(event)
+            event.pop("ts", None)
+            op = event.pop("op")
+            if op == "memory":
+                self.scope_memory(**event)
+            else:
+                self.observe(op, **event)
+
+    def prometheus(self):
+        """
+        Totals in Prometheus text exposition format.
+        """
+        def fmt(labels):
+            if not labels:
+                return ""
+            body = ",".join(
+                '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+                for k, v in labels
+            )
+            return "{" + body + "}"
+
+        metrics = [
+            ("calls", "counter", "Instrumented calls"),
+            ("seconds", "counter", "Wall time in seconds"),
+            ("bytes", "counter", "Bytes transferred"),
+            ("retries", "counter", "Retries before success or failure"),
+            ("errors", "counter", "Failed calls"),
+        ]
+
+        lines = []
+        with self.lock:
+            for field, kind, help_text in metrics:
+                name = f"{PREFIX}_{field}_total"
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                for (op, labels), total in sorted(self.totals.items()):
+                    lines.append(f"{name}{fmt((('op', op),) + labels)} {total[field]}")
+
+            gauges = [
+                ("rss_delta_bytes", "RSS change over a scope"),
+                ("peak_growth_bytes", "Growth of the process peak RSS during a scope"),
+            ]
+            for i, (field, help_text) in enumerate(gauges):
+                name = f"{PREFIX}_scope_{field}"
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+                for labels, values in sorted(self.memory.items()):
+                    lines.append(f"{name}{fmt(labels)} {values[i]}")
+
+        return "\n".join(lines) + "\n"
+
+    def flush(self):
+        with self.lock:
+            self.events.flush()
+        tmp = self.out_dir / (PROMETHEUS_FILE + ".tmp")
+        tmp.write_text(self.prometheus())
+        tmp.replace(self.out_dir / PROMETHEUS_FILE)
+
+    def close(self):
+        self.flush()
+        self.events.close()
+
+
+class BufferedRecorder(Recorder):
+    """
+    Recorder that keeps its events in memory instead of writing files,
+    for worker processes that send them back with their result.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.totals = {}
+        self.memory = {}
+        self.buffer = []
+
+    def emit(self, event):
+        self.buffer.append(event)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+# =========================
+# SWITCH
+# =========================
+def enable(out_dir=METRICS_DIR):
+    global _recorder
+    if _recorder is None:
+        _recorder = Recorder(out_dir)
+        print(f"📊 Metrics enabled → {_recorder.out_dir}")
+    return _recorder
+
+
+def enable_from_env():
+    """
+    Enable when MINING_METRICS_DIR is set; returns the recorder or None.
+    """
+    out_dir = os.environ.get(ENV_VAR)
+    return enable(out_dir) if out_dir else None
+
+
+def disable():
+    """
+    Write the final snapshot and switch instrumentation off.
+    """
+    global _recorder
+    if _recorder is not None:
+        _recorder.close()
+        _recorder = None
+
+
+def enabled():
+    return _recorder is not None
+
+
+# =========================
+# HOOKS
+# =========================
+def record(op, seconds=0.0, bytes=0, retries=0, error=False, **labels):
+    """
+    Record one observation measured by the caller.
+    """
+    if _recorder is not None:
+        _recorder.observe(op, seconds, bytes, retries, error, **labels)
+
+
+def timed(op):
+    """
+    Decorator: count calls and wall time of a function under `op`.
+    """
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _recorder is None:
+                return func(*args, **kwargs)
+
+            start = time.perf_counter()
+            error = True
+            try:
+                result = func(*args, **kwargs)
+                error = False
+                return result
+            finally:
+                _recorder.observe(op, time.perf_counter() - start, error=error)
+
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def scope(**labels):
+    """
+    Label everything recorded inside (e.g. phase="area_severity" or
+    mine_id="MINE_0001"), and record the scope's own wall time and
+    its memory_change().
+    """
+    if _recorder is None:
+        yield
+        return
+
+    token = _labels.set({**_labels.get(), **labels})
+    before = memory_snapshot()
+    start = time.perf_counter()
+    error = True
+    try:
+        yield
+        error = False
+    finally:
+        current = _labels.get()
+        _labels.reset(token)
+
+        op = "phase" if "phase" in labels else "scope"
+        if "mine_id" in labels:
+            op = "mine"
+        _recorder.observe(op, time.perf_counter() - start, error=error, **current)
+
+        rss_delta, peak_growth = memory_change(before)
+        if rss_delta is not None:
+            _recorder.scope_memory(rss_delta, peak_growth or 0, **current)
+
+
+def collect(func, *args, **labels):
+    """
+    `func(*args)` inside scope(**labels) with a BufferedRecorder, for
+    jobs running in spawn workers, which have no recorder of their own.
+    Returns (result, events); pass the events to replay() in the parent.
+    """
+    global _recorder
+    outer, _recorder = _recorder, BufferedRecorder()
+    try:
+        with scope(**labels):
+            result = func(*args)
+        return result, _recorder.buffer
+    finally:
+        _recorder = outer
+
+
+def replay(events):
+    """
+    Record events collected in a worker as if they happened here,
+    under the current labels.
+    """
+    if _recorder is not None and events:
+        _recorder.replay(events)
+
+
+def bind_context(func):
+    """
+    Wrap `func` so each call runs in a copy of the caller's labels,
+    for work handed to thread pools.
+    """
+    if _recorder is None:
+        return func
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.copy().run(func, *args, **kwargs)
+
+
+def get_info(obj, op="ee.getInfo"):
+    """
+    `obj.getInfo()` counted as one Earth Engine round trip, with the
+    size of the JSON response as bytes received.
+    """
+    if _recorder is None:
+        return obj.getInfo()
+
+    start = time.perf_counter()
+    try:
+        result = obj.getInfo()
+    except Exception:
+        _recorder.observe(op, time.perf_counter() - start, error=True)
+        raise
+
+    size = len(json.dumps(result, default=str))
+    _recorder.observe(op, time.perf_counter() - start, bytes=size)
+    return result
@@ -0,0 +1,203 @@
+import hashlib
+import json
+import pickle
+from pathlib import Path
+
+from src import instrumentation
+
+
+ARTIFACT_DIR = Path("data/cache/artifacts")
+
+
+# =========================
+# PHASE DECLARATION
+# =========================
+class Phase:
+    """
+    One pipeline step.
+
+    name     : artifact name this phase produces
+    func     : func(config, **inputs) -> artifact value
+    inputs   : names of upstream artifacts passed to `func` by name
+    config   : config keys that affect the output
+    files    : files written as a side effect; a missing file forces a re-run
+    sources  : sources(config, **inputs) -> paths read from disk; their
+               fingerprint is part of the key, so new data re-runs the phase
+    version  : bump when the phase logic changes
+    """
+
+    def __init__(self, name, func, inputs=(), config=(), files=(), sources=None,
+                 version=1):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.config = tuple(config)
+        self.files = tuple(Path(f) for f in files)
+        self.sources = sources
+        self.version = version
+
+    def key(self, config, input_hashes, sources=None):
+        """
+        Hash of everything that determines this phase's output: config,
+        the content hashes of the upstream artifacts and the fingerprint
+        of any source files.
+        """
+        payload = {
+            "phase": self.name,
+            "version": self.version,
+            "config": {k: config[k] for k in self.config},
+            "inputs": {name: input_hashes[name] for name in self.inputs},
+            "sources": sources,
+        }
+        blob = json.dumps(payload, sort_keys=True, default=str).encode()
+        return hashlib.sha256(blob).hexdigest()[:16]
+
+
+# =========================
+# ARTIFACT STORE
+# =========================
+class ArtifactStore:
+    """
+    Phase outputs on disk as <root>/<phase>/<key>.pkl plus a JSON
+    manifest recording the config and inputs that produced them and
+    the SHA-256 of the pickled value.
+    """
+
+    def __init__(self, root=ARTIFACT_DIR):
+        self.root = Path(root)
+
+    def path(self, name, key):
+        return self.root / name / f"{key}.pkl"
+
+    def has(self, name, key):
+        return self.path(name, key).exists()
+
+    def content_hash(self, name, key):
+        """
+        Hash of the stored value, or None for artifacts saved without one.
+        """
+        manifest = self.path(name, key).with_suffix(".json")
+        if not manifest.exists():
+            return None
+        return json.loads(manifest.read_text()).get("content")
+
+    def load(self, name, key):
+        with open(self.path(name, key), "rb") as f:
+            return pickle.load(f)
+
+    def save(self, name, key, value, manifest):
+        """
+        Store `value` and return the hash of its pickled bytes.
+        """
+        path = self.path(name, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        content = hashlib.sha256(blob).hexdigest()[:16]
+
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(blob)
+        tmp.replace(path)
+
+        path.with_suffix(".json").write_text(
+            json.dumps(dict(manifest, content=content), indent=2, sort_keys=True,
+                       default=str)
+        )
+        return content
+
+
+# =========================
+# DAG RUNNER
+# =========================
+def topological_order(phases):
+    by_name = {p.name: p for p in phases}
+    order, seen = [], set()
+
+    def visit(phase, stack=()):
+        if phase.name in seen:
+            return
+        if phase.name in stack:
+            raise ValueError(f"cycle through {phase.name}")
+        for dep in phase.inputs:
+            if dep not in by_name:
+                raise KeyError(f"{phase.name} needs unknown input {dep}")
+            visit(by_name[dep], stack + (phase.name,))
+        seen.add(phase.name)
+        order.append(phase)
+
+    for phase in phases:
+        visit(phase)
+    return order
+
+
+def run_dag(phases, config, store=None, force=()):
+    """
+    Run phases in dependency order, skipping any whose key already has
+    a stored artifact. Keys chain through the content hash of each
+    upstream artifact, so a forced or re-run phase that produces a
+    different value re-runs everything below it, and one that produces
+    the same value does not. Artifacts are loaded only when a
+    downstream phase actually needs to run.
+
+    Returns {phase name: {"key", "status", "content"}}.
+    """
+    store = store or ArtifactStore()
+    keys, hashes, values, report = {}, {}, {}, {}
+
+    def value_of(name):
+        if name not in values:
+            values[name] = store.load(name, keys[name])
+        return values[name]
+
+    for phase in topological_order(phases):
+        sources = None
+        if phase.sources is not None:
+            inputs = {name: value_of(name) for name in phase.inputs}
+            sources = file_fingerprint(phase.sources(config, **inputs))
+
+        key = phase.key(config, hashes, sources)
+        keys[phase.name] = key
+
+        content = store.content_hash(phase.name, key)
+        cached = (
+            phase.name not in force
+            and content is not None
+            and store.has(phase.name, key)
+            and all(f.exists() for f in phase.files)
+        )
+
+        if cached:
+            print(f"⏭ {phase.name} unchanged ({key})")
+            hashes[phase.name] = content
+            report[phase.name] = {"key": key, "status": "cached", "content": content}
+            continue
+
+        print(f"▶ {phase.name} ({key})")
+        with instrumentation.scope(phase=phase.name):
+            inputs = {name: value_of(name) for name in phase.inputs}
+            value = phase.func(config, **inputs)
+
+        content = store.save(phase.name, key, value, {
+            "phase": phase.name,
+            "key": key,
+            "config": {k: config[k] for k in phase.config},
+            "inputs": {name: hashes[name] for name in phase.inputs},
+            "sources": sources,
+        })
+        values[phase.name] = value
+        hashes[phase.name] = content
+        report[phase.name] = {"key": key, "status": "ran", "content": content}
+
+    return report
+
+
+def file_fingerprint(paths):
+    """
+    Cheap fingerprint (path, size, mtime) of source files, used as
+    config so edited inputs invalidate downstream artifacts.
+    """
+    entries = []
+    for p in sorted(Path(x) for x in paths):
+        st = p.stat()
+        entries.append([p.as_posix(), st.st_size, st.st_mtime_ns])
+    return hashlib.sha256(json.dumps(entries).encode()).hexdigest()[:16]
@@ -1,5 +1,9 @@
+import numpy as np
+import pandas as pd
 from operator import itemgetter
 
+from src.processing.risk_scoring import alert_array, alert_level, impact_array
+
 # =========================
 # INPUT (FROM PHASE 4 & 5.1)
 # =========================
@@ -12,15 +16,25 @@ mine_metrics = {
 }
 
 # =========================
-# ALERT LOGIC
+# RANKING TABLE
 # =========================
-def alert_level(risk):
-    if risk == "HIGH":
-        return "🚨 IMMEDIATE INSPECTION"
-    elif risk == "MODERATE":
-        return "⚠ INCREASED MONITORING"
-    else:
-        return "✅ NO ACTION"
+def rank_mines(classified):
+    """
+    Impact score, alert and priority rank for a classified table
+    (mine_id, area_ha, severity, risk), highest impact first.
+
+    Columnar: see risk_scoring.RiskRanking to keep a ranking
+    up to date as single mines are re-scored.
+    """
+    ranked = classified[["mine_id", "area_ha", "severity", "risk"]].copy()
+    ranked["severity"] = pd.to_numeric(ranked["severity"], errors="coerce")
+    ranked["impact"] = impact_array(ranked["area_ha"], ranked["severity"])
+    ranked["alert"] = alert_array(ranked["risk"])
+
+    ranked = ranked.sort_values("impact", ascending=False, kind="stable",
+                                na_position="last", ignore_index=True)
+    ranked.insert(0, "rank", np.arange(1, len(ranked) + 1))
+    return ranked
 
 # =========================
 # MAIN
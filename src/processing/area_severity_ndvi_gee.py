@@ -1,6 +1,12 @@
+import argparse
 import ee
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from src import instrumentation
 from src.ingestion.load_mines import load_mine_polygons
 from src.ingestion.sentinel_access import prepare_mine_aois
+from src.ingestion.aoi_clustering import MAX_TILE_PIXELS, cluster_mine_aois, tile_aois
+from src.processing.masks import mask_scl_ee
 
 # =========================
 # CONFIG
@@ -14,6 +20,10 @@ NDVI_DROP_THRESHOLD = -0.2
 MIN_PERSISTENCE = 3
 PIXEL_AREA_M2 = 100  # 10m x 10m
 
+BACKEND = "gee"  # "gee", "local" (downloaded GeoTIFFs) or "incremental"
+BATCH_SIZE = 250  # mines (or tiles) per reduceRegions request
+REDUCE_WORKERS = 4  # concurrent reduceRegions requests
+
 # =========================
 # INIT GEE
 # =========================
@@ -28,91 +38,235 @@ def add_ndvi(image):
     ndvi = image.normalizedDifference(["B8", "B4"]).rename("NDVI")
     return image.addBands(ndvi)
 
+
+def ndvi_collection(aois, start_date=START_DATE, end_date=END_DATE,
+                    max_cloud=MAX_CLOUD):
+    """
+    Cloud-masked NDVI collection over the AOIs. Pixels outside
+    VALID_SCL are masked, as in the local backend.
+    """
+    return (
+        ee.ImageCollection("COPERNICUS/S2_SR_HARMONIZED")
+        .filterDate(start_date, end_date)
+        .filter(ee.Filter.lt("CLOUDY_PIXEL_PERCENTAGE", max_cloud))
+        .filterBounds(mine_feature_collection(aois))
+        .select(["B4", "B8", "SCL"])
+        .map(mask_scl_ee)
+        .map(add_ndvi)
+    )
+
 # =========================
-# MAIN
+# CHANGE PRODUCTS (BUILT ONCE)
 # =========================
-def main():
-    init_gee()
+def change_images(s2, threshold=NDVI_DROP_THRESHOLD,
+                  min_persistence=MIN_PERSISTENCE):
+    """
+    Persistent-change and mean-dNDVI images for the whole collection.
 
-    mines = load_mine_polygons("data/vectors/CILS_mines_polygon")
-    aois = prepare_mine_aois(mines).head(MAX_MINES)
+    Every step is per-pixel, so one graph serves all mines: a pixel's
+    baseline and counts only depend on the scenes covering it.
+    """
+    baseline = s2.select("NDVI").median()
 
-    print(f"Running Phase 4.3 for {len(aois)} mines")
+    def add_metrics(image):
+        dndvi = image.select("NDVI").subtract(baseline)
+        mask = dndvi.lt(threshold)
+        return image.addBands([
+            dndvi.rename("dNDVI"),
+            mask.rename("change_mask")
+        ])
 
-    s2 = (
-        ee.ImageCollection("COPERNICUS/S2_SR_HARMONIZED")
-        .filterDate(START_DATE, END_DATE)
-        .filter(ee.Filter.lt("CLOUDY_PIXEL_PERCENTAGE", MAX_CLOUD))
-        .select(["B4", "B8"])
-        .map(add_ndvi)
+    ic = s2.map(add_metrics)
+
+    persistent = (
+        ic.select("change_mask")
+        .sum()
+        .gte(min_persistence)
+        .rename("persistent_change")
     )
+    mean_dndvi = ic.select("dNDVI").mean()
+
+    return persistent, mean_dndvi
 
-    for _, row in aois.iterrows():
-        mine_id = row["mine_id"]
-        geom = ee.Geometry.Polygon(list(row.geometry.exterior.coords))
 
-        mine_ic = s2.filterBounds(geom)
+def area_severity_image(persistent, mean_dndvi):
+    """
+    Persistent area (m2), plus the sum and weight of dNDVI over
+    persistent pixels, so severity can be merged across tiles.
+    """
+    severity = mean_dndvi.updateMask(persistent)
+    return (
+        persistent.multiply(PIXEL_AREA_M2).rename("area_m2")
+        .addBands(severity.rename("severity_sum"))
+        .addBands(ee.Image.constant(1).updateMask(severity.mask()).rename("severity_n"))
+    )
 
-        baseline = mine_ic.select("NDVI").median().clip(geom)
 
-        def add_metrics(image):
-            dndvi = image.select("NDVI").subtract(baseline)
-            mask = dndvi.lt(NDVI_DROP_THRESHOLD)
-            return image.addBands([
-                dndvi.rename("dNDVI"),
-                mask.rename("change_mask")
-            ])
+def area_severity_reducer():
+    """
+    Sum of every band in one pass. The reducer weights pixels the same
+    way ee.Reducer.mean() does, so severity_sum / severity_n equals the
+    mean dNDVI, and both add up across tiles.
+    """
+    return ee.Reducer.sum()
 
-        ic = mine_ic.map(add_metrics)
 
-        # -------------------------
-        # Persistent Change Mask
-        # -------------------------
-        persistent = (
-            ic.select("change_mask")
-            .sum()
-            .gte(MIN_PERSISTENCE)
-            .rename("persistent_change")
+def mine_feature_collection(aois):
+    tile_ids = aois["tile_id"] if "tile_id" in aois else [0] * len(aois)
+    return ee.FeatureCollection([
+        ee.Feature(
+            ee.Geometry(geom.__geo_interface__),  # bbox or polygon AOI
+            {"mine_id": mine_id, "tile_id": int(tile_id)}
         )
+        for mine_id, tile_id, geom in zip(aois["mine_id"], tile_ids, aois.geometry)
+    ])
+
+
+# =========================
+# BATCHED REDUCTION
+# =========================
+def features_to_table(features):
+    """
+    reduceRegions features (one per mine tile) -> mine_id / area_ha /
+    severity table. Tile sums are added before dividing, so the merge
+    is exact. Mines without persistent pixels get area 0 and severity None.
+    """
+    tiles = pd.DataFrame(
+        [
+            {
+                "mine_id": f["properties"]["mine_id"],
+                "area_m2": f["properties"].get("area_m2") or 0,
+                "severity_sum": f["properties"].get("severity_sum") or 0,
+                "severity_n": f["properties"].get("severity_n") or 0,
+            }
+            for f in features
+        ],
+        columns=["mine_id", "area_m2", "severity_sum", "severity_n"]
+    )
+    mines = tiles.groupby("mine_id", sort=False).sum()
+
+    severity = (mines["severity_sum"] / mines["severity_n"]).astype(object)
+    severity[mines["severity_n"] <= 0] = None
+
+    return pd.DataFrame({
+        "mine_id": mines.index,
+        "area_ha": (mines["area_m2"] / 10_000).to_numpy(),
+        "severity": severity.to_numpy(),
+    })
+
+
+def reduce_area_severity(image, aois, batch_size=BATCH_SIZE, scale=10,
+                         max_tile_pixels=MAX_TILE_PIXELS, workers=REDUCE_WORKERS):
+    """
+    Area and severity for all mines with one reduceRegions request
+    per `batch_size` features, instead of two getInfo calls per mine.
+
+    AOIs above `max_tile_pixels` are split into tiles first so no single
+    region hits Earth Engine memory or time limits; batches run
+    concurrently on `workers` threads.
+    """
+    tiles = tile_aois(aois, max_pixels=max_tile_pixels, scale=scale)
+    if len(tiles) > len(aois):
+        print(f"🧩 {len(tiles) - len(aois)} extra tiles for large mines")
 
-        # -------------------------
-        # AREA (ha)
-        # -------------------------
-        area_m2 = (
-            persistent
-            .multiply(PIXEL_AREA_M2)
-            .reduceRegion(
-                reducer=ee.Reducer.sum(),
-                geometry=geom,
-                scale=10,
-                maxPixels=1e13
-            )
-            .get("persistent_change")
+    def reduce_batch(batch):
+        stats = image.reduceRegions(
+            collection=mine_feature_collection(batch),
+            reducer=area_severity_reducer(),
+            scale=scale
         )
+        columns = ["mine_id", "tile_id", "area_m2", "severity_sum", "severity_n"]
+        result = stats.select(columns, None, False)
+        return instrumentation.get_info(result, "ee.reduce_regions")["features"]
 
-        area_ha = ee.Number(area_m2).divide(10_000)
-
-        # -------------------------
-        # SEVERITY SCORE
-        # -------------------------
-        mean_dndvi = ic.select("dNDVI").mean()
-
-        severity = (
-    mean_dndvi
-    .updateMask(persistent)
-    .reduceRegion(
-        reducer=ee.Reducer.mean(),
-        geometry=geom,
-        scale=10,
-        maxPixels=1e13
+    batches = [tiles.iloc[start:start + batch_size]
+               for start in range(0, len(tiles), batch_size)]
+    print(f"📦 {len(tiles)} tiles in {len(batches)} batched reduceRegions requests")
+
+    features = []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(batches)))) as pool:
+        for batch_features in pool.map(instrumentation.bind_context(reduce_batch), batches):
+            features.extend(batch_features)
+
+    return features_to_table(features)
+
+# =========================
+# PHASE 4.3
+# =========================
+def compute_area_severity(aois, backend=BACKEND, start_date=START_DATE,
+                          end_date=END_DATE, max_cloud=MAX_CLOUD,
+                          threshold=NDVI_DROP_THRESHOLD,
+                          min_persistence=MIN_PERSISTENCE, compact=False):
+    """
+    Area (ha) and severity per mine as a mine_id/area_ha/severity table.
+    `compact` makes the local backend compute and write its change
+    maps as int16 (see compact_ndvi); the other backends ignore it.
+    """
+    if backend == "local":
+        from src.processing.change_detection_local import run_local
+        from src.processing.parallel import WORKERS
+
+        print(f"Running Phase 4.3 (local) for {len(aois)} mines on {WORKERS} processes")
+        return run_local(
+            aois["mine_id"],
+            workers=WORKERS,
+            threshold=threshold,
+            min_persistence=min_persistence,
+            compact=compact
+        )
+
+    if backend == "incremental":
+        from src.ingestion.download_sentinel2_gee import download_scenes
+        from src.processing.incremental_monitoring import StateStore, run_incremental
+
+        # Fetch only acquisitions after the last processed one
+        store = StateStore()
+        since = store.since(aois["mine_id"], default=start_date)
+        print(f"Running Phase 4.3 (incremental) for {len(aois)} mines "
+              f"since {since}")
+
+        init_gee()
+        download_scenes(aois, start_date=since, end_date=end_date,
+                        max_cloud=max_cloud)
+        return run_incremental(
+            aois["mine_id"], store,
+            threshold=threshold,
+            min_persistence=min_persistence
+        )
+
+    init_gee()
+
+    # Order mines by shared region so each batch is spatially compact
+    aois, _ = cluster_mine_aois(aois)
+    aois = aois.sort_values(["region_id", "mine_id"], ignore_index=True)
+
+    print(f"Running Phase 4.3 for {len(aois)} mines")
+
+    s2 = ndvi_collection(aois, start_date, end_date, max_cloud)
+    persistent, mean_dndvi = change_images(s2, threshold, min_persistence)
+    results = reduce_area_severity(
+        area_severity_image(persistent, mean_dndvi), aois
     )
-    .get("dNDVI")
-)
 
-        print(f"✅ {mine_id} | Area (ha):", area_ha.getInfo(),
-              "| Severity:", severity.getInfo())
+    for _, r in results.iterrows():
+        print(f"✅ {r['mine_id']} | Area (ha):", r["area_ha"],
+              "| Severity:", r["severity"])
+
+    return results
+
+# =========================
+# MAIN
+# =========================
+def main(backend=BACKEND):
+    mines = load_mine_polygons("data/vectors/CILS_mines_polygon")
+    aois = prepare_mine_aois(mines).head(MAX_MINES)
+
+    results = compute_area_severity(aois, backend=backend)
 
     print("🎉 PHASE 4.3 COMPLETE")
+    return results
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=["gee", "local", "incremental"], default=BACKEND)
+    main(backend=parser.parse_args().backend)
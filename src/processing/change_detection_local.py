@@ -0,0 +1,351 @@
+import numpy as np
+import pandas as pd
+import rasterio
+from contextlib import ExitStack
+from pathlib import Path
+from rasterio.enums import Resampling
+from rasterio.vrt import WarpedVRT
+from rasterio.windows import Window
+
+from src import instrumentation
+from src.ingestion.cog import COG_BLOCKSIZE, aligned_block_size, to_cog
+from src.processing import compact_ndvi
+from src.processing.masks import load_scene_mask, scl_valid
+from src.processing.parallel import fan_out
+
+# =========================
+# CONFIG
+# =========================
+RAW_DATA_DIR = Path("data/raw/sentinel2")
+LOCAL_MAPS_DIR = Path("outputs/maps/local")
+
+NDVI_DROP_THRESHOLD = -0.2
+MIN_PERSISTENCE = 3
+PIXEL_AREA_M2 = 100  # 10m x 10m
+
+BLOCK_ROWS = 256   # rows per windowed read
+BLOCK_COLS = 1024  # columns per windowed read (bounds memory for wide mines)
+# (both rounded up to whole internal blocks of tiled/COG scenes)
+
+CHANGE_MAP_BANDS = ["mean_dndvi", "change_count"]
+
+# Band positions (1-based) used when a file has no band descriptions
+BAND_INDEX = {"B4": 4, "B8": 8, "SCL": None}
+
+
+# =========================
+# SCENE ACCESS
+# =========================
+def list_scenes(mine_id, raw_dir=RAW_DATA_DIR):
+    """
+    Downloaded scenes for a mine as [(date, path)], oldest first.
+    """
+    return [(p.stem, p) for p in sorted(Path(raw_dir, mine_id).glob("*.tif"))]
+
+
+def band_indexes(src):
+    """
+    1-based indexes of B4, B8 and SCL (None if absent) in a scene.
+    Earth Engine downloads name bands in the descriptions.
+    """
+    names = {d: i + 1 for i, d in enumerate(src.descriptions) if d}
+    return {band: names.get(band, default) for band, default in BAND_INDEX.items()}
+
+
+def pixel_area_m2(src):
+    if src.crs is not None and src.crs.is_projected:
+        return abs(src.transform.a * src.transform.e)
+    return PIXEL_AREA_M2
+
+
+def open_aligned(paths, stack):
+    """
+    Open every scene on the grid of the first one. Scenes on a
+    different grid are read through a WarpedVRT so windows line up.
+    """
+    ref = stack.enter_context(rasterio.open(paths[0]))
+    datasets = [ref]
+
+    for path in paths[1:]:
+        src = stack.enter_context(rasterio.open(path))
+        if (src.crs, src.transform, src.shape) != (ref.crs, ref.transform, ref.shape):
+            src = stack.enter_context(WarpedVRT(
+                src, crs=ref.crs, transform=ref.transform,
+                width=ref.width, height=ref.height,
+                resampling=Resampling.nearest
+            ))
+        datasets.append(src)
+
+    return ref, datasets
+
+
+def scene_masks(paths, datasets):
+    """
+    Bit-packed valid masks stored next to the scenes (see
+    split_region_scene), None for scenes without one or read through
+    a WarpedVRT (their mask is on another grid).
+    """
+    return [
+        None if isinstance(src, WarpedVRT) else load_scene_mask(path, src.shape)
+        for path, src in zip(paths, datasets)
+    ]
+
+
+def read_scl_mask(src, idx, window, mask=None):
+    """
+    Valid mask of one scene in a window: its stored mask when there is
+    one (the SCL band is then not read), else from the SCL band, None
+    for scenes without SCL.
+    """
+    if mask is not None:
+        return mask.window(window)
+    if idx["SCL"] is None:
+        return None
+    return scl_valid(src.read(idx["SCL"], window=window))
+
+
+def tile_windows(height, width, block_rows=BLOCK_ROWS, block_cols=BLOCK_COLS):
+    """
+    Row-major grid of windows covering a height x width raster.
+    """
+    for row_off in range(0, height, block_rows):
+        for col_off in range(0, width, block_cols):
+            yield Window(col_off, row_off,
+                         min(block_cols, width - col_off),
+                         min(block_rows, height - row_off))
+
+
+def read_ndvi_block(datasets, window, masks=None):
+    """
+    NDVI stack (time, rows, cols) for one window, NaN where masked.
+    `masks` are the scenes' stored masks (see scene_masks); with a
+    stored mask the SCL band is not read.
+    """
+    rows, cols = int(window.height), int(window.width)
+    ndvi = np.full((len(datasets), rows, cols), np.nan, dtype=np.float32)
+    masks = masks or [None] * len(datasets)
+
+    for t, (src, mask) in enumerate(zip(datasets, masks)):
+        idx = band_indexes(src)
+        red, nir = src.read([idx["B4"], idx["B8"]], window=window).astype(np.float32)
+
+        valid = (red + nir) > 0  # Earth Engine writes masked pixels as 0
+        scl_mask = read_scl_mask(src, idx, window, mask)
+        if scl_mask is not None:
+            valid &= scl_mask
+
+        np.divide(nir - red, nir + red, out=ndvi[t], where=valid)
+
+    return ndvi
+
+
+def read_ndvi_block_int16(datasets, window, out, scratch, masks=None):
+    """
+    Scaled int16 NDVI stack for one window (see compact_ndvi), written
+    into views of the reusable `out` (time, rows, cols) and `scratch`
+    buffers, which must be at least the window size.
+    """
+    rows, cols = int(window.height), int(window.width)
+    ndvi = out[:, :rows, :cols]
+    masks = masks or [None] * len(datasets)
+
+    for t, (src, mask) in enumerate(zip(datasets, masks)):
+        idx = band_indexes(src)
+        red, nir = src.read([idx["B4"], idx["B8"]], window=window)
+        valid = read_scl_mask(src, idx, window, mask)
+        compact_ndvi.ndvi_int16(red, nir, valid, out=ndvi[t], scratch=scratch[:rows, :cols])
+
+    return ndvi
+
+
+def change_block(ndvi, threshold):
+    """
+    Per-pixel mean dNDVI (NaN without observations) and change count
+    for a float NDVI stack.
+    """
+    observed = ~np.isnan(ndvi)
+    has_obs = observed.any(axis=0)
+
+    baseline = np.full(ndvi.shape[1:], np.nan, dtype=np.float32)
+    baseline[has_obs] = np.nanmedian(ndvi[:, has_obs], axis=0)
+
+    dndvi = ndvi - baseline
+    change_count = np.sum(dndvi < threshold, axis=0)
+
+    # mean dNDVI over valid observations, per pixel
+    obs_count = observed.sum(axis=0)
+    dndvi_sum = np.nansum(dndvi, axis=0)
+    mean_dndvi = np.divide(dndvi_sum, obs_count,
+                           out=np.full_like(dndvi_sum, np.nan),
+                           where=obs_count > 0)
+    return mean_dndvi, change_count
+
+
+def change_block_int16(ndvi, threshold):
+    """
+    `change_block` on scaled int16 NDVI: mean dNDVI is scaled int16
+    with NODATA, and every step stays in integers.
+    """
+    baseline = compact_ndvi.median_int16(ndvi)
+    dndvi = compact_ndvi.dndvi_int16(ndvi, baseline)
+    change_count = compact_ndvi.below(dndvi, threshold).sum(axis=0)
+    return compact_ndvi.mean_int16(dndvi), change_count
+
+
+def open_change_map(path, ref, compact=False):
+    """
+    Tiled GeoTIFF on the reference grid for per-pixel mean dNDVI and
+    change count, filled window by window: float32 with NaN, or with
+    `compact` int16 with mean dNDVI scaled by compact_ndvi.SCALE.
+    """
+    profile = {
+        "driver": "GTiff",
+        "dtype": "int16" if compact else "float32",
+        "nodata": compact_ndvi.NODATA if compact else np.nan,
+        "count": len(CHANGE_MAP_BANDS), "width": ref.width, "height": ref.height,
+        "crs": ref.crs, "transform": ref.transform,
+        "tiled": True, "blockxsize": COG_BLOCKSIZE, "blockysize": COG_BLOCKSIZE,
+    }
+    dst = rasterio.open(path, "w", **profile)
+    dst.descriptions = tuple(CHANGE_MAP_BANDS)
+    if compact:
+        dst.scales = (1 / compact_ndvi.SCALE, 1.0)
+    return dst
+
+
+# =========================
+# PHASES 4.1 – 4.3 (LOCAL)
+# =========================
+@instrumentation.timed("local.mine_change_metrics")
+def mine_change_metrics(paths, threshold=NDVI_DROP_THRESHOLD,
+                        min_persistence=MIN_PERSISTENCE, block_rows=BLOCK_ROWS,
+                        block_cols=BLOCK_COLS, change_map=None, compact=False):
+    """
+    Median NDVI baseline, dNDVI, change mask, persistence, area and
+    severity for one mine, computed tile by tile so memory is
+    bounded by `block_rows` x `block_cols` x time whatever the mine size.
+    Tiles are merged like the Earth Engine tiles: sums and counts add.
+
+    Mirrors the Earth Engine graph in area_severity_ndvi_gee:
+    masked observations are ignored by median/sum/mean.
+
+    With `change_map` set, per-pixel mean dNDVI and change count are
+    also written there as a COG (the local counterpart of the
+    Earth Engine change-map export).
+
+    With `compact`, NDVI and dNDVI are scaled int16 throughout (half
+    the memory of float32, and an int16 change map); results agree
+    with the float path to the bounds documented in compact_ndvi.
+    """
+    with ExitStack() as stack:
+        ref, datasets = open_aligned(paths, stack)
+        masks = scene_masks(paths, datasets)
+        area_per_pixel = pixel_area_m2(ref)
+        block_rows, block_cols = aligned_block_size(ref, block_rows, block_cols)
+
+        if change_map is not None:
+            change_map = Path(change_map)
+            change_map.parent.mkdir(parents=True, exist_ok=True)
+            part_path = change_map.with_name(change_map.name + ".part")
+            dst = stack.enter_context(open_change_map(part_path, ref, compact))
+
+        if compact:
+            # one set of buffers for every window of this mine
+            rows, cols = min(block_rows, ref.height), min(block_cols, ref.width)
+            ndvi_buf = np.empty((len(datasets), rows, cols), dtype=np.int16)
+            scratch = np.empty((rows, cols), dtype=np.float32)
+
+        persistent_pixels = 0
+        severity_sum = 0.0
+        severity_count = 0
+
+        for window in tile_windows(ref.height, ref.width, block_rows, block_cols):
+            if compact:
+                ndvi = read_ndvi_block_int16(datasets, window, ndvi_buf, scratch, masks)
+                mean_dndvi, change_count = change_block_int16(ndvi, threshold)
+                has_mean = mean_dndvi != compact_ndvi.NODATA
+                to_float = 1 / compact_ndvi.SCALE
+            else:
+                ndvi = read_ndvi_block(datasets, window, masks)
+                mean_dndvi, change_count = change_block(ndvi, threshold)
+                has_mean = ~np.isnan(mean_dndvi)
+                to_float = 1.0
+
+            persistent = change_count >= min_persistence
+
+            if change_map is not None:
+                dst.write(np.stack([mean_dndvi, change_count.astype(mean_dndvi.dtype)]),
+                          window=window)
+
+            sel = persistent & has_mean
+            persistent_pixels += int(persistent.sum())
+            severity_sum += float(mean_dndvi[sel].sum(dtype=np.float64)) * to_float
+            severity_count += int(sel.sum())
+
+    if change_map is not None:
+        to_cog(part_path, change_map)
+        part_path.unlink()
+
+    return {
+        "area_ha": persistent_pixels * area_per_pixel / 10_000,
+        "severity": severity_sum / severity_count if severity_count else None,
+        "n_scenes": len(paths),
+    }
+
+
+def mine_job(paths, change_map, kwargs):
+    return mine_change_metrics(paths, change_map=change_map, **kwargs)
+
+
+def run_local(mine_ids, raw_dir=RAW_DATA_DIR, maps_dir=None, workers=1, **kwargs):
+    """
+    Area and severity table for mines with downloaded scenes.
+    With `maps_dir` (e.g. LOCAL_MAPS_DIR) each mine's change map is
+    written there as <mine_id>_ndvi_change.tif.
+
+    With `workers > 1` mines run on a process pool, largest scene
+    volume first; rows keep the order of `mine_ids`.
+    """
+    jobs = {}
+    for mine_id in mine_ids:
+        scenes = list_scenes(mine_id, raw_dir)
+        if not scenes:
+            print(f"⚠ {mine_id}: no downloaded scenes in {raw_dir}")
+            continue
+
+        change_map = Path(maps_dir, f"{mine_id}_ndvi_change.tif") if maps_dir else None
+        jobs[mine_id] = ([p for _, p in scenes], change_map, kwargs)
+
+    def scene_bytes(mine_id):
+        return sum(p.stat().st_size for p in jobs[mine_id][0])
+
+    results = {}
+    for mine_id, metrics in fan_out(mine_job, jobs, workers, cost=scene_bytes):
+        results[mine_id] = metrics
+        print(f"✅ {mine_id} | Area (ha): {metrics['area_ha']:.2f} "
+              f"| Severity: {metrics['severity']}")
+
+    return pd.DataFrame(
+        [{"mine_id": mine_id, **results[mine_id]} for mine_id in jobs],
+        columns=["mine_id", "area_ha", "severity", "n_scenes"]
+    )
+
+
+# =========================
+# PARITY CHECK
+# =========================
+def compare_backends(local_df, gee_df, area_tol_ha=0.5, severity_tol=0.005):
+    """
+    Join local and GEE results per mine and flag differences larger
+    than the tolerances (pixel-edge effects and median ties).
+    """
+    merged = local_df.merge(gee_df, on="mine_id", suffixes=("_local", "_gee"))
+    merged["area_diff"] = (merged["area_ha_local"] - merged["area_ha_gee"]).abs()
+    merged["severity_diff"] = (
+        merged["severity_local"].astype(float) - merged["severity_gee"].astype(float)
+    ).abs()
+    merged["within_tolerance"] = (
+        (merged["area_diff"] <= area_tol_ha)
+        & (merged["severity_diff"].fillna(0) <= severity_tol)
+    )
+    return merged
@@ -1,6 +1,7 @@
 import ee
 from src.ingestion.load_mines import load_mine_polygons
 from src.ingestion.sentinel_access import prepare_mine_aois
+from src.processing.masks import mask_scl_ee
 
 # =========================
 # CONFIG
@@ -40,13 +41,14 @@ def main():
         ee.ImageCollection("COPERNICUS/S2_SR_HARMONIZED")
         .filterDate(START_DATE, END_DATE)
         .filter(ee.Filter.lt("CLOUDY_PIXEL_PERCENTAGE", MAX_CLOUD))
-        .select(["B4", "B8"])
+        .select(["B4", "B8", "SCL"])
+        .map(mask_scl_ee)  # same SCL classes as the local backend
         .map(add_ndvi)
     )
 
     for _, row in aois.iterrows():
         mine_id = row["mine_id"]
-        geom = ee.Geometry.Polygon(list(row.geometry.exterior.coords))
+        geom = ee.Geometry(row.geometry.__geo_interface__)
 
         mine_ic = s2.filterBounds(geom)
 
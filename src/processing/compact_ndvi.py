@@ -0,0 +1,148 @@
+import numpy as np
+
+# -------------------------------
+# Scaled int16 NDVI / dNDVI
+# -------------------------------
+#
+# NDVI and dNDVI are stored as round(value * SCALE) in int16, with
+# NODATA (-32768) for masked pixels. NDVI lies in [-1, 1] and dNDVI in
+# [-2, 2], so both fit in int16 at SCALE = 10 000 (a 1e-4 step).
+#
+# Accuracy against the float32 path (plus float32 round-off, ~1e-8):
+#   NDVI             |error| <= 0.5e-4   (one rounding)
+#   median baseline  |error| <= 1.0e-4   (rounded inputs + halving)
+#   dNDVI            |error| <= 1.5e-4   (NDVI - baseline)
+#   mean dNDVI       |error| <= 2.0e-4   (dNDVI + final rounding)
+# so a `dNDVI < -0.2` test can only differ from the float path for
+# observations within 1.5e-4 of the threshold.
+#
+# Half the bytes of float32 in memory and on disk, and np.sort on
+# 16-bit integers (used for the median) is a radix sort.
+
+SCALE = 10_000
+NODATA = np.iinfo(np.int16).min  # -32768, sorts below every valid value
+
+
+def scaled_threshold(threshold):
+    return int(round(threshold * SCALE))
+
+
+def encode(values, out=None):
+    """
+    Float NDVI/dNDVI -> scaled int16, NaN -> NODATA.
+    """
+    values = np.asarray(values)
+    if out is None:
+        out = np.empty(values.shape, dtype=np.int16)
+    nan = np.isnan(values)
+    np.rint(np.where(nan, 0, values) * SCALE, out=out, casting="unsafe")
+    out[nan] = NODATA
+    return out
+
+
+def decode(scaled, out=None):
+    """
+    Scaled int16 -> float32, NODATA -> NaN.
+    """
+    if out is None:
+        out = np.empty(scaled.shape, dtype=np.float32)
+    np.multiply(scaled, 1.0 / SCALE, out=out, casting="unsafe")
+    out[scaled == NODATA] = np.nan
+    return out
+
+
+def valid(scaled):
+    return scaled != NODATA
+
+
+# -------------------------------
+# NDVI from int16 reflectance
+# -------------------------------
+
+def ndvi_int16(red, nir, mask=None, out=None, scratch=None):
+    """
+    Scaled NDVI from int16 B4/B8 reflectance, NODATA where `mask`
+    is False or red + nir <= 0 (Earth Engine writes masked pixels as 0).
+
+    `out` (int16) and `scratch` (float32, same shape) may be
+    preallocated and reused across scenes or windows.
+    """
+    if out is None:
+        out = np.empty(red.shape, dtype=np.int16)
+    if scratch is None:
+        scratch = np.empty(red.shape, dtype=np.float32)
+
+    total = np.add(nir, red, dtype=np.int32)
+    ok = total > 0
+    if mask is not None:
+        ok &= mask
+
+    np.subtract(nir, red, out=scratch, dtype=np.float32)
+    np.divide(scratch, total, out=scratch, where=ok)
+    scratch *= SCALE
+    np.rint(scratch, out=scratch)
+
+    out[...] = NODATA
+    np.copyto(out, scratch, casting="unsafe", where=ok)
+    return out
+
+
+# -------------------------------
+# Reductions on scaled values
+# -------------------------------
+
+def count_valid(stack, axis=0):
+    return np.count_nonzero(stack != NODATA, axis=axis)
+
+
+def median_int16(stack, axis=0):
+    """
+    Per-pixel median over `axis` ignoring NODATA (np.nanmedian on the
+    scaled integers); even counts average the middle pair, rounded down.
+    """
+    n = stack.shape[axis]
+    ordered = np.sort(stack, axis=axis)  # NODATA first
+    n_valid = count_valid(stack, axis)
+    first = n - n_valid
+
+    lo = np.expand_dims(np.minimum(first + (n_valid - 1) // 2, n - 1), axis)
+    hi = np.expand_dims(np.minimum(first + n_valid // 2, n - 1), axis)
+    pair = (np.take_along_axis(ordered, lo, axis).astype(np.int32)
+            + np.take_along_axis(ordered, hi, axis))
+
+    median = np.squeeze(pair // 2, axis).astype(np.int16)
+    median[n_valid == 0] = NODATA
+    return median
+
+
+def mean_int16(stack, axis=0, return_counts=False):
+    """
+    Per-pixel mean over `axis` ignoring NODATA, rounded to the scale.
+    """
+    ok = stack != NODATA
+    total = np.where(ok, stack, 0).sum(axis=axis, dtype=np.int64)
+    counts = ok.sum(axis=axis)
+
+    mean = np.full(total.shape, NODATA, dtype=np.int16)
+    np.rint(np.divide(total, counts, where=counts > 0, out=np.zeros(total.shape)),
+            out=mean, where=counts > 0, casting="unsafe")
+    return (mean, counts) if return_counts else mean
+
+
+def dndvi_int16(ndvi, baseline, out=None):
+    """
+    Scaled dNDVI = NDVI - baseline, NODATA where either is missing.
+    `baseline` broadcasts over the leading time axis of `ndvi`.
+    """
+    if out is None:
+        out = np.empty(np.broadcast_shapes(ndvi.shape, baseline.shape), dtype=np.int16)
+    np.subtract(ndvi, baseline, out=out, dtype=np.int16)
+    out[(ndvi == NODATA) | (baseline == NODATA)] = NODATA
+    return out
+
+
+def below(scaled, threshold):
+    """
+    Valid values below a float threshold, compared on the integers.
+    """
+    return (scaled < scaled_threshold(threshold)) & (scaled != NODATA)
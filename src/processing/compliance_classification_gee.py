@@ -1,17 +1,17 @@
 import ee
 from src.ingestion.load_mines import load_mine_polygons
 from src.ingestion.sentinel_access import prepare_mine_aois
+from src.processing.risk_scoring import (
+    AREA_HIGH, AREA_MED, SEVERITY_HIGH, SEVERITY_MED, classify_risk, classify_risk_array
+)
 
 # =========================
 # CONFIG
 # =========================
 MAX_MINES = 5
 
-AREA_HIGH = 100     # hectares
-AREA_MED = 25
-
-SEVERITY_HIGH = -0.15
-SEVERITY_MED = -0.05
+# Thresholds (AREA_HIGH, AREA_MED, SEVERITY_HIGH, SEVERITY_MED) and the
+# row-wise classify_risk live in risk_scoring, shared with the ranking
 
 # =========================
 # INIT GEE
@@ -23,13 +23,14 @@ def init_gee():
 # =========================
 # RISK CLASSIFIER
 # =========================
-def classify_risk(area, severity):
-    if area > AREA_HIGH and severity < SEVERITY_HIGH:
-        return "HIGH"
-    elif area > AREA_MED or severity < SEVERITY_MED:
-        return "MODERATE"
-    else:
-        return "LOW"
+def classify_mines(metrics, **thresholds):
+    """
+    Add a `risk` column to a Phase 4.3 table (mine_id, area_ha, severity).
+    Mines without persistent change have no severity; treat it as 0.
+    """
+    out = metrics.copy()
+    out["risk"] = classify_risk_array(out["area_ha"], out["severity"], **thresholds)
+    return out
 
 # =========================
 # MAIN
@@ -1,9 +1,12 @@
 import ee
-import time
-from pathlib import Path
+from functools import partial
 
+from src.catalog import ArtifactCatalog, aoi_config_hashes, export_tracker
+from src.ingestion.export_manager import EarthEngineBackend, ExportManager
 from src.ingestion.load_mines import load_mine_polygons
 from src.ingestion.sentinel_access import prepare_mine_aois
+from src.ingestion.scene_metadata import fetch_scene_metadata_many, scene_image
+from src.processing.masks import VALID_SCL, mask_scl_ee
 
 # =========================
 # CONFIG
@@ -13,8 +16,15 @@ END_DATE = "2022-12-31"
 MAX_CLOUD = 20
 MAX_MINES = 5   # ⬅ keep small for now
 
-NDVI_DIR = Path("data/processed/ndvi")
-NDVI_DIR.mkdir(parents=True, exist_ok=True)
+EXPORT_FOLDER = "NDVI_EXPORT"
+NDVI_PRODUCT = "ndvi_export"
+NDVI_CONFIG = {
+    "band": "NDVI",
+    "mask": "SCL " + ",".join(map(str, VALID_SCL)),
+    "scale": 10,
+    "crs": "EPSG:4326",
+    "folder": EXPORT_FOLDER,
+}
 
 
 # =========================
@@ -29,9 +39,7 @@ def init_gee():
 # CLOUD MASK
 # =========================
 def mask_s2(image):
-    scl = image.select("SCL")
-    mask = scl.eq(4).Or(scl.eq(5)).Or(scl.eq(6)).Or(scl.eq(7))
-    return image.updateMask(mask)
+    return mask_scl_ee(image)
 
 
 # =========================
@@ -45,18 +53,11 @@ def add_ndvi(image):
 # =========================
 # EXPORT NDVI
 # =========================
-def export_ndvi(image, geom, mine_id, date):
-    out_dir = NDVI_DIR / mine_id
-    out_dir.mkdir(parents=True, exist_ok=True)
-
-    out_path = out_dir / f"{date}_ndvi.tif"
-    if out_path.exists():
-        return
-
-    task = ee.batch.Export.image.toDrive(
+def ndvi_task(image, geom, mine_id, date):
+    return ee.batch.Export.image.toDrive(
         image=image.select("NDVI"),
         description=f"{mine_id}_{date}",
-        folder="NDVI_EXPORT",
+        folder=EXPORT_FOLDER,
         fileNamePrefix=f"{mine_id}_{date}",
         region=geom,
         scale=10,
@@ -64,9 +65,18 @@ def export_ndvi(image, geom, mine_id, date):
         maxPixels=1e13
     )
 
-    task.start()
-    print(f"⬆ Exporting NDVI: {mine_id} {date}")
-    time.sleep(1)
+
+def export_ndvi(image, geom, mine_id, date, manager):
+    """
+    Queue an NDVI export on `manager`; the task is built when started.
+    """
+    manager.submit(
+        f"{mine_id}_{date}",
+        partial(ndvi_task, image, geom, mine_id, date),
+        mine_id=mine_id,
+        date=date,
+        location=f"drive:{EXPORT_FOLDER}/{mine_id}_{date}"
+    )
 
 
 # =========================
@@ -86,21 +96,45 @@ def main():
         .map(add_ndvi)
     )
 
-    for _, row in aois.iterrows():
-        mine_id = row["mine_id"]
-        geom = ee.Geometry.Polygon(list(row.geometry.exterior.coords))
+    mine_geoms = {
+        row["mine_id"]: ee.Geometry(row.geometry.__geo_interface__)
+        for _, row in aois.iterrows()
+    }
 
-        images = s2.filterBounds(geom).toList(50)
-        count = images.size().getInfo()
+    # Dates for every mine in a single request
+    scenes = fetch_scene_metadata_many({
+        mine_id: s2.filterBounds(geom)
+        for mine_id, geom in mine_geoms.items()
+    })
 
-        print(f"🔹 {mine_id}: {count} images")
+    # Settle exports left running by earlier runs, then skip everything
+    # already exported (or still running) in one catalog query
+    catalog = ArtifactCatalog()
+    ndvi_hash = aoi_config_hashes(NDVI_CONFIG, aois)
+    backend = EarthEngineBackend()
+    catalog.reconcile_tasks(NDVI_PRODUCT, backend.list_statuses())
+    done = catalog.done_keys(NDVI_PRODUCT, ndvi_hash,
+                             statuses=("complete", "empty", "pending"))
 
-        for i in range(count):
-            img = ee.Image(images.get(i))
-            date = ee.Date(img.get("system:time_start")).format("YYYY-MM-dd").getInfo()
+    manager = ExportManager(backend,
+                            on_update=export_tracker(catalog, NDVI_PRODUCT, ndvi_hash))
+
+    for mine_id, mine_scenes in scenes.groupby("mine_id"):
+        geom = mine_geoms[mine_id]
+        dates = mine_scenes.groupby("date")["image_id"].agg(list)
+        dates = dates[[(mine_id, d) not in done for d in dates.index]]
+
+        print(f"🔹 {mine_id}: {len(mine_scenes)} images, {len(dates)} dates to export")
+
+        for date, image_ids in dates.items():
+            img = scene_image(image_ids, prepare=lambda i: add_ndvi(mask_s2(i)))
 
             clipped = img.clip(geom)
-            export_ndvi(clipped, geom, mine_id, date)
+            export_ndvi(clipped, geom, mine_id, date, manager)
+
+    report = manager.run()
+    catalog.close()
+    return report
 
 
 if __name__ == "__main__":
@@ -0,0 +1,359 @@
+import json
+import numpy as np
+import rasterio
+from contextlib import ExitStack
+from datetime import date as Date
+from pathlib import Path
+from rasterio.crs import CRS
+from rasterio.enums import Resampling
+from rasterio.vrt import WarpedVRT
+
+from src import instrumentation
+from src.processing.masks import PackedMaskStack, load_scene_mask, scl_valid
+from src.processing.streaming_baseline import StreamingBaseline
+
+# =========================
+# CONFIG
+# =========================
+CUBE_DIR = Path("data/cubes")
+RAW_DATA_DIR = Path("data/raw/sentinel2")
+
+CUBE_BANDS = ["B2", "B3", "B4", "B8", "B11", "B12", "SCL"]
+DTYPE = np.int16
+NODATA = np.iinfo(DTYPE).min  # -32768
+
+DATA_FILE = "cube.i16"
+META_FILE = "meta.json"
+BASELINE_FILE = "ndvi_baseline.npz"
+MASK_FILE = "masks.bits"
+
+
+# =========================
+# CUBE
+# =========================
+class MineCube:
+    """
+    Per-mine time-series cube on disk.
+
+    Layout is a raw C-ordered int16 array of shape (time, band, height,
+    width) plus a JSON sidecar with the date index and grid. Time is the
+    slowest axis, so a new acquisition is appended to the end of the
+    file without rewriting existing data, and every band/window view
+    is a zero-copy slice of the memory map.
+    """
+
+    def __init__(self, path, meta, mode="r"):
+        self.path = Path(path)
+        self.meta = meta
+        self.mode = mode
+        self._data = None
+
+    # -------------------------
+    # Create / open
+    # -------------------------
+    @classmethod
+    def create(cls, path, height, width, bands=CUBE_BANDS,
+               transform=None, crs=None):
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+
+        meta = {
+            "bands": list(bands),
+            "height": int(height),
+            "width": int(width),
+            "dtype": np.dtype(DTYPE).name,
+            "nodata": int(NODATA),
+            "transform": list(transform)[:6] if transform is not None else None,
+            "crs": str(crs) if crs is not None else None,
+            "dates": [],
+        }
+        (path / DATA_FILE).touch()
+        cube = cls(path, meta, mode="r+")
+        cube._write_meta()
+        return cube
+
+    @classmethod
+    def open(cls, path, mode="r"):
+        path = Path(path)
+        meta = json.loads((path / META_FILE).read_text())
+        return cls(path, meta, mode=mode)
+
+    # -------------------------
+    # Index
+    # -------------------------
+    @property
+    def bands(self):
+        return self.meta["bands"]
+
+    @property
+    def nodata(self):
+        return self.meta["nodata"]
+
+    @property
+    def dates(self):
+        return [Date.fromisoformat(d) for d in self.meta["dates"]]
+
+    @property
+    def shape(self):
+        return (len(self.meta["dates"]), len(self.bands),
+                self.meta["height"], self.meta["width"])
+
+    @property
+    def grid(self):
+        """
+        (crs, transform), or (None, None) for cubes created without one.
+        """
+        crs, transform = self.meta["crs"], self.meta["transform"]
+        return (CRS.from_user_input(crs) if crs else None,
+                rasterio.Affine(*transform) if transform else None)
+
+    @property
+    def last_date(self):
+        return self.dates[-1] if self.meta["dates"] else None
+
+    # -------------------------
+    # Zero-copy views
+    # -------------------------
+    @property
+    def data(self):
+        """
+        Memory map of the whole cube, shape (time, band, height, width).
+        """
+        if self._data is None or self._data.shape != self.shape:
+            if self.shape[0] == 0:
+                return np.empty(self.shape, dtype=DTYPE)
+            self._data = np.memmap(
+                self.path / DATA_FILE, dtype=DTYPE,
+                mode="r" if self.mode == "r" else "r+",
+                shape=self.shape
+            )
+        return self._data
+
+    def band(self, name):
+        """
+        (time, height, width) view of one band.
+        """
+        return self.data[:, self.bands.index(name)]
+
+    @property
+    def masks(self):
+        """
+        Bit-packed per-scene valid masks, aligned with `dates`.
+        """
+        return PackedMaskStack(self.path / MASK_FILE,
+                               (self.meta["height"], self.meta["width"]))
+
+    def window(self, name, rows=slice(None), cols=slice(None)):
+        """
+        (time, rows, cols) view of one band over a pixel window.
+        """
+        return self.band(name)[:, rows, cols]
+
+    # -------------------------
+    # Append-only writes
+    # -------------------------
+    def append(self, acquisition_date, scene):
+        """
+        Append one acquisition, `scene` shaped (band, height, width)
+        in CUBE_BANDS order. NaN becomes NODATA and values are clipped
+        to the int16 range. Dates must be strictly increasing.
+        """
+        if self.mode == "r":
+            raise PermissionError("cube opened read-only")
+
+        acquisition_date = Date.fromisoformat(str(acquisition_date)[:10])
+        if self.last_date is not None and acquisition_date <= self.last_date:
+            raise ValueError(
+                f"{acquisition_date} is not after last cube date {self.last_date}"
+            )
+
+        expected = self.shape[1:]
+        if scene.shape != expected:
+            raise ValueError(f"scene shape {scene.shape} != cube shape {expected}")
+
+        block = to_int16(scene)
+
+        # Write at the offset implied by the date index, so bytes left
+        # by an interrupted append are overwritten rather than kept
+        offset = self.shape[0] * block.nbytes
+        with open(self.path / DATA_FILE, "r+b") as f:
+            f.seek(offset)
+            f.write(np.ascontiguousarray(block).tobytes())
+            f.truncate()
+
+        self.meta["dates"].append(acquisition_date.isoformat())
+        self._data = None
+        self._write_meta()
+
+    def _write_meta(self):
+        tmp = self.path / (META_FILE + ".tmp")
+        tmp.write_text(json.dumps(self.meta, indent=2))
+        tmp.replace(self.path / META_FILE)
+
+
+def to_int16(scene):
+    """
+    Convert reflectance to the cube dtype with NODATA for missing values.
+    Scenes already in the cube dtype are kept as they are (NODATA included).
+    """
+    scene = np.asarray(scene)
+    if scene.dtype == DTYPE:
+        return scene
+    if np.issubdtype(scene.dtype, np.floating):
+        missing = np.isnan(scene)
+        out = np.clip(np.nan_to_num(scene), NODATA + 1, np.iinfo(DTYPE).max)
+        out = out.astype(DTYPE)
+        out[missing] = NODATA
+        return out
+    return np.clip(scene, NODATA + 1, np.iinfo(DTYPE).max).astype(DTYPE)
+
+
+def to_float(block, nodata=NODATA):
+    """
+    float32 copy of a cube window with NaN for NODATA.
+    """
+    out = block.astype(np.float32)
+    out[block == nodata] = np.nan
+    return out
+
+
+def scene_ndvi(scene, bands=CUBE_BANDS, valid=None):
+    """
+    NDVI (height, width) of one int16 cube scene, NaN where missing
+    and, with a `valid` mask, where it is False (cloud, shadow, ...).
+    """
+    red = to_float(scene[bands.index("B4")])
+    nir = to_float(scene[bands.index("B8")])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ndvi = (nir - red) / (nir + red)
+    ndvi[~np.isfinite(ndvi)] = np.nan
+    if valid is not None:
+        ndvi[~valid] = np.nan
+    return ndvi
+
+
+def load_baseline(cube):
+    """
+    Streaming NDVI baseline kept next to the cube. It is rebuilt from
+    the cube's scenes and masks when it does not hold exactly the
+    scenes in the cube, e.g. after a run stopped between appending
+    scenes and saving the baseline.
+    """
+    path = cube.path / BASELINE_FILE
+    if path.exists():
+        baseline = StreamingBaseline.load(path)
+        if baseline.n_scenes == cube.shape[0]:
+            return baseline
+        print(f"⚠ {cube.path.name}: baseline has {baseline.n_scenes} of "
+              f"{cube.shape[0]} scenes, rebuilding")
+
+    baseline = StreamingBaseline((cube.meta["height"], cube.meta["width"]))
+    if "B4" in cube.bands and "B8" in cube.bands:
+        masks = cube.masks
+        for t in range(cube.shape[0]):
+            valid = masks[t] if t < len(masks) else None
+            baseline.update(scene_ndvi(cube.data[t], cube.bands, valid))
+        if path.exists() and cube.mode != "r":
+            baseline.save(path)
+    return baseline
+
+
+# =========================
+# INGEST DOWNLOADED SCENES
+# =========================
+def open_on_grid(src, cube, stack):
+    """
+    `src` as is when it is on the cube grid, otherwise through a
+    WarpedVRT onto the cube grid (nearest, so SCL classes and the 0
+    no-data fill survive). Raises ValueError when the scene cannot be
+    placed: a different shape and no grid stored in the cube.
+    """
+    crs, transform = cube.grid
+    shape = (cube.meta["height"], cube.meta["width"])
+    if crs is None or transform is None:
+        if src.shape != shape:
+            raise ValueError(f"{src.name}: shape {src.shape} != cube shape {shape} "
+                             "and the cube has no grid to reproject onto")
+        return src
+
+    if (src.crs, src.transform, src.shape) == (crs, transform, shape):
+        return src
+
+    print(f"↪ {Path(src.name).name}: reprojected onto the cube grid")
+    return stack.enter_context(WarpedVRT(
+        src, crs=crs, transform=transform, width=shape[1], height=shape[0],
+        resampling=Resampling.nearest, nodata=0
+    ))
+
+
+@instrumentation.timed("local.update_cube")
+def update_cube(mine_id, raw_dir=RAW_DATA_DIR, cube_dir=CUBE_DIR,
+                bands=CUBE_BANDS):
+    """
+    Append every downloaded scene newer than the cube's last date.
+    Creates the cube on the grid of the first scene if needed.
+    """
+    scenes = sorted(Path(raw_dir, mine_id).glob("*.tif"))
+    if not scenes:
+        return None
+
+    path = Path(cube_dir) / mine_id
+    if (path / META_FILE).exists():
+        cube = MineCube.open(path, mode="r+")
+    else:
+        with rasterio.open(scenes[0]) as ref:
+            cube = MineCube.create(path, ref.height, ref.width, bands=bands,
+                                   transform=ref.transform, crs=ref.crs)
+
+    last = cube.last_date
+    added = 0
+
+    track_ndvi = "B4" in bands and "B8" in bands
+    baseline = load_baseline(cube) if track_ndvi else None
+
+    try:
+        for scene_path in scenes:
+            acquisition_date = Date.fromisoformat(scene_path.stem[:10])
+            if last is not None and acquisition_date <= last:
+                continue
+
+            with ExitStack() as stack:
+                src = stack.enter_context(rasterio.open(scene_path))
+                names = {d: i + 1 for i, d in enumerate(src.descriptions) if d}
+                missing = [b for b in bands if b not in names]
+                if missing:
+                    print(f"⚠ {mine_id} {scene_path.name}: missing {missing}, skipped")
+                    continue
+
+                on_grid = open_on_grid(src, cube, stack)
+                data = on_grid.read([names[b] for b in bands])
+                stored = load_scene_mask(scene_path, src.shape) if on_grid is src else None
+
+            # Earth Engine writes masked pixels as 0
+            scene = to_int16(data)
+            scene[:, (data == 0).all(axis=0)] = NODATA
+
+            # the mask stored by the downloader, else one from the SCL band
+            valid = None
+            if stored is not None:
+                valid = stored.array()
+            elif "SCL" in bands:
+                valid = scl_valid(data[bands.index("SCL")])
+
+            cube.append(acquisition_date, scene)
+            added += 1
+            if valid is not None:
+                cube.masks.append(valid, index=cube.shape[0] - 1)
+
+            # One scene of work keeps the NDVI baseline current,
+            # over the same valid pixels as the other backends
+            if baseline is not None:
+                baseline.update(scene_ndvi(scene, bands, valid))
+    finally:
+        # saved even when a scene fails, so it matches the cube; after
+        # a hard stop load_baseline() sees the mismatch and rebuilds
+        if baseline is not None and added:
+            baseline.save(cube.path / BASELINE_FILE)
+
+    print(f"🧊 {mine_id}: {added} scenes appended, {cube.shape[0]} in cube")
+    return cube
@@ -0,0 +1,146 @@
+import warnings
+import numpy as np
+import pandas as pd
+
+
+# -------------------------------
+# Config
+# -------------------------------
+
+WET_MONTHS = range(5, 11)  # May–October, as preprocess_sentinel2_gee.add_season
+
+STATS = ("median", "mean", "percentile", "count", "sum", "min", "max")
+
+
+# -------------------------------
+# Blockwise access to stacks / cubes
+# -------------------------------
+
+def row_blocks(height, block_rows):
+    """
+    Row slices covering `height`; one slice when block_rows is None.
+    """
+    step = block_rows or height or 1
+    for start in range(0, height, step):
+        yield slice(start, min(start + step, height))
+
+
+def as_float(block, nodata):
+    """
+    Float view of a stack block. Integer cube windows (e.g. a
+    MineCube band view) are copied to float32 with NaN for `nodata`;
+    float blocks are returned as-is.
+    """
+    if nodata is None and np.issubdtype(block.dtype, np.floating):
+        return block
+    out = block.astype(np.float32)
+    if nodata is not None:
+        out[block == nodata] = np.nan
+    return out
+
+
+# -------------------------------
+# Group keys
+# -------------------------------
+
+def group_keys(dates, by="month"):
+    """
+    One group key per timestep.
+
+    by: "month" (1–12), "season" ("wet"/"dry", same split as the GEE
+    path), "isoweek" (1–53), "year_month" ("YYYY-MM"), a callable
+    applied to each date, or an explicit sequence of keys.
+    """
+    if callable(by):
+        return np.array([by(d) for d in dates])
+    if not isinstance(by, str):
+        keys = np.asarray(by)
+        if len(keys) != len(dates):
+            raise ValueError("need one group key per date")
+        return keys
+
+    idx = pd.DatetimeIndex(pd.to_datetime(list(dates)))
+
+    if by == "month":
+        return idx.month.to_numpy()
+    if by == "season":
+        return np.where(idx.month.isin(list(WET_MONTHS)), "wet", "dry")
+    if by == "isoweek":
+        return idx.isocalendar().week.to_numpy(dtype=int)
+    if by == "year_month":
+        return idx.strftime("%Y-%m").to_numpy()
+
+    raise ValueError(f"unknown grouping: {by}")
+
+
+# -------------------------------
+# Grouped nan-reduction
+# -------------------------------
+
+def _reduce(values, stat, q):
+    if stat == "median":
+        return np.nanmedian(values, axis=0)
+    if stat == "mean":
+        return np.nanmean(values, axis=0)
+    if stat == "percentile":
+        return np.nanpercentile(values, q, axis=0)
+    if stat == "count":
+        return np.count_nonzero(~np.isnan(values), axis=0)
+    if stat == "sum":
+        return np.nansum(values, axis=0)
+    if stat == "min":
+        return np.nanmin(values, axis=0)
+    if stat == "max":
+        return np.nanmax(values, axis=0)
+    raise ValueError(f"unknown statistic: {stat}")
+
+
+def grouped_reduce(stack, keys, stats="median", q=None,
+                   nodata=None, block_rows=None):
+    """
+    Per-group nan-aware reduction of a (time, height, width) stack.
+
+    Timesteps are stable-sorted by key once, so every group is a
+    contiguous slice of the sorted block and no per-group copies are
+    made. With `block_rows` the stack (which may be a memory-mapped
+    cube view) is reduced one row window at a time, keeping memory
+    flat for large AOIs.
+
+    Returns (groups, result) where result is a (groups, height, width)
+    float32 array, or a dict of them when `stats` is a sequence.
+    """
+    single = isinstance(stats, str)
+    stats = (stats,) if single else tuple(stats)
+    for stat in stats:
+        if stat not in STATS:
+            raise ValueError(f"unknown statistic: {stat}")
+    if "percentile" in stats and q is None:
+        raise ValueError("percentile needs q")
+
+    keys = np.asarray(keys)
+    order = np.argsort(keys, kind="stable")
+    groups, starts = np.unique(keys[order], return_index=True)
+    bounds = list(zip(starts, list(starts[1:]) + [len(order)]))
+
+    # Already grouped in time order -> slice the stack directly
+    presorted = np.array_equal(order, np.arange(len(order)))
+
+    height, width = stack.shape[1:]
+    out = {stat: np.full((len(groups), height, width), np.nan, dtype=np.float32)
+           for stat in stats}
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN pixels
+
+        for rows in row_blocks(height, block_rows):
+            block = stack[:, rows]
+            if not presorted:
+                block = block[order]  # one reordered copy per block
+            block = as_float(block, nodata)
+
+            for g, (start, stop) in enumerate(bounds):
+                values = block[start:stop]
+                for stat in stats:
+                    out[stat][g, rows] = _reduce(values, stat, q)
+
+    return groups, out[stats[0]] if single else out
@@ -0,0 +1,205 @@
+import json
+import numpy as np
+import pandas as pd
+from datetime import date as Date, timedelta
+from pathlib import Path
+from rasterio.crs import CRS
+
+from src import instrumentation
+from src.processing.cube_store import CUBE_DIR, MineCube, load_baseline, scene_ndvi
+
+# =========================
+# CONFIG
+# =========================
+STATE_DIR = Path("data/state/monitoring")
+INDEX_FILE = "index.json"
+
+NDVI_DROP_THRESHOLD = -0.2
+MIN_PERSISTENCE = 3
+PIXEL_AREA_M2 = 100  # 10m x 10m
+DEFAULT_START = "2022-01-01"
+
+
+# =========================
+# STATE STORE
+# =========================
+class MineState:
+    """
+    Running per-pixel state for one mine:
+
+    - change_count : scenes with dNDVI < threshold (persistence input)
+    - dndvi_sum / obs_count : running mean dNDVI (severity input)
+    - last_date : newest acquisition folded into the counts
+
+    Each scene's dNDVI is taken against the streaming baseline at the
+    time it is folded in; earlier scenes are not re-scored when the
+    baseline drifts (use `rebuild=True` for a full recount).
+    """
+
+    def __init__(self, shape, threshold=NDVI_DROP_THRESHOLD):
+        self.change_count = np.zeros(shape, dtype=np.uint16)
+        self.dndvi_sum = np.zeros(shape, dtype=np.float32)
+        self.obs_count = np.zeros(shape, dtype=np.uint16)
+        self.threshold = float(threshold)
+        self.last_date = None
+        self.n_scenes = 0
+
+    def update(self, dndvi, acquisition_date):
+        valid = ~np.isnan(dndvi)
+        self.change_count += (dndvi < self.threshold)
+        self.dndvi_sum[valid] += dndvi[valid]
+        self.obs_count += valid
+        self.last_date = acquisition_date
+        self.n_scenes += 1
+
+    def metrics(self, min_persistence=MIN_PERSISTENCE, pixel_area_m2=PIXEL_AREA_M2):
+        persistent = self.change_count >= min_persistence
+        sel = persistent & (self.obs_count > 0)
+        mean_dndvi = self.dndvi_sum[sel] / self.obs_count[sel]
+
+        return {
+            "area_ha": int(persistent.sum()) * pixel_area_m2 / 10_000,
+            "severity": float(mean_dndvi.mean()) if mean_dndvi.size else None,
+            "n_scenes": self.n_scenes,
+            "last_date": self.last_date.isoformat() if self.last_date else None,
+        }
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez(
+            tmp, change_count=self.change_count, dndvi_sum=self.dndvi_sum,
+            obs_count=self.obs_count, threshold=self.threshold,
+            n_scenes=self.n_scenes,
+            last_date=self.last_date.isoformat() if self.last_date else ""
+        )
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            state = cls(f["change_count"].shape, threshold=float(f["threshold"]))
+            state.change_count = f["change_count"]
+            state.dndvi_sum = f["dndvi_sum"]
+            state.obs_count = f["obs_count"]
+            state.n_scenes = int(f["n_scenes"])
+            last = str(f["last_date"])
+            state.last_date = Date.fromisoformat(last) if last else None
+        return state
+
+
+class StateStore:
+    """
+    Per-mine MineState files plus a JSON index of last processed dates.
+    """
+
+    def __init__(self, root=STATE_DIR):
+        self.root = Path(root)
+
+    def path(self, mine_id):
+        return self.root / f"{mine_id}.npz"
+
+    def load(self, mine_id):
+        path = self.path(mine_id)
+        return MineState.load(path) if path.exists() else None
+
+    def save(self, mine_id, state):
+        state.save(self.path(mine_id))
+        index = self.index()
+        index[mine_id] = state.last_date.isoformat() if state.last_date else None
+        tmp = self.root / (INDEX_FILE + ".tmp")
+        tmp.write_text(json.dumps(index, indent=2, sort_keys=True))
+        tmp.replace(self.root / INDEX_FILE)
+
+    def index(self):
+        path = self.root / INDEX_FILE
+        return json.loads(path.read_text()) if path.exists() else {}
+
+    def since(self, mine_ids, default=DEFAULT_START):
+        """
+        First date still to fetch for a set of mines (the day after the
+        oldest last processed acquisition).
+        """
+        index = self.index()
+        last = [index.get(m) for m in mine_ids]
+        if any(d is None for d in last):
+            return default
+        return (Date.fromisoformat(min(last)) + timedelta(days=1)).isoformat()
+
+
+# =========================
+# INCREMENTAL UPDATE
+# =========================
+def cube_pixel_area(cube):
+    transform, crs = cube.meta["transform"], cube.meta["crs"]
+    if transform and crs and CRS.from_user_input(crs).is_projected:
+        return abs(transform[0] * transform[4])
+    return PIXEL_AREA_M2
+
+
+@instrumentation.timed("local.update_mine")
+def update_mine(mine_id, store, cube_dir=CUBE_DIR,
+                threshold=NDVI_DROP_THRESHOLD, rebuild=False):
+    """
+    Fold cube scenes newer than the mine's state into its counts.
+    Only new acquisitions are read from the cube.
+    """
+    cube_path = Path(cube_dir) / mine_id
+    if not cube_path.exists():
+        return None
+
+    cube = MineCube.open(cube_path)
+    state = None if rebuild else store.load(mine_id)
+    if state is not None and state.threshold != float(threshold):
+        print(f"⚠ {mine_id}: threshold changed, rebuilding state")
+        state = None
+    if state is None:
+        state = MineState((cube.meta["height"], cube.meta["width"]), threshold)
+
+    baseline = load_baseline(cube).median()
+    masks = cube.masks
+    has_masks = len(masks) == cube.shape[0]
+
+    new = [t for t, d in enumerate(cube.dates)
+           if state.last_date is None or d > state.last_date]
+
+    for t in new:
+        ndvi = scene_ndvi(cube.data[t], cube.bands)
+        if has_masks:
+            ndvi[~masks[t]] = np.nan
+        state.update(ndvi - baseline, cube.dates[t])
+
+    if new:
+        store.save(mine_id, state)
+
+    return state, len(new), cube_pixel_area(cube)
+
+
+def run_incremental(mine_ids, store=None, cube_dir=CUBE_DIR,
+                    threshold=NDVI_DROP_THRESHOLD,
+                    min_persistence=MIN_PERSISTENCE, rebuild=False):
+    """
+    Area and severity per mine from the running state, after folding
+    in any acquisitions added to the cubes since the last run.
+    """
+    store = store or StateStore()
+    results = []
+
+    for mine_id in mine_ids:
+        with instrumentation.scope(mine_id=mine_id):
+            updated = update_mine(mine_id, store, cube_dir, threshold, rebuild)
+        if updated is None:
+            print(f"⚠ {mine_id}: no cube, run the downloader first")
+            continue
+
+        state, n_new, pixel_area = updated
+        metrics = state.metrics(min_persistence, pixel_area)
+        results.append({"mine_id": mine_id, **metrics, "new_scenes": n_new})
+
+        print(f"✅ {mine_id} | +{n_new} scenes | Area (ha): {metrics['area_ha']:.2f} "
+              f"| Severity: {metrics['severity']}")
+
+    return pd.DataFrame(results, columns=[
+        "mine_id", "area_ha", "severity", "n_scenes", "last_date", "new_scenes"
+    ])
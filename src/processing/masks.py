@@ -0,0 +1,221 @@
+import numpy as np
+from pathlib import Path
+
+
+# -------------------------------
+# Config
+# -------------------------------
+
+VALID_SCL = [4, 5, 6, 7]
+# 4 vegetation, 5 bare soil, 6 water, 7 unclassified
+# (the one list for every backend: Earth Engine graphs, downloads
+# and local NumPy masks all use it)
+
+MIN_VALID_OBS = 5  # same rule as preprocess_sentinel2_gee (count >= 5)
+
+
+# -------------------------------
+# SCL lookup table
+# -------------------------------
+
+def scl_lut(valid_classes=VALID_SCL):
+    """
+    256-entry table: lut[scl] is True for usable SCL classes.
+    """
+    lut = np.zeros(256, dtype=bool)
+    lut[list(valid_classes)] = True
+    return lut
+
+
+SCL_LUT = scl_lut()
+
+
+def scl_valid(scl, lut=SCL_LUT):
+    """
+    Boolean valid mask from an SCL array with one table lookup.
+    """
+    scl = np.asarray(scl)
+    if scl.dtype != np.uint8:
+        scl = scl.astype(np.uint8)  # SCL classes are 0–11
+    return lut[scl]
+
+
+def scene_valid(red, nir, scl=None, lut=SCL_LUT):
+    """
+    Valid pixels of one scene: red + nir > 0 (Earth Engine writes
+    masked pixels as 0) and, with `scl`, a usable SCL class.
+    """
+    valid = np.add(red, nir, dtype=np.int32) > 0
+    if scl is not None:
+        valid &= scl_valid(scl, lut)
+    return valid
+
+
+def scl_valid_ee(scl, valid_classes=VALID_SCL):
+    """
+    The same mask for an ee.Image SCL band: 1 for usable classes,
+    0 otherwise.
+    """
+    classes = list(valid_classes)
+    return scl.remap(classes, [1] * len(classes), 0)
+
+
+def mask_scl_ee(image, valid_classes=VALID_SCL):
+    """
+    Mask an ee.Image (which must still have its SCL band) to usable
+    SCL classes.
+    """
+    return image.updateMask(scl_valid_ee(image.select("SCL"), valid_classes))
+
+
+def mask_in_place(image, valid, fill=np.nan):
+    """
+    Set invalid pixels of `image` to `fill` without allocating a copy.
+    `valid` broadcasts over leading band/time axes.
+    """
+    image[..., ~valid] = fill
+    return image
+
+
+# -------------------------------
+# Bit-packed masks
+# -------------------------------
+
+def pack_mask(mask):
+    """
+    1 bit per pixel (8x smaller than a bool array).
+    """
+    return np.packbits(np.asarray(mask, dtype=bool).reshape(-1))
+
+
+def unpack_mask(bits, shape):
+    n = int(np.prod(shape))
+    return np.unpackbits(bits, count=n).astype(bool).reshape(shape)
+
+
+class PackedMask:
+    """
+    One scene's valid mask kept bit-packed; `window` unpacks only the
+    rows it needs.
+    """
+
+    def __init__(self, bits, shape):
+        self.bits = bits
+        self.shape = tuple(int(n) for n in shape)
+
+    def rows(self, start, stop):
+        width = self.shape[1]
+        first, last = start * width, stop * width
+        chunk = self.bits[first // 8:(last + 7) // 8]
+        flat = np.unpackbits(chunk, count=last - first + first % 8)[first % 8:]
+        return flat.astype(bool).reshape(stop - start, width)
+
+    def window(self, window):
+        row, col = int(window.row_off), int(window.col_off)
+        rows = self.rows(row, row + int(window.height))
+        return rows[:, col:col + int(window.width)]
+
+    def array(self):
+        return unpack_mask(self.bits, self.shape)
+
+
+def scene_mask_path(image_path):
+    return Path(str(image_path) + ".mask.npz")
+
+
+def save_scene_mask(image_path, mask, valid_classes=VALID_SCL):
+    """
+    Store a scene's packed valid mask next to the image, with the SCL
+    classes it was built from.
+    """
+    path = scene_mask_path(image_path)
+    tmp = path.with_name(path.name + ".tmp.npz")
+    np.savez(tmp, bits=pack_mask(mask), shape=np.array(np.shape(mask)),
+             classes=np.array(sorted(valid_classes)))
+    tmp.replace(path)
+    return path
+
+
+def load_scene_mask(image_path, shape=None, valid_classes=VALID_SCL):
+    """
+    The PackedMask stored next to an image, or None when there is none,
+    or it was built from other SCL classes or for another `shape`
+    (callers then derive the mask from the SCL band).
+    """
+    path = scene_mask_path(image_path)
+    if not path.exists():
+        return None
+    with np.load(path) as f:
+        if "classes" not in f or list(f["classes"]) != sorted(valid_classes):
+            return None
+        mask = PackedMask(f["bits"], f["shape"])
+    if shape is not None and mask.shape != tuple(shape):
+        return None
+    return mask
+
+
+class PackedMaskStack:
+    """
+    Append-only stack of bit-packed per-scene masks in one file,
+    shape (time, ceil(height * width / 8)) as uint8. Used next to a
+    MineCube so masks for long series cost 1 bit per pixel per scene.
+    """
+
+    def __init__(self, path, shape):
+        self.path = Path(path)
+        self.shape = tuple(shape)
+        self.row_bytes = (int(np.prod(self.shape)) + 7) // 8
+        if not self.path.exists():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.touch()
+
+    def __len__(self):
+        return self.path.stat().st_size // self.row_bytes
+
+    def append(self, mask, index=None):
+        """
+        Write the mask for scene `index` (default: next slot).
+        """
+        index = len(self) if index is None else index
+        with open(self.path, "r+b") as f:
+            f.seek(index * self.row_bytes)
+            f.write(pack_mask(mask).tobytes())
+            f.truncate()
+
+    @property
+    def bits(self):
+        if len(self) == 0:
+            return np.empty((0, self.row_bytes), dtype=np.uint8)
+        return np.memmap(self.path, dtype=np.uint8, mode="r",
+                         shape=(len(self), self.row_bytes))
+
+    def __getitem__(self, t):
+        return unpack_mask(np.asarray(self.bits[t]), self.shape)
+
+    def __iter__(self):
+        bits = self.bits
+        for t in range(len(bits)):
+            yield unpack_mask(np.asarray(bits[t]), self.shape)
+
+
+# -------------------------------
+# Streaming valid-observation counts
+# -------------------------------
+
+class ValidCounter:
+    """
+    Per-pixel count of valid observations, updated one scene at a time.
+    uint8 saturates at 255, uint16 at 65535.
+    """
+
+    def __init__(self, shape, dtype=np.uint8):
+        self.counts = np.zeros(shape, dtype=dtype)
+        self.max = np.iinfo(dtype).max
+
+    def update(self, valid):
+        np.add(self.counts, 1, out=self.counts,
+               where=np.asarray(valid, dtype=bool) & (self.counts < self.max))
+        return self
+
+    def valid(self, min_count=MIN_VALID_OBS):
+        return self.counts >= min_count
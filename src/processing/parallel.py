@@ -0,0 +1,232 @@
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from src import instrumentation
+
+# =========================
+# CONFIG
+# =========================
+WORKERS = os.cpu_count() or 1
+PENDING_PER_WORKER = 2  # jobs queued ahead per worker (bounds shared memory in use)
+
+# Fresh interpreters: workers do not inherit open files, GDAL handles
+# or an active metrics recorder from the parent (see `_run_job`)
+MP_CONTEXT = multiprocessing.get_context("spawn")
+
+# Threads one GDAL call may use in this process: every CPU in the
+# parent, an even share inside a pool worker (set by `_init_worker`)
+_gdal_threads = WORKERS
+
+
+def gdal_threads():
+    """
+    Thread count for GDAL options such as NUM_THREADS, so N workers
+    each warping or writing with every CPU do not oversubscribe.
+    """
+    return _gdal_threads
+
+
+# =========================
+# SHARED ARRAYS
+# =========================
+def _attach(name):
+    try:
+        return SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        return SharedMemory(name=name)
+
+
+class SharedArray:
+    """
+    NumPy array in a named shared-memory block. It pickles as
+    (shape, dtype, name), so a worker maps the same memory instead of
+    receiving a copy of the data. The creating process owns the block
+    and frees it with `release()`.
+    """
+
+    def __init__(self, shape, dtype, name=None):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.owner = name is None
+
+        if self.owner:
+            nbytes = max(1, int(np.prod(self.shape)) * self.dtype.itemsize)
+            self.shm = SharedMemory(create=True, size=nbytes)
+        else:
+            self.shm = _attach(name)
+        self.array = np.ndarray(self.shape, self.dtype, buffer=self.shm.buf)
+
+    @classmethod
+    def copy_of(cls, array):
+        shared = cls(array.shape, array.dtype)
+        shared.array[...] = array
+        return shared
+
+    def __reduce__(self):
+        return SharedArray, (self.shape, self.dtype.str, self.shm.name)
+
+    def release(self):
+        self.array = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __del__(self):
+        if getattr(self, "array", None) is not None and not self.owner:
+            self.release()
+
+
+# =========================
+# POOL
+# =========================
+def _init_worker(threads):
+    global _gdal_threads
+    _gdal_threads = threads
+    os.environ["GDAL_NUM_THREADS"] = str(threads)
+
+
+def _pool(workers):
+    return ProcessPoolExecutor(max_workers=workers, mp_context=MP_CONTEXT,
+                               initializer=_init_worker,
+                               initargs=(max(1, WORKERS // workers),))
+
+
+def _run_job(func, args, key, collect):
+    """
+    Worker side of one job: with `collect`, its metrics are buffered
+    under mine_id=key and returned for the parent to replay.
+    """
+    if collect:
+        return instrumentation.collect(func, *args, mine_id=key)
+    return func(*args), None
+
+
+def _completed(pool, submissions, max_pending):
+    """
+    Submit (key, func, args) lazily, keeping at most `max_pending` in
+    flight, and yield (key, result) as jobs finish. Metrics recorded
+    in the workers are replayed into the parent's recorder.
+    """
+    collect = instrumentation.enabled()
+    pending = {}
+
+    def finished(future):
+        result, events = future.result()
+        instrumentation.replay(events)
+        return pending.pop(future), result
+
+    for key, func, args in submissions:
+        pending[pool.submit(_run_job, func, args, key, collect)] = key
+        if len(pending) >= max_pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield finished(future)
+
+    for future in as_completed(list(pending)):
+        yield finished(future)
+
+
+def fan_out(func, jobs, workers=WORKERS, cost=None):
+    """
+    Run `func(*args)` for every `{key: args}` job on a process pool
+    and yield (key, result) in completion order.
+
+    Jobs start largest `cost(key)` first (longest-processing-time
+    first), so one big mine does not end up running alone at the end.
+    `workers=1` runs in-process, in the same order.
+    """
+    order = sorted(jobs, key=cost, reverse=True) if cost else list(jobs)
+
+    if workers <= 1:
+        for key in order:
+            with instrumentation.scope(mine_id=key):
+                result = func(*jobs[key])
+            yield key, result
+        return
+
+    with _pool(workers) as pool:
+        submissions = ((key, func, jobs[key]) for key in order)
+        yield from _completed(pool, submissions, PENDING_PER_WORKER * workers)
+
+
+# =========================
+# STACKS
+# =========================
+def _stack_job(func, stack, out, kwargs):
+    if out is None:
+        return func(stack.array, **kwargs)
+    func(stack.array, out=out.array, **kwargs)
+
+
+def _result_dtype(out_dtype, dtype):
+    """
+    `out_dtype` as a dtype, or applied to the stack's `dtype` when it
+    is a function such as sentinel_preprocess.normalized_dtype.
+    """
+    try:
+        return np.dtype(out_dtype)
+    except TypeError:
+        return np.dtype(out_dtype(dtype))
+
+
+def map_stacks(func, stacks, workers=WORKERS, out_dtype=None, per_key=None, **kwargs):
+    """
+    `func(stack, **kwargs)` for every `{mine_id: stack}` on a process
+    pool, yielding (mine_id, result) in completion order, largest
+    stack first. `per_key` adds kwargs for single mines, e.g.
+    `{mine_id: {"dates": ...}}`.
+
+    Each stack is copied once into shared memory when its job is
+    submitted and freed when it finishes; nothing is pickled. With
+    `out_dtype`, `func` also gets `out=` (a shared array of the
+    stack's shape, e.g. for temporal_normalization) and that array is
+    the result.
+    """
+    order = sorted(stacks, key=lambda k: stacks[k].nbytes, reverse=True)
+    per_key = per_key or {}
+
+    def job_kwargs(key):
+        return {**kwargs, **per_key.get(key, {})}
+
+    if workers <= 1:
+        for key in order:
+            with instrumentation.scope(mine_id=key):
+                if out_dtype is None:
+                    result = func(stacks[key], **job_kwargs(key))
+                else:
+                    dtype = _result_dtype(out_dtype, stacks[key].dtype)
+                    result = np.empty(stacks[key].shape, dtype)
+                    func(stacks[key], out=result, **job_kwargs(key))
+            yield key, result
+        return
+
+    shared = {}
+
+    def submissions():
+        for key in order:
+            stack = SharedArray.copy_of(stacks[key])
+            out = None
+            if out_dtype is not None:
+                out = SharedArray(stack.shape, _result_dtype(out_dtype, stack.dtype))
+            shared[key] = (stack, out)
+            yield key, _stack_job, (func, stack, out, job_kwargs(key))
+
+    try:
+        with _pool(workers) as pool:
+            for key, result in _completed(pool, submissions(),
+                                          PENDING_PER_WORKER * workers):
+                stack, out = shared.pop(key)
+                if out is not None:
+                    result = out.array.copy()
+                    out.release()
+                stack.release()
+                yield key, result
+    finally:
+        for stack, out in shared.values():
+            stack.release()
+            if out is not None:
+                out.release()
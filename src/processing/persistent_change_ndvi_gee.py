@@ -1,6 +1,8 @@
 import ee
 from src.ingestion.load_mines import load_mine_polygons
 from src.ingestion.sentinel_access import prepare_mine_aois
+from src.ingestion.aoi_clustering import cluster_mine_aois
+from src.processing.masks import mask_scl_ee
 
 # =========================
 # CONFIG
@@ -36,26 +38,30 @@ def main():
     mines = load_mine_polygons("data/vectors/CILS_mines_polygon")
     aois = prepare_mine_aois(mines).head(MAX_MINES)
 
-    print(f"Running Phase 4.2 for {len(aois)} mines")
+    aois, regions = cluster_mine_aois(aois)
+
+    print(f"Running Phase 4.2 for {len(aois)} mines "
+          f"in {len(regions)} shared regions")
 
     s2 = (
         ee.ImageCollection("COPERNICUS/S2_SR_HARMONIZED")
         .filterDate(START_DATE, END_DATE)
         .filter(ee.Filter.lt("CLOUDY_PIXEL_PERCENTAGE", MAX_CLOUD))
-        .select(["B4", "B8"])
+        .select(["B4", "B8", "SCL"])
+        .map(mask_scl_ee)  # same SCL classes as the local backend
         .map(add_ndvi)
     )
 
-    for _, row in aois.iterrows():
-        mine_id = row["mine_id"]
-        geom = ee.Geometry.Polygon(list(row.geometry.exterior.coords))
+    for _, region in regions.iterrows():
+        geom = ee.Geometry(region.geometry.__geo_interface__)
 
-        mine_ic = s2.filterBounds(geom)
+        # One persistence image per shared region covers all its mines
+        region_ic = s2.filterBounds(geom)
 
         # -------------------------
         # NDVI BASELINE
         # -------------------------
-        baseline = mine_ic.select("NDVI").median().clip(geom)
+        baseline = region_ic.select("NDVI").median().clip(geom)
 
         # -------------------------
         # ΔNDVI + Change Mask
@@ -65,7 +71,7 @@ def main():
             mask = dndvi.lt(NDVI_DROP_THRESHOLD)
             return image.addBands(mask.rename("change_mask"))
 
-        change_ic = mine_ic.map(add_change)
+        change_ic = region_ic.map(add_change)
 
         # -------------------------
         # PERSISTENCE FILTER
@@ -78,7 +84,8 @@ def main():
             .rename("persistent_change")
         )
 
-        print(f"✅ Phase 4.2 completed for {mine_id}")
+        for mine_id in region["mine_ids"]:
+            print(f"✅ Phase 4.2 completed for {mine_id}")
 
     print("🎉 PHASE 4.2 COMPLETE")
 
@@ -4,6 +4,7 @@ from datetime import datetime
 
 from src.ingestion.load_mines import load_mine_polygons
 from src.ingestion.sentinel_access import prepare_mine_aois
+from src.processing.masks import mask_scl_ee
 
 # =========================
 # CONFIG
@@ -24,14 +25,7 @@ def init_gee():
 # CLOUD MASK
 # =========================
 def mask_clouds(image):
-    scl = image.select("SCL")
-    valid = (
-        scl.eq(4)   # vegetation
-        .Or(scl.eq(5))  # bare soil
-        .Or(scl.eq(6))  # water
-        .Or(scl.eq(7))  # unclassified
-    )
-    return image.updateMask(valid)
+    return mask_scl_ee(image)  # VALID_SCL: vegetation, bare soil, water, unclassified
 
 # =========================
 # RESAMPLE TO 10m
@@ -78,7 +72,7 @@ def main():
 
     for _, row in aois.iterrows():
         mine_id = row["mine_id"]
-        geom = ee.Geometry.Polygon(list(row.geometry.exterior.coords))
+        geom = ee.Geometry(row.geometry.__geo_interface__)
 
         mine_ic = s2.filterBounds(geom)
 
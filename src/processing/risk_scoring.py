@@ -0,0 +1,350 @@
+import math
+import random
+
+import numpy as np
+import pandas as pd
+
+# =========================
+# CONFIG
+# =========================
+AREA_HIGH = 100     # hectares
+AREA_MED = 25
+
+SEVERITY_HIGH = -0.15
+SEVERITY_MED = -0.05
+
+RISK_CLASSES = ["HIGH", "MODERATE", "LOW"]
+
+ALERTS = {
+    "HIGH": "🚨 IMMEDIATE INSPECTION",
+    "MODERATE": "⚠ INCREASED MONITORING",
+    "LOW": "✅ NO ACTION",
+}
+
+RANK_COLUMNS = ["rank", "mine_id", "area_ha", "severity", "risk", "impact", "alert"]
+
+
+# =========================
+# ROW-WISE RULES (Phase 5.1 / 5.2)
+# =========================
+def classify_risk(area, severity, area_high=AREA_HIGH, area_med=AREA_MED,
+                  severity_high=SEVERITY_HIGH, severity_med=SEVERITY_MED):
+    if area > area_high and severity < severity_high:
+        return "HIGH"
+    elif area > area_med or severity < severity_med:
+        return "MODERATE"
+    else:
+        return "LOW"
+
+
+def alert_level(risk):
+    return ALERTS.get(risk, ALERTS["LOW"])
+
+
+def impact_score(area, severity):
+    """
+    area * |severity|; no persistent change (severity None/NaN) counts as 0.
+    """
+    if severity is None or severity != severity:
+        severity = 0.0
+    return area * abs(severity)
+
+
+# =========================
+# COLUMNAR SCORING
+# =========================
+def severity_values(severity):
+    return pd.to_numeric(pd.Series(severity), errors="coerce").fillna(0.0).to_numpy(float)
+
+
+def classify_risk_array(area, severity, area_high=AREA_HIGH, area_med=AREA_MED,
+                        severity_high=SEVERITY_HIGH, severity_med=SEVERITY_MED):
+    """
+    `classify_risk` over whole columns; missing severity counts as 0.
+    """
+    area = np.asarray(area, dtype=float)
+    severity = severity_values(severity)
+
+    high = (area > area_high) & (severity < severity_high)
+    moderate = (area > area_med) | (severity < severity_med)
+    return np.select([high, moderate], ["HIGH", "MODERATE"], "LOW").astype(object)
+
+
+def impact_array(area, severity):
+    return np.asarray(area, dtype=float) * np.abs(severity_values(severity))
+
+
+def alert_array(risk):
+    return pd.Series(risk, dtype=object).map(ALERTS).fillna(ALERTS["LOW"]).to_numpy(object)
+
+
+def score_mines(metrics, **thresholds):
+    """
+    Risk class, impact and alert for every row of a metrics table
+    (mine_id, area_ha, severity, plus e.g. date) in one vectorized pass.
+    """
+    out = metrics.copy()
+    out["severity"] = pd.to_numeric(out["severity"], errors="coerce")
+    out["risk"] = classify_risk_array(out["area_ha"], out["severity"], **thresholds)
+    out["impact"] = impact_array(out["area_ha"], out["severity"])
+    out["alert"] = alert_array(out["risk"])
+    return out
+
+
+def rank_scores(scored, by=None):
+    """
+    1-based impact rank (highest first, ties in row order), over the
+    whole table or within each `by` group, e.g. per acquisition date.
+    """
+    impact = scored["impact"] if by is None else scored.groupby(by)["impact"]
+    return impact.rank(method="first", ascending=False, na_option="bottom").astype(int)
+
+
+# =========================
+# INDEXABLE SKIP LIST
+# =========================
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, levels):
+        self.key = key
+        self.next = [None] * levels
+        self.width = [1] * levels
+
+
+class IndexableSkiplist:
+    """
+    Sorted unique keys with O(log n) expected insert, remove, rank
+    and positional lookup. Each link stores how many items it skips,
+    so positions are summed along the search path.
+    """
+
+    MAX_LEVELS = 24  # plenty for 2**24 items
+
+    def __init__(self, seed=0):
+        self.head = _Node(None, self.MAX_LEVELS)
+        self.size = 0
+        self.random = random.Random(seed)
+
+    @classmethod
+    def from_sorted(cls, keys, seed=0):
+        """
+        Build from already sorted keys in O(n).
+        """
+        skiplist = cls(seed)
+        last = [skiplist.head] * cls.MAX_LEVELS
+        last_pos = [0] * cls.MAX_LEVELS
+
+        for pos, key in enumerate(keys, start=1):
+            node = _Node(key, skiplist._random_levels())
+            for level in range(len(node.next)):
+                last[level].next[level] = node
+                last[level].width[level] = pos - last_pos[level]
+                last[level], last_pos[level] = node, pos
+            skiplist.size = pos
+
+        for level in range(cls.MAX_LEVELS):
+            last[level].width[level] = skiplist.size + 1 - last_pos[level]
+        return skiplist
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        node = self.head.next[0]
+        while node is not None:
+            yield node.key
+            node = node.next[0]
+
+    def _random_levels(self):
+        return min(self.MAX_LEVELS, 1 - int(math.log2(1.0 - self.random.random())))
+
+    def _path(self, key):
+        """
+        Last node before `key` on every level and its position.
+        """
+        chain = [None] * self.MAX_LEVELS
+        positions = [0] * self.MAX_LEVELS
+        node, pos = self.head, 0
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].key < key:
+                pos += node.width[level]
+                node = node.next[level]
+            chain[level], positions[level] = node, pos
+        return chain, positions
+
+    def insert(self, key):
+        chain, positions = self._path(key)
+        pos = positions[0] + 1
+        node = _Node(key, self._random_levels())
+
+        for level in range(len(node.next)):
+            prev = chain[level]
+            node.next[level] = prev.next[level]
+            prev.next[level] = node
+            node.width[level] = prev.width[level] - (pos - positions[level]) + 1
+            prev.width[level] = pos - positions[level]
+        for level in range(len(node.next), self.MAX_LEVELS):
+            chain[level].width[level] += 1
+        self.size += 1
+
+    def remove(self, key):
+        chain, _ = self._path(key)
+        node = chain[0].next[0]
+        if node is None or node.key != key:
+            raise KeyError(key)
+
+        for level in range(len(node.next)):
+            prev = chain[level]
+            prev.width[level] += node.width[level] - 1
+            prev.next[level] = node.next[level]
+        for level in range(len(node.next), self.MAX_LEVELS):
+            chain[level].width[level] -= 1
+        self.size -= 1
+
+    def rank(self, key):
+        """
+        0-based position of `key`.
+        """
+        chain, positions = self._path(key)
+        node = chain[0].next[0]
+        if node is None or node.key != key:
+            raise KeyError(key)
+        return positions[0]
+
+    def slice(self, start, stop):
+        """
+        Keys at positions [start, stop) in O(log n + stop - start).
+        """
+        if start >= min(stop, self.size):
+            return []
+
+        node, pos = self.head, 0
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not None and pos + node.width[level] <= start + 1:
+                pos += node.width[level]
+                node = node.next[level]
+
+        keys = []
+        while node is not None and len(keys) < stop - start:
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+
+# =========================
+# MAINTAINED RANKING
+# =========================
+def rank_key(mine_id, impact):
+    # highest impact first, missing impact last, ties by mine_id
+    return (-impact if impact == impact else math.inf, mine_id)
+
+
+class RiskRanking:
+    """
+    Impact ranking of the latest metrics per mine, kept sorted as
+    mines are re-scored.
+
+    One skip list orders all mines and one per risk class, so
+    `update` (re-score one mine), `rank_of`, `top(k)` and
+    `top(k, risk=...)` cost O(log n) (+ k) instead of a full re-sort.
+    """
+
+    def __init__(self, metrics=None, **thresholds):
+        self.thresholds = thresholds
+        self.rows = {}
+        self.order = IndexableSkiplist()
+        self.by_risk = {risk: IndexableSkiplist() for risk in RISK_CLASSES}
+        if metrics is not None and len(metrics):
+            self._load(metrics)
+
+    def _load(self, metrics):
+        """
+        Bulk build from a metrics table; with several rows per mine
+        (e.g. one per date) the last one is kept.
+        """
+        if "date" in metrics:
+            metrics = metrics.sort_values("date", kind="stable")
+        latest = score_mines(metrics.drop_duplicates("mine_id", keep="last"),
+                             **self.thresholds)
+
+        self.rows = {
+            r["mine_id"]: r for r in
+            latest[["mine_id", "area_ha", "severity", "risk", "impact", "alert"]].to_dict("records")
+        }
+        keys = sorted(rank_key(m, r["impact"]) for m, r in self.rows.items())
+        self.order = IndexableSkiplist.from_sorted(keys)
+        self.by_risk = {
+            risk: IndexableSkiplist.from_sorted(
+                [k for k in keys if self.rows[k[1]]["risk"] == risk])
+            for risk in RISK_CLASSES
+        }
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, mine_id):
+        return mine_id in self.rows
+
+    # -------------------------
+    # Updates
+    # -------------------------
+    def remove(self, mine_id):
+        row = self.rows.pop(mine_id)
+        key = rank_key(mine_id, row["impact"])
+        self.order.remove(key)
+        self.by_risk[row["risk"]].remove(key)
+
+    def update(self, mine_id, area_ha, severity):
+        """
+        Re-score one mine and move it to its new place in the ranking.
+        """
+        if mine_id in self.rows:
+            self.remove(mine_id)
+
+        sev = 0.0 if severity is None or severity != severity else severity
+        risk = classify_risk(area_ha, sev, **self.thresholds)
+        row = {"mine_id": mine_id, "area_ha": area_ha, "severity": severity,
+               "risk": risk, "impact": impact_score(area_ha, severity),
+               "alert": alert_level(risk)}
+
+        key = rank_key(mine_id, row["impact"])
+        self.rows[mine_id] = row
+        self.order.insert(key)
+        self.by_risk[risk].insert(key)
+        return row
+
+    # -------------------------
+    # Queries
+    # -------------------------
+    def rank_of(self, mine_id):
+        """
+        1-based overall rank of a mine.
+        """
+        return self.order.rank(rank_key(mine_id, self.rows[mine_id]["impact"])) + 1
+
+    def _table(self, keys, ranks):
+        rows = [{"rank": rank, **self.rows[mine_id]} for rank, (_, mine_id) in zip(ranks, keys)]
+        return pd.DataFrame(rows, columns=RANK_COLUMNS)
+
+    def top(self, k=10, risk=None):
+        """
+        The k highest-impact mines, overall or within one risk class.
+        `rank` is always the overall rank.
+        """
+        if risk is None:
+            keys = self.order.slice(0, k)
+            return self._table(keys, range(1, len(keys) + 1))
+
+        keys = self.by_risk[risk].slice(0, k)
+        return self._table(keys, [self.order.rank(key) + 1 for key in keys])
+
+    def counts(self):
+        return {risk: len(skiplist) for risk, skiplist in self.by_risk.items()}
+
+    def table(self):
+        """
+        Full ranking, same layout as `rank_mines`.
+        """
+        keys = list(self.order)
+        return self._table(keys, range(1, len(keys) + 1))
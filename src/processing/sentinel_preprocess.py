@@ -2,82 +2,289 @@ import numpy as np
 import rasterio
 from rasterio.warp import reproject, Resampling
 
+from src import instrumentation
+from src.processing.grouped_reduce import as_float, group_keys, grouped_reduce, row_blocks
+from src.processing.masks import (
+    MIN_VALID_OBS, VALID_SCL, PackedMaskStack, ValidCounter,
+    mask_in_place, scl_valid
+)
+from src.processing.parallel import WORKERS, gdal_threads, map_stacks
+
 
 # -------------------------------
 # 3.2 Cloud Masking (Sentinel-2 L2A)
 # -------------------------------
 
-VALID_SCL = [4, 5, 6, 7, 11]
-# 4 vegetation, 5 bare soil, 6 water, 7 unclassified, 11 snow
+# VALID_SCL (masks.py): 4 vegetation, 5 bare soil, 6 water, 7 unclassified
 
-def apply_cloud_mask(image, scl):
+@instrumentation.timed("local.apply_cloud_mask")
+def apply_cloud_mask(image, scl, inplace=False, nodata=None):
     """
     Mask clouds using Sentinel-2 Scene Classification Layer (SCL).
+
+    With `inplace=True` a float `image` is masked without a copy.
+    With `nodata` (e.g. compact_ndvi.NODATA for int16 reflectance)
+    masked pixels get that value and the image keeps its dtype
+    instead of being upcast to float for NaN.
     """
-    mask = np.isin(scl, VALID_SCL)
-    return np.where(mask, image, np.nan), mask
+    mask = scl_valid(scl)
+    fill = np.nan if nodata is None else np.asarray(nodata, dtype=image.dtype)
+    if inplace:
+        return mask_in_place(image, mask, fill), mask
+    return np.where(mask, image, fill), mask
 
 
 # -------------------------------
 # 3.3 Band Harmonization to 10 m
 # -------------------------------
 
+# Categorical bands must keep their class values
+BAND_RESAMPLING = {"SCL": Resampling.nearest}
+DEFAULT_RESAMPLING = Resampling.bilinear
+
+
+def same_grid(src_transform, src_shape, dst_transform, dst_shape):
+    return (tuple(src_shape[-2:]) == tuple(dst_shape[-2:])
+            and src_transform.almost_equals(dst_transform))
+
+
+@instrumentation.timed("local.resample_to_10m")
 def resample_to_10m(src_array, src_transform, src_crs,
-                    dst_shape, dst_transform):
+                    dst_shape, dst_transform, resampling=DEFAULT_RESAMPLING,
+                    out=None, num_threads=None, dtype=np.float32):
     """
     Resample Sentinel-2 bands to 10 m resolution.
+
+    `src_array` is one band (H, W) or a band stack (B, H, W), warped
+    in a single multi-threaded call. `out` may be a preallocated
+    destination of `dst_shape`; when the source is already on the
+    10 m grid it is copied into `out` without warping.
+    `dtype` sets the allocated destination type (e.g. int16 to keep
+    reflectance compact). `num_threads` defaults to gdal_threads():
+    every CPU, or a share of them inside a pool worker.
     """
-    dst = np.empty(dst_shape, dtype=np.float32)
+    if out is None:
+        out = np.empty(dst_shape, dtype=dtype)
+
+    if same_grid(src_transform, src_array.shape, dst_transform, dst_shape):
+        np.copyto(out, src_array, casting="unsafe")
+        return out
 
     reproject(
         source=src_array,
-        destination=dst,
+        destination=out,
         src_transform=src_transform,
         src_crs=src_crs,
         dst_transform=dst_transform,
         dst_crs=src_crs,
-        resampling=Resampling.bilinear
+        resampling=resampling,
+        num_threads=num_threads or gdal_threads()
     )
-    return dst
+    return out
+
+
+class BandHarmonizer:
+    """
+    Brings every band of a scene onto one 10 m grid.
+
+    Bands already on the grid are passed through untouched. The others
+    are grouped by source grid and resampling method (bilinear for
+    reflectance, nearest for SCL) and each group is warped in one
+    multi-band call into a destination buffer that is allocated once
+    and reused for every scene. Returned arrays are views of those
+    buffers: copy them to keep a scene past the next `harmonize` call.
+    """
+
+    def __init__(self, dst_shape, dst_transform, crs,
+                 resampling=None, num_threads=None):
+        self.dst_shape = tuple(dst_shape)
+        self.dst_transform = dst_transform
+        self.crs = crs
+        self.resampling = {**BAND_RESAMPLING, **(resampling or {})}
+        self.num_threads = num_threads
+        self.buffers = {}
+
+    def _buffer(self, key, n_bands, dtype):
+        buf = self.buffers.get(key)
+        if buf is None or buf.shape[0] != n_bands or buf.dtype != dtype:
+            buf = np.empty((n_bands,) + self.dst_shape, dtype=dtype)
+            self.buffers[key] = buf
+        return buf
+
+    @instrumentation.timed("local.harmonize_bands")
+    def harmonize(self, scene, src_transforms):
+        """
+        `scene` maps band name -> (H, W) array and `src_transforms`
+        band name -> its affine transform (or one transform for all).
+        Returns band name -> (H, W) array on the 10 m grid.
+        """
+        if not isinstance(src_transforms, dict):
+            src_transforms = dict.fromkeys(scene, src_transforms)
+
+        out = {}
+        groups = {}
+        for name, array in scene.items():
+            transform = src_transforms[name]
+            if same_grid(transform, array.shape, self.dst_transform, self.dst_shape):
+                out[name] = array
+                continue
+
+            method = self.resampling.get(name, DEFAULT_RESAMPLING)
+            groups.setdefault((method, tuple(transform), array.shape), []).append(name)
+
+        for (method, transform, _), names in groups.items():
+            # nearest keeps the source dtype (SCL stays uint8)
+            dtype = scene[names[0]].dtype if method == Resampling.nearest else np.float32
+            dst = self._buffer((method, tuple(names)), len(names), dtype)
+
+            source = scene[names[0]][None] if len(names) == 1 else np.stack([scene[n] for n in names])
+            resample_to_10m(source, src_transforms[names[0]], self.crs,
+                            dst.shape, self.dst_transform, resampling=method,
+                            out=dst, num_threads=self.num_threads)
+            out.update(zip(names, dst))
+
+        return {name: out[name] for name in scene}
 
 
 # -------------------------------
 # 3.4 Radiometric Normalization
 # -------------------------------
 
-def temporal_normalization(stack):
+def normalized_dtype(dtype):
+    """
+    float32 for integer and float16 input, otherwise the input dtype.
+    """
+    if np.issubdtype(dtype, np.floating):
+        return np.result_type(dtype, np.float32)
+    return np.dtype(np.float32)
+
+
+@instrumentation.timed("local.temporal_normalization")
+def temporal_normalization(stack, nodata=None, block_rows=None, out=None):
     """
     Normalize band stack by temporal median.
     stack shape: (time, height, width)
+
+    `stack` may be a memory-mapped cube view; with `block_rows` it is
+    processed in row windows so only one window is in RAM at a time.
+    `out` may be a preallocated (e.g. memory-mapped) float array.
+
+    Float stacks keep their dtype (float64 in, float64 out). Integer
+    stacks (int16 cube bands) give float32: reflectance differences
+    and half-integer medians are exact in float32, so the values equal
+    the float64 result of `stack - nanmedian(stack)`.
     """
-    median = np.nanmedian(stack, axis=0)
-    return stack - median
+    if out is None:
+        out = np.empty(stack.shape, dtype=normalized_dtype(stack.dtype))
+
+    for rows in row_blocks(stack.shape[1], block_rows):
+        block = as_float(stack[:, rows], nodata)
+        out[:, rows] = block - np.nanmedian(block, axis=0)
+
+    return out
+
+
+@instrumentation.timed("local.normalize_scene")
+def normalize_scene(scene, baseline):
+    """
+    Normalize one new scene against a StreamingBaseline, so a
+    monitoring run only touches the newest acquisition.
+    """
+    return scene - baseline.median()
 
 
 # -------------------------------
 # 3.5 Seasonal Baseline Computation
 # -------------------------------
 
-def compute_seasonal_baseline(dates, stack):
-    """
-    Compute seasonal baselines (monthly).
+@instrumentation.timed("local.compute_seasonal_baseline")
+def compute_seasonal_baseline(dates, stack, nodata=None, block_rows=None,
+                              by="month", stat="median", q=None):
     """
-    baseline = {}
+    Compute seasonal baselines (monthly by default).
 
-    for month in range(1, 13):
-        idx = [i for i, d in enumerate(dates) if d.month == month]
-        if idx:
-            baseline[month] = np.nanmedian(stack[idx], axis=0)
-
-    return baseline
+    `by` selects the grouping ("month", "season" for the wet/dry split
+    used on GEE, "isoweek", or custom keys) and `stat` the reduction.
+    Returns {group: (height, width) array}.
+    """
+    groups, result = grouped_reduce(
+        stack, group_keys(dates, by), stats=stat, q=q,
+        nodata=nodata, block_rows=block_rows
+    )
+    return {g.item() if hasattr(g, "item") else g: result[i]
+            for i, g in enumerate(groups)}
 
 
 # -------------------------------
 # 3.6 Valid Observation Mask
 # -------------------------------
 
-def build_valid_mask(mask_stack):
+@instrumentation.timed("local.build_valid_mask")
+def build_valid_mask(mask_stack, nodata=None, block_rows=None,
+                     min_count=MIN_VALID_OBS):
     """
     Combine cloud masks across time.
+
+    A pixel is valid when it has at least `min_count` valid
+    observations, the same rule as the GEE path; `min_count=None`
+    requires every timestep to be valid.
+
+    `mask_stack` may be a boolean (time, height, width) stack, a data
+    stack with `nodata` (e.g. a cube band view), or a PackedMaskStack,
+    which is streamed one unpacked scene at a time.
+    """
+    if isinstance(mask_stack, PackedMaskStack):
+        n = len(mask_stack)
+        counter = ValidCounter(mask_stack.shape,
+                               dtype=np.uint8 if n <= 255 else np.uint16)
+        for mask in mask_stack:
+            counter.update(mask)
+        return counter.valid(n if min_count is None else min_count)
+
+    n, height, width = mask_stack.shape
+    valid = np.empty((height, width), dtype=bool)
+
+    for rows in row_blocks(height, block_rows):
+        block = mask_stack[:, rows]
+        if nodata is not None:
+            block = block != nodata
+        counts = np.count_nonzero(block, axis=0)
+        valid[rows] = counts >= (n if min_count is None else min_count)
+
+    return valid
+
+
+# -------------------------------
+# 3.7 Many mines at once
+# -------------------------------
+
+def _seasonal_baseline(stack, dates, **kwargs):
+    return compute_seasonal_baseline(dates, stack, **kwargs)
+
+
+def normalize_mines(stacks, nodata=None, block_rows=None, workers=WORKERS):
+    """
+    temporal_normalization of every `{mine_id: stack}`, one mine per
+    process through parallel.map_stacks. Returns {mine_id: normalized}.
+    """
+    return dict(map_stacks(temporal_normalization, stacks, workers=workers,
+                           out_dtype=normalized_dtype, nodata=nodata,
+                           block_rows=block_rows))
+
+
+def seasonal_baselines(dates, stacks, workers=WORKERS, **kwargs):
+    """
+    compute_seasonal_baseline of every mine; `dates` is
+    {mine_id: dates}. Returns {mine_id: {group: baseline}}.
+    """
+    per_key = {key: {"dates": dates[key]} for key in stacks}
+    return dict(map_stacks(_seasonal_baseline, stacks, workers=workers,
+                           per_key=per_key, **kwargs))
+
+
+def valid_masks(mask_stacks, workers=WORKERS, **kwargs):
+    """
+    build_valid_mask of every `{mine_id: stack}` (arrays, not
+    PackedMaskStacks). Returns {mine_id: (height, width) bool}.
     """
-    return np.all(mask_stack, axis=0)
+    return dict(map_stacks(build_valid_mask, mask_stacks, workers=workers, **kwargs))
@@ -0,0 +1,193 @@
+import numpy as np
+from pathlib import Path
+
+# =========================
+# CONFIG
+# =========================
+NDVI_RANGE = (-1.0, 1.0)
+N_BINS = 128          # bin width 0.015625 -> median error <= 0.0078
+COUNT_DTYPES = (np.uint8, np.uint16)  # widened when a bin fills up (n is uint16)
+
+
+# =========================
+# STREAMING BASELINE
+# =========================
+class StreamingBaseline:
+    """
+    Per-pixel quantized histogram of a band (NDVI by default).
+
+    Each new scene costs one histogram increment per valid pixel,
+    independent of how many scenes came before. The median (or any
+    percentile) is read from the histogram with a worst-case error of
+    half a bin width for values inside `value_range`; values outside
+    the range are clamped to the edge bins and counted in `clipped`.
+
+    State is `bins` bytes per pixel (uint8 counts, widened to uint16
+    only once some bin reaches 255 observations) plus 4 bytes of
+    counters, against 4 bytes per scene for a float32 stack. With the
+    default 128 bins it is the smaller of the two from ~33 scenes per
+    pixel on (half a year of revisits); below that keep the stack and
+    use temporal_normalization. What it always saves is time per new
+    scene: `update` and `median` do not grow with the series length,
+    while a stack median re-reads every scene.
+    """
+
+    def __init__(self, shape, bins=N_BINS, value_range=NDVI_RANGE):
+        self.shape = tuple(shape)
+        self.bins = int(bins)
+        self.vmin, self.vmax = map(float, value_range)
+        self.width = (self.vmax - self.vmin) / self.bins
+
+        n_pixels = int(np.prod(self.shape))
+        self.counts = np.zeros((self.bins, n_pixels), dtype=COUNT_DTYPES[0])
+        self.n = np.zeros(n_pixels, dtype=np.uint16)
+        self.clipped = np.zeros(n_pixels, dtype=np.uint16)
+        self.n_scenes = 0
+        self._median = None
+
+    @property
+    def nbytes(self):
+        return self.counts.nbytes + self.n.nbytes + self.clipped.nbytes
+
+    @property
+    def error_bound(self):
+        """
+        Maximum absolute error of `median()` vs the exact median
+        for pixels with no clipped observations.
+        """
+        return self.width / 2
+
+    # -------------------------
+    # Updates
+    # -------------------------
+    def update(self, scene):
+        """
+        Add one scene (height, width); NaN marks missing observations.
+        """
+        values = np.asarray(scene, dtype=np.float32).reshape(-1)
+        if values.size != self.n.size:
+            raise ValueError(f"scene shape {np.shape(scene)} != {self.shape}")
+
+        pixels = np.flatnonzero(~np.isnan(values))
+        v = values[pixels]
+
+        out_of_range = (v < self.vmin) | (v > self.vmax)
+        self.clipped[pixels[out_of_range]] += 1
+
+        idx = np.floor((v - self.vmin) / self.width).astype(np.intp)
+        np.clip(idx, 0, self.bins - 1, out=idx)
+
+        # one observation per pixel per scene, so indices never repeat
+        if self.counts[idx, pixels].max(initial=0) == np.iinfo(self.counts.dtype).max:
+            self._widen()
+        self.counts[idx, pixels] += 1
+        self.n[pixels] += 1
+        self.n_scenes += 1
+        self._median = None
+
+    def _widen(self):
+        """
+        Move counts to the next wider dtype instead of overflowing.
+        """
+        wider = COUNT_DTYPES[COUNT_DTYPES.index(self.counts.dtype.type) + 1]
+        self.counts = self.counts.astype(wider)
+
+    def update_many(self, stack):
+        for scene in stack:
+            self.update(scene)
+        return self
+
+    @classmethod
+    def from_stack(cls, stack, **kwargs):
+        return cls(np.shape(stack)[1:], **kwargs).update_many(stack)
+
+    # -------------------------
+    # Queries
+    # -------------------------
+    def _bins_of_ranks(self, *ranks):
+        """
+        Histogram bin holding the 0-based `rank`-th value of each pixel,
+        for every rank array, in one pass over the bins. Memory is a
+        few arrays of one value per pixel, whatever the bin count.
+        """
+        cum = np.zeros(self.n.size, dtype=np.uint32)
+        out = [np.zeros(self.n.size, dtype=np.intp) for _ in ranks]
+        for k in range(self.bins - 1):
+            cum += self.counts[k]
+            for bins, rank in zip(out, ranks):
+                bins += cum <= rank  # rank not reached yet: bin is further up
+        return out
+
+    def _centers(self, k):
+        return self.vmin + (k + 0.5) * self.width
+
+    def median(self):
+        """
+        Approximate per-pixel median, NaN where a pixel has no data.
+        Matches np.nanmedian to within `error_bound`. Kept until the
+        next update, so normalizing several scenes reads it once.
+        """
+        if self._median is None:
+            n = self.n.astype(np.int64)
+            lo, hi = self._bins_of_ranks(np.maximum(n - 1, 0) // 2, n // 2)
+
+            med = ((self._centers(lo) + self._centers(hi)) / 2).astype(np.float32)
+            med[n == 0] = np.nan
+            self._median = med.reshape(self.shape)
+        return self._median.copy()
+
+    def percentile(self, q):
+        """
+        Approximate per-pixel percentile (nearest-rank), NaN where empty.
+        """
+        n = self.n.astype(np.int64)
+        rank = np.clip(np.ceil(q / 100 * n).astype(np.int64) - 1, 0, None)
+
+        out = self._centers(self._bins_of_ranks(rank)[0]).astype(np.float32)
+        out[n == 0] = np.nan
+        return out.reshape(self.shape)
+
+    def error_report(self, stack=None):
+        """
+        Error bound summary; with `stack`, also the observed error
+        against the exact np.nanmedian.
+        """
+        report = {
+            "bin_width": self.width,
+            "error_bound": self.error_bound,
+            "n_scenes": self.n_scenes,
+            "pixels_with_clipped_values": int((self.clipped > 0).sum()),
+        }
+
+        if stack is not None:
+            exact = np.nanmedian(stack, axis=0)
+            diff = np.abs(self.median() - exact)
+            report["max_abs_error"] = float(np.nanmax(diff)) if np.isfinite(diff).any() else 0.0
+            report["mean_abs_error"] = float(np.nanmean(diff)) if np.isfinite(diff).any() else 0.0
+
+        return report
+
+    # -------------------------
+    # Persistence
+    # -------------------------
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez(
+            tmp, counts=self.counts, n=self.n, clipped=self.clipped,
+            shape=np.array(self.shape), n_scenes=self.n_scenes,
+            value_range=np.array([self.vmin, self.vmax])
+        )
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            obj = cls(tuple(f["shape"]), bins=f["counts"].shape[0],
+                      value_range=tuple(f["value_range"]))
+            obj.counts = f["counts"]
+            obj.n = f["n"]
+            obj.clipped = f["clipped"]
+            obj.n_scenes = int(f["n_scenes"])
+        return obj
@@ -12,20 +12,40 @@ data = [
     {"mine_id": "MINE_0004", "area_ha": 119.55, "severity": -0.007, "risk": "MODERATE", "impact": 0.84},
 ]
 
+OUT_DIR = Path("outputs")
+FINAL_COLUMNS = ["mine_id", "area_ha", "severity", "risk", "impact"]
+
+# =========================
+# BUILD
+# =========================
+def build_final_table(ranked):
+    """
+    Regulator-facing table from the Phase 5.2 ranking.
+    """
+    df = ranked[FINAL_COLUMNS].copy()
+    df["area_ha"] = df["area_ha"].round(2)
+    df["severity"] = df["severity"].round(3)
+    df["impact"] = df["impact"].round(2)
+    return df.sort_values("impact", ascending=False)
+
 # =========================
 # EXPORT
 # =========================
-def main():
-    out_dir = Path("outputs")
+def write_final_table(df, out_dir=OUT_DIR):
+    out_dir = Path(out_dir)
     out_dir.mkdir(exist_ok=True)
 
-    df = pd.DataFrame(data)
-    df = df.sort_values("impact", ascending=False)
-
     out_path = out_dir / "final_mine_assessment.csv"
     df.to_csv(out_path, index=False)
 
     print(f"✅ Final table saved → {out_path}")
+    return out_path
+
+
+def main():
+    df = pd.DataFrame(data)
+    df = df.sort_values("impact", ascending=False)
+    write_final_table(df)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,199 @@
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+# =========================
+# CONFIG
+# =========================
+HISTORY_DIR = Path("outputs/history")
+
+PARTITIONS = ["run_date", "risk"]
+ROW_GROUP_SIZE = 8192  # rows are sorted by mine_id, so row-group stats prune mine lookups
+LOOKBACK_DAYS = 90     # default query window; None scans the whole history
+
+SCHEMA = pa.schema([
+    ("run_id", pa.string()),
+    ("config_id", pa.string()),
+    ("window_start", pa.string()),
+    ("window_end", pa.string()),
+    ("mine_id", pa.string()),
+    ("area_ha", pa.float64()),
+    ("severity", pa.float64()),
+    ("impact", pa.float64()),
+    ("run_date", pa.string()),
+    ("risk", pa.string()),
+])
+PARTITIONING = ds.partitioning(
+    pa.schema([(name, SCHEMA.field(name).type) for name in PARTITIONS]), flavor="hive"
+)
+
+
+# =========================
+# WRITE
+# =========================
+def new_run_id(now=None):
+    """
+    Sortable by start time, plus a random suffix so two runs started
+    in the same instant do not write over each other's files.
+    """
+    now = now or datetime.now(timezone.utc)
+    return f"{now:%Y%m%dT%H%M%S%fZ}-{uuid.uuid4().hex[:8]}"
+
+
+def append_run(ranked, config_id, window, run_id=None, run_date=None,
+               root=HISTORY_DIR):
+    """
+    Append one run's per-mine results (mine_id, area_ha, severity,
+    risk, impact) to the history dataset under
+    <root>/run_date=YYYY-MM-DD/risk=<class>/<run_id>-*.parquet.
+
+    Earlier runs are never rewritten. Returns the run_id.
+    """
+    run_id = run_id or new_run_id()
+    run_date = run_date or f"{run_id[:4]}-{run_id[4:6]}-{run_id[6:8]}"
+
+    df = ranked[["mine_id", "area_ha", "severity", "risk", "impact"]].copy()
+    df["severity"] = pd.to_numeric(df["severity"], errors="coerce")
+    df = df.assign(run_id=run_id, config_id=config_id,
+                   window_start=str(window[0]), window_end=str(window[1]),
+                   run_date=run_date)
+    df = df.sort_values("mine_id", kind="stable")
+
+    table = pa.Table.from_pandas(df[SCHEMA.names], schema=SCHEMA, preserve_index=False)
+    ds.write_dataset(
+        table, Path(root), format="parquet", partitioning=PARTITIONING,
+        basename_template=f"{run_id}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        max_rows_per_group=ROW_GROUP_SIZE,
+    )
+    print(f"🗃 History: {len(df)} mines appended as run {run_id} → {root}")
+    return run_id
+
+
+# =========================
+# QUERIES
+# =========================
+def history_dataset(root=HISTORY_DIR):
+    return ds.dataset(Path(root), format="parquet", schema=SCHEMA,
+                      partitioning=PARTITIONING)
+
+
+def run_dates(root=HISTORY_DIR):
+    """
+    Partition dates present, newest first (from directory names only).
+    """
+    return sorted((p.name.split("=", 1)[1] for p in Path(root).glob("run_date=*")),
+                  reverse=True)
+
+
+def read_history(filter=None, columns=None, root=HISTORY_DIR):
+    """
+    Rows matching a pyarrow `filter`. Conditions on run_date / risk
+    prune partitions; conditions on mine_id skip row groups by stats.
+    """
+    if not Path(root).exists():
+        return pd.DataFrame(columns=columns or SCHEMA.names)
+    table = history_dataset(root).to_table(filter=filter, columns=columns)
+    return table.to_pandas()
+
+
+def default_since(lookback_days=LOOKBACK_DAYS, today=None):
+    """
+    First run date of the default query window, or None for no bound.
+    """
+    if lookback_days is None:
+        return None
+    return ((today or date.today()) - timedelta(days=lookback_days)).isoformat()
+
+
+def date_filter(start=None, end=None):
+    expr = None
+    if start is not None:
+        expr = pc.field("run_date") >= str(start)
+    if end is not None:
+        upper = pc.field("run_date") <= str(end)
+        expr = upper if expr is None else expr & upper
+    return expr
+
+
+def latest_per_mine(mine_ids=None, since=None, lookback_days=LOOKBACK_DAYS,
+                    root=HISTORY_DIR):
+    """
+    Most recent row of every mine (or of `mine_ids`) run on or after
+    `since`, by default the last `lookback_days` days.
+
+    One scan of the dataset: run_date prunes partitions and mine_id
+    skips row groups by stats.
+    """
+    since = since or default_since(lookback_days)
+    expr = date_filter(since)
+    if mine_ids is not None:
+        ids = pc.field("mine_id").isin(sorted(set(mine_ids)))
+        expr = ids if expr is None else expr & ids
+
+    df = read_history(expr, root=root)
+    if df.empty:
+        return pd.DataFrame(columns=SCHEMA.names)
+    df = df.sort_values("run_id").drop_duplicates("mine_id", keep="last")
+    return df.sort_values("mine_id", ignore_index=True)
+
+
+def mine_trend(mine_id, start=None, end=None, root=HISTORY_DIR):
+    """
+    Every recorded run of one mine, oldest first.
+    """
+    expr = pc.field("mine_id") == mine_id
+    dates = date_filter(start, end)
+    if dates is not None:
+        expr &= dates
+    return read_history(expr, root=root).sort_values("run_id", ignore_index=True)
+
+
+def risk_changes(since=None, lookback_days=LOOKBACK_DAYS, root=HISTORY_DIR):
+    """
+    Mines whose risk class differs between their latest run and the
+    run before it (only runs on or after `since`, by default the last
+    `lookback_days` days, are considered).
+    """
+    since = since or default_since(lookback_days)
+    df = read_history(date_filter(since),
+                      columns=["mine_id", "run_id", "run_date", "risk", "impact"],
+                      root=root)
+    if df.empty:
+        return pd.DataFrame(columns=["mine_id", "previous_risk", "risk",
+                                     "previous_run", "run_id", "impact"])
+
+    df = df.sort_values(["mine_id", "run_id"])
+    last_two = df.groupby("mine_id").tail(2)
+    previous = last_two.groupby("mine_id").nth(0).set_index("mine_id")
+    latest = last_two.groupby("mine_id").nth(-1).set_index("mine_id")
+
+    changed = latest.join(previous[["risk", "run_id"]], rsuffix="_previous")
+    changed = changed[(changed["run_id"] != changed["run_id_previous"])
+                      & (changed["risk"] != changed["risk_previous"])]
+
+    return changed.reset_index().rename(columns={
+        "risk_previous": "previous_risk", "run_id_previous": "previous_run"
+    })[["mine_id", "previous_risk", "risk", "previous_run", "run_id", "impact"]]
+
+
+def main():
+    latest = latest_per_mine()
+    print(f"📚 History: {len(run_dates())} run dates, {len(latest)} mines "
+          f"run since {default_since()}")
+    print(latest["risk"].value_counts().to_string() if len(latest) else "(empty)")
+
+    changes = risk_changes()
+    print(f"🔀 {len(changes)} mines changed risk class since their previous run "
+          f"(last {LOOKBACK_DAYS} days)")
+    if len(changes):
+        print(changes.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
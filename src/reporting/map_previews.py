@@ -0,0 +1,75 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import rasterio
+from pathlib import Path
+from rasterio.errors import NotGeoreferencedWarning
+
+from src.ingestion.cog import PREVIEW_SIZE, read_preview
+
+# =========================
+# CONFIG
+# =========================
+MAPS_DIR = Path("outputs/maps")
+PREVIEW_DIR = MAPS_DIR / "previews"
+
+DNDVI_RANGE = (-0.5, 0.5)  # stretch of the quicklook colour ramp
+
+
+# =========================
+# QUICKLOOKS
+# =========================
+def dndvi_quicklook(dndvi, vmin=DNDVI_RANGE[0], vmax=DNDVI_RANGE[1]):
+    """
+    RGB uint8 image of a masked dNDVI array in NDVI units (decode
+    compact int16 values first, see read_preview): red for loss,
+    green for gain, white where there is no data.
+    """
+    scaled = np.clip((dndvi.filled(0) - vmin) / (vmax - vmin), 0, 1)
+    rgb = np.empty((3,) + dndvi.shape, dtype=np.uint8)
+    rgb[0] = (255 * np.clip(2 - 2 * scaled, 0, 1)).astype(np.uint8)
+    rgb[1] = (255 * np.clip(2 * scaled, 0, 1)).astype(np.uint8)
+    rgb[2] = 0
+    rgb[:, np.ma.getmaskarray(dndvi)] = 255
+    return rgb
+
+
+def write_preview(map_path, out_dir=PREVIEW_DIR, max_size=PREVIEW_SIZE):
+    """
+    PNG quicklook of band 1 of a change map, read from the COG
+    overviews and decoded with its scale, so float32 and compact
+    int16 maps give the same image. Returns preview stats for the report.
+    """
+    dndvi, _ = read_preview(map_path, max_size, indexes=1)
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_path = out_dir / f"{Path(map_path).stem}.png"
+
+    rgb = dndvi_quicklook(dndvi)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", NotGeoreferencedWarning)  # plain image, no georeference
+        with rasterio.open(out_path, "w", driver="PNG", width=rgb.shape[2],
+                           height=rgb.shape[1], count=3, dtype="uint8") as dst:
+            dst.write(rgb)
+
+    return {
+        "map": str(map_path),
+        "preview": str(out_path),
+        "mean_dndvi": float(dndvi.mean()) if dndvi.count() else None,
+        "valid_pct": round(100 * float(dndvi.count()) / dndvi.size, 1),
+    }
+
+
+def main():
+    maps = sorted(p for p in MAPS_DIR.glob("**/*.tif") if PREVIEW_DIR not in p.parents)
+    rows = [write_preview(p) for p in maps]
+
+    df = pd.DataFrame(rows, columns=["map", "preview", "mean_dndvi", "valid_pct"])
+    print(f"🖼 {len(df)} change-map previews → {PREVIEW_DIR}")
+    return df
+
+
+if __name__ == "__main__":
+    main()
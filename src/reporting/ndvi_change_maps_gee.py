@@ -1,6 +1,9 @@
 import ee
+from functools import partial
 from pathlib import Path
 
+from src.catalog import ArtifactCatalog, aoi_config_hashes, export_tracker
+from src.ingestion.export_manager import EarthEngineBackend, ExportManager
 from src.ingestion.load_mines import load_mine_polygons
 from src.ingestion.sentinel_access import prepare_mine_aois
 
@@ -11,9 +14,17 @@ START_DATE = "2022-01-01"
 END_DATE = "2022-12-31"
 MAX_MINES = 5
 
+EARLY_PERIOD = ("2022-01-01", "2022-06-30")
+LATE_PERIOD = ("2022-07-01", "2022-12-31")
+
 OUT_DIR = Path("outputs/maps")
 OUT_DIR.mkdir(parents=True, exist_ok=True)
 
+EXPORT_FOLDER = "NDVI_CHANGE_MAPS"
+MAP_PRODUCT = "ndvi_change_map"
+MAP_CONFIG = {"scale": 10, "crs": "EPSG:4326", "folder": EXPORT_FOLDER,
+              "early": EARLY_PERIOD, "late": LATE_PERIOD}
+
 # =========================
 # INIT GEE
 # =========================
@@ -29,6 +40,21 @@ def add_ndvi(image):
         image.normalizedDifference(["B8", "B4"]).rename("NDVI")
     )
 
+# =========================
+# EXPORT TASK
+# =========================
+def change_map_task(image, geom, mine_id):
+    return ee.batch.Export.image.toDrive(
+        image=image,
+        description=f"{mine_id}_NDVI_CHANGE",
+        folder=EXPORT_FOLDER,
+        fileNamePrefix=f"{mine_id}_ndvi_change",
+        region=geom,
+        scale=10,
+        crs="EPSG:4326",
+        maxPixels=1e13
+    )
+
 # =========================
 # MAIN
 # =========================
@@ -45,41 +71,50 @@ def main():
         .map(add_ndvi)
     )
 
+    catalog = ArtifactCatalog()
+    map_hash = aoi_config_hashes(MAP_CONFIG, aois)
+    period = f"{START_DATE}_{END_DATE}"
+    backend = EarthEngineBackend()
+    catalog.reconcile_tasks(MAP_PRODUCT, backend.list_statuses())
+    done = catalog.done_keys(MAP_PRODUCT, map_hash,
+                             statuses=("complete", "empty", "pending"))
+
+    manager = ExportManager(backend,
+                            on_update=export_tracker(catalog, MAP_PRODUCT, map_hash))
+
     for _, row in aois.iterrows():
         mine_id = row["mine_id"]
-        geom = ee.Geometry.Polygon(list(row.geometry.exterior.coords))
+        if (mine_id, period) in done:
+            continue
+        geom = ee.Geometry(row.geometry.__geo_interface__)
 
         mine_ic = s2.filterBounds(geom)
 
         early = (
             mine_ic
-            .filterDate("2022-01-01", "2022-06-30")
+            .filterDate(*EARLY_PERIOD)
             .select("NDVI")
             .median()
         )
 
         late = (
             mine_ic
-            .filterDate("2022-07-01", "2022-12-31")
+            .filterDate(*LATE_PERIOD)
             .select("NDVI")
             .median()
         )
 
         ndvi_change = late.subtract(early).clip(geom)
 
-        task = ee.batch.Export.image.toDrive(
-            image=ndvi_change,
-            description=f"{mine_id}_NDVI_CHANGE",
-            folder="NDVI_CHANGE_MAPS",
-            fileNamePrefix=f"{mine_id}_ndvi_change",
-            region=geom,
-            scale=10,
-            crs="EPSG:4326",
-            maxPixels=1e13
-        )
+        manager.submit(f"{mine_id}_NDVI_CHANGE",
+                       partial(change_map_task, ndvi_change, geom, mine_id),
+                       mine_id=mine_id, date=period,
+                       location=f"drive:{EXPORT_FOLDER}/{mine_id}_ndvi_change")
+        print(f"🗺️ Queued NDVI change map for {mine_id}")
 
-        task.start()
-        print(f"🗺️ Exporting NDVI change map for {mine_id}")
+    report = manager.run()
+    catalog.close()
+    return report
 
 if __name__ == "__main__":
     main()
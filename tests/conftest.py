@@ -0,0 +1,12 @@
+import sys
+from pathlib import Path
+
+# Modules import each other as `src.…`, as when run from the repo root
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+# Tests never talk to Earth Engine: `import ee` gets the NumPy stand-in
+import fake_ee  # noqa: E402
+
+sys.modules["ee"] = fake_ee
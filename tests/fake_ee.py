@@ -0,0 +1,259 @@
+"""
+NumPy stand-in for the Earth Engine client (`ee`), installed as
+`sys.modules["ee"]` by conftest so tests never need an account or
+network access.
+
+Only the calls the pipeline makes are implemented. Every image lives
+on one grid (`use_grid`), bands are float64 masked arrays, and
+collections are lists of images registered in COLLECTIONS. Masks
+follow Earth Engine: masked pixels are skipped by collection and
+region reducers and stay masked through band maths. Every getInfo()
+is appended to `requests`, one entry per round trip.
+"""
+import numpy as np
+from rasterio.features import geometry_mask
+from rasterio.transform import from_origin
+
+TRANSFORM = from_origin(0.0, 1.0, 1e-3, 1e-3)
+SHAPE = (100, 100)
+COLLECTIONS = {}
+requests = []
+
+
+def use_grid(transform, shape):
+    global TRANSFORM, SHAPE
+    TRANSFORM, SHAPE = transform, tuple(shape)
+
+
+def reset():
+    COLLECTIONS.clear()
+    requests.clear()
+
+
+def Initialize(*args, **kwargs):
+    pass
+
+
+def Authenticate(*args, **kwargs):
+    pass
+
+
+def _as_list(names):
+    return [names] if isinstance(names, str) else list(names)
+
+
+# -------------------------------
+# Geometry / features
+# -------------------------------
+
+class Geometry:
+    def __init__(self, geojson):
+        self.geojson = geojson
+
+    @classmethod
+    def Polygon(cls, coords):
+        return cls({"type": "Polygon", "coordinates": [coords]})
+
+    def pixels(self):
+        """
+        Grid pixels whose centre falls inside the geometry.
+        """
+        return geometry_mask([self.geojson], SHAPE, TRANSFORM, invert=True)
+
+
+class Feature:
+    def __init__(self, geometry, properties=None):
+        self.geometry = geometry
+        self.properties = dict(properties or {})
+
+
+class FeatureCollection:
+    def __init__(self, features):
+        self.features = list(features)
+
+    def select(self, properties, new_properties=None, retain_geometry=True):
+        keep = set(properties)
+        return FeatureCollection(
+            Feature(f.geometry if retain_geometry else None,
+                    {k: v for k, v in f.properties.items() if k in keep})
+            for f in self.features
+        )
+
+    def getInfo(self):
+        requests.append("FeatureCollection.getInfo")
+        return {
+            "type": "FeatureCollection",
+            "features": [{"type": "Feature", "geometry": None,
+                          "properties": dict(f.properties)} for f in self.features],
+        }
+
+
+class Filter:
+    @staticmethod
+    def lt(name, value):
+        return lambda properties: properties[name] < value
+
+
+class Reducer:
+    @staticmethod
+    def sum():
+        return "sum"
+
+
+# -------------------------------
+# Images
+# -------------------------------
+
+def _full(value):
+    return np.ma.masked_array(np.full(SHAPE, float(value)), mask=np.zeros(SHAPE, bool))
+
+
+class Image:
+    def __init__(self, bands, properties=None):
+        self.bands = {name: np.ma.masked_invalid(np.ma.asarray(band, dtype=float))
+                      for name, band in bands.items()}
+        self.properties = dict(properties or {})
+
+    @classmethod
+    def constant(cls, value):
+        return cls({"constant": _full(value)})
+
+    def _map(self, func):
+        return Image({name: func(band) for name, band in self.bands.items()},
+                     self.properties)
+
+    def _zip(self, other, func):
+        if not isinstance(other, Image):
+            return self._map(lambda band: func(band, _full(other)))
+        others = list(other.bands.values())
+        return Image({name: func(band, others[i if len(others) > 1 else 0])
+                      for i, (name, band) in enumerate(self.bands.items())},
+                     self.properties)
+
+    # bands
+    def select(self, names):
+        return Image({name: self.bands[name] for name in _as_list(names)}, self.properties)
+
+    def rename(self, names):
+        return Image(dict(zip(_as_list(names), self.bands.values())), self.properties)
+
+    def addBands(self, images):
+        bands = dict(self.bands)
+        for image in (images if isinstance(images, list) else [images]):
+            bands.update(image.bands)
+        return Image(bands, self.properties)
+
+    def copyProperties(self, source, properties=None):
+        names = properties or source.properties
+        return Image(self.bands, {**self.properties,
+                                  **{k: source.properties[k] for k in names}})
+
+    def get(self, name):
+        return self.properties.get(name)
+
+    # masks
+    def updateMask(self, mask):
+        keep = list(mask.bands.values())[0]
+        drop = np.ma.getmaskarray(keep) | (keep.filled(0) == 0)
+        return self._map(lambda band: np.ma.masked_array(band.data, np.ma.getmaskarray(band) | drop))
+
+    def mask(self):
+        return self._map(lambda band: np.ma.masked_array(
+            (~np.ma.getmaskarray(band)).astype(float), mask=np.zeros(SHAPE, bool)))
+
+    def clip(self, geometry):
+        outside = ~Geometry(geometry.geojson).pixels()
+        return self._map(lambda band: np.ma.masked_array(band.data, np.ma.getmaskarray(band) | outside))
+
+    # maths
+    def normalizedDifference(self, names):
+        a, b = (self.bands[name] for name in names)
+        return Image({"nd": (a - b) / (a + b)}, self.properties)
+
+    def subtract(self, other):
+        return self._zip(other, lambda a, b: a - b)
+
+    def multiply(self, other):
+        return self._zip(other, lambda a, b: a * b)
+
+    def lt(self, other):
+        return self._zip(other, lambda a, b: (a < b).astype(float))
+
+    def gte(self, other):
+        return self._zip(other, lambda a, b: (a >= b).astype(float))
+
+    def eq(self, other):
+        return self._zip(other, lambda a, b: (a == b).astype(float))
+
+    def Or(self, other):
+        return self._zip(other, lambda a, b: ((a != 0) | (b != 0)).astype(float))
+
+    def remap(self, from_values, to_values, default_value=None):
+        def remap_band(band):
+            out = np.ma.masked_array(np.full(SHAPE, np.nan), np.ma.getmaskarray(band).copy())
+            if default_value is None:
+                out.mask |= ~np.isin(band.data, from_values)
+            else:
+                out.data[...] = default_value
+            for old, new in zip(from_values, to_values):
+                out.data[band.data == old] = new
+            return out
+        return self._map(remap_band)
+
+    # region reduction
+    def reduceRegions(self, collection, reducer, scale=None):
+        assert reducer == "sum", reducer
+        features = []
+        for feature in collection.features:
+            inside = feature.geometry.pixels()
+            # like ee.Reducer.sum(), a region without unmasked pixels sums to 0
+            stats = {name: float(band[inside].compressed().sum())
+                     for name, band in self.bands.items()}
+            features.append(Feature(feature.geometry, {**feature.properties, **stats}))
+        return FeatureCollection(features)
+
+
+# -------------------------------
+# Collections
+# -------------------------------
+
+class ImageCollection:
+    def __init__(self, images):
+        self.images = list(COLLECTIONS[images] if isinstance(images, str) else images)
+
+    def filterDate(self, start, end):
+        return ImageCollection(i for i in self.images
+                               if str(start) <= i.properties["date"] < str(end))
+
+    def filter(self, predicate):
+        return ImageCollection(i for i in self.images if predicate(i.properties))
+
+    def filterBounds(self, geometry):
+        return self
+
+    def select(self, names):
+        return ImageCollection(i.select(names) for i in self.images)
+
+    def map(self, func):
+        return ImageCollection(func(i) for i in self.images)
+
+    def size(self):
+        return len(self.images)
+
+    def _reduce(self, func):
+        names = list(self.images[0].bands)
+        return Image({name: func(np.ma.stack([i.bands[name] for i in self.images]))
+                      for name in names})
+
+    def median(self):
+        return self._reduce(lambda stack: np.ma.median(stack, axis=0))
+
+    def mean(self):
+        return self._reduce(lambda stack: stack.mean(axis=0))
+
+    def sum(self):
+        return self._reduce(lambda stack: stack.sum(axis=0))
+
+    def count(self):
+        return self._reduce(lambda stack: np.ma.masked_array(
+            stack.count(axis=0).astype(float), mask=np.zeros(SHAPE, bool)))
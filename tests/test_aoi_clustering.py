@@ -0,0 +1,75 @@
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from src.ingestion.aoi_clustering import bbox_pixels, cluster_mine_aois, clustering_summary
+
+SIDE = 0.01  # degrees, ~1 km
+
+
+def aois(boxes):
+    return gpd.GeoDataFrame({"mine_id": [f"M{i:02d}" for i in range(len(boxes))]},
+                            geometry=[shapely.box(*b) for b in boxes], crs="EPSG:4326")
+
+
+def check_regions(mines, regions, max_region_pixels):
+    # every mine in exactly one region, and the same one in both tables
+    members = [m for ids in regions["mine_ids"] for m in ids]
+    assert sorted(members) == sorted(mines["mine_id"])
+    region_of = {m: r for r, ids in zip(regions["region_id"], regions["mine_ids"]) for m in ids}
+    assert dict(zip(mines["mine_id"], mines["region_id"])) == region_of
+
+    geometry = dict(zip(regions["region_id"], regions.geometry))
+    for _, region in regions.iterrows():
+        if len(region["mine_ids"]) > 1:
+            assert region["n_pixels"] <= max_region_pixels
+        assert region["n_pixels"] == bbox_pixels(region.geometry.bounds)[0]
+    for mine_id, region_id, geom in zip(mines["mine_id"], mines["region_id"], mines.geometry):
+        assert geometry[region_id].covers(geom)
+
+
+def test_overlapping_mines_share_a_region_far_ones_do_not():
+    x, y = 85.0, 23.0
+    mines, regions = cluster_mine_aois(aois([
+        (x, y, x + SIDE, y + SIDE),
+        (x + SIDE / 2, y, x + 1.5 * SIDE, y + SIDE),          # overlaps M00
+        (x + SIDE / 4, y + SIDE / 4, x + SIDE / 2, y + SIDE / 2),  # inside M00
+        (x + 1, y + 1, x + 1 + SIDE, y + 1 + SIDE),           # far away
+    ]))
+
+    region = dict(zip(mines["mine_id"], mines["region_id"]))
+    assert region["M00"] == region["M01"] == region["M02"] != region["M03"]
+    assert len(regions) == 2
+    check_regions(mines, regions, np.inf)
+
+    summary = clustering_summary(mines, regions)
+    assert summary["shared_pixels"] < summary["per_mine_pixels"]
+
+
+def test_regions_stay_under_the_pixel_budget():
+    # a long chain of overlapping mines, far more than one region's budget
+    x, y = 85.0, 23.0
+    chain = [(x + i * SIDE / 2, y, x + i * SIDE / 2 + SIDE, y + SIDE) for i in range(20)]
+    one_mine = bbox_pixels(shapely.bounds(shapely.box(*chain[0])))[0]
+    budget = 4 * one_mine
+
+    mines, regions = cluster_mine_aois(aois(chain), max_region_pixels=budget)
+
+    assert 1 < len(regions) < len(chain)
+    check_regions(mines, regions, budget)
+
+
+def test_random_mines_are_each_assigned_once():
+    rng = np.random.default_rng(0)
+    x0 = 85.0 + rng.random(200) * 0.3
+    y0 = 23.0 + rng.random(200) * 0.3
+    size = rng.uniform(0.002, 0.02, (200, 2))
+    budget = 2_000_000
+
+    mines, regions = cluster_mine_aois(aois(np.column_stack(
+        [x0, y0, x0 + size[:, 0], y0 + size[:, 1]])), max_region_pixels=budget)
+
+    assert len(regions) < len(mines)
+    check_regions(mines, regions, budget)
+    summary = clustering_summary(mines, regions)
+    assert summary["shared_pixels"] <= summary["per_mine_pixels"]
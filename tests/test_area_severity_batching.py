@@ -0,0 +1,117 @@
+import geopandas as gpd
+import numpy as np
+import pytest
+import shapely
+from rasterio.transform import from_origin
+
+import fake_ee
+from src.processing import area_severity_ndvi_gee as gee
+
+PIXEL_DEG = 1e-4  # ~11 m at the equator
+GRID = from_origin(80.0, 22.0, PIXEL_DEG, PIXEL_DEG)
+SHAPE = (120, 200)
+
+
+@pytest.fixture(autouse=True)
+def grid():
+    fake_ee.reset()
+    fake_ee.use_grid(GRID, SHAPE)
+
+
+def pixel_box(col0, row0, cols, rows):
+    """
+    Polygon covering whole grid pixels (no centre on its edge).
+    """
+    x0, y0 = GRID * (col0, row0)
+    x1, y1 = GRID * (col0 + cols, row0 + rows)
+    return shapely.box(x0, y1, x1, y0)
+
+
+def mine_aois():
+    boxes = {
+        "M1": pixel_box(0, 0, 10, 10),
+        "M2": pixel_box(20, 5, 30, 12),
+        "M3": pixel_box(60, 0, 120, 110),  # large: split into tiles
+        "M4": pixel_box(190, 100, 6, 6),
+        "M5": pixel_box(10, 60, 40, 50),
+    }
+    return gpd.GeoDataFrame({"mine_id": list(boxes)}, geometry=list(boxes.values()),
+                            crs="EPSG:4326")
+
+
+def change_products(seed=0):
+    rng = np.random.default_rng(seed)
+    persistent = (rng.random(SHAPE) < 0.3).astype(float)
+    mean_dndvi = rng.uniform(-0.6, 0.1, SHAPE)
+    mean_dndvi[rng.random(SHAPE) < 0.1] = np.nan  # no valid observations
+    return persistent, mean_dndvi
+
+
+# -------------------------------
+# features_to_table
+# -------------------------------
+
+def test_features_to_table_adds_tile_sums_before_dividing():
+    features = [
+        {"properties": {"mine_id": "A", "tile_id": 0, "area_m2": 300.0,
+                        "severity_sum": -0.9, "severity_n": 3.0}},
+        {"properties": {"mine_id": "B", "tile_id": 0, "area_m2": 0.0,
+                        "severity_sum": 0.0, "severity_n": 0.0}},
+        {"properties": {"mine_id": "A", "tile_id": 1, "area_m2": 100.0,
+                        "severity_sum": -0.1, "severity_n": 1.0}},
+        {"properties": {"mine_id": "C", "tile_id": 0}},  # nothing unmasked
+    ]
+
+    table = gee.features_to_table(features).set_index("mine_id")
+
+    assert list(table.index) == ["A", "B", "C"]
+    assert table.loc["A", "area_ha"] == pytest.approx(0.04)
+    # (-0.9 - 0.1) / (3 + 1), not the mean of the tile means (-0.3 and -0.1)
+    assert table.loc["A", "severity"] == pytest.approx(-0.25)
+    assert table.loc["B", "area_ha"] == 0 and table.loc["B", "severity"] is None
+    assert table.loc["C", "area_ha"] == 0 and table.loc["C", "severity"] is None
+
+
+# -------------------------------
+# reduce_area_severity
+# -------------------------------
+
+def expected_per_mine(aois, persistent, mean_dndvi):
+    rows = {}
+    for mine_id, geom in zip(aois["mine_id"], aois.geometry):
+        inside = fake_ee.Geometry(geom.__geo_interface__).pixels()
+        sel = inside & (persistent > 0)
+        severity = mean_dndvi[sel & ~np.isnan(mean_dndvi)]
+        rows[mine_id] = (sel.sum() * gee.PIXEL_AREA_M2 / 10_000,
+                         severity.mean() if severity.size else None)
+    return rows
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 250])
+def test_batches_and_tiles_match_whole_mine_reduction(batch_size, capsys):
+    aois = mine_aois()
+    persistent, mean_dndvi = change_products()
+    image = gee.area_severity_image(
+        fake_ee.Image({"persistent_change": persistent}),
+        fake_ee.Image({"dNDVI": mean_dndvi}).updateMask(
+            fake_ee.Image({"m": ~np.isnan(mean_dndvi)})),
+    )
+
+    max_tile_pixels = 3000
+    tiles = gee.tile_aois(aois, max_pixels=max_tile_pixels, scale=10)
+    assert (tiles["mine_id"] == "M3").sum() > 1
+
+    result = gee.reduce_area_severity(image, aois, batch_size=batch_size,
+                                      max_tile_pixels=max_tile_pixels, workers=3)
+
+    # one reduceRegions round trip per batch of tiles, as reported
+    assert len(fake_ee.requests) == -(-len(tiles) // batch_size)
+    assert (f"{len(tiles)} tiles in {len(fake_ee.requests)} batched"
+            in capsys.readouterr().out)
+
+    expected = expected_per_mine(aois, persistent, mean_dndvi)
+    result = result.set_index("mine_id")
+    assert sorted(result.index) == sorted(expected)
+    for mine_id, (area_ha, severity) in expected.items():
+        assert result.loc[mine_id, "area_ha"] == pytest.approx(area_ha)
+        assert result.loc[mine_id, "severity"] == pytest.approx(severity)
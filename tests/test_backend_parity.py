@@ -0,0 +1,117 @@
+import geopandas as gpd
+import numpy as np
+import pytest
+import rasterio
+import shapely
+from rasterio.transform import from_origin
+
+import fake_ee
+from src.processing import area_severity_ndvi_gee as gee
+from src.processing.change_detection_local import compare_backends, run_local
+
+PIXEL_DEG = 1e-4
+GRID = from_origin(85.0, 23.0, PIXEL_DEG, PIXEL_DEG)
+SHAPE = (60, 90)
+DATES = [f"2022-{month:02d}-15" for month in range(1, 11)]
+
+# mine_id -> (col, row, cols, rows) on the grid
+MINES = {"M1": (2, 3, 30, 25), "M2": (40, 10, 45, 40), "M3": (5, 35, 20, 20)}
+
+# SCL classes drawn per pixel: mostly vegetation / soil, plus clouds
+# (8, 9), shadow (3), snow (11) and no data (0)
+SCL_CLASSES = [4, 4, 4, 5, 5, 6, 7, 8, 9, 3, 11, 0]
+
+
+def synthetic_scenes(seed=0):
+    """
+    Raw B4 / B8 / SCL per date. Part of each mine loses vegetation
+    from the fifth scene on; clouds and snow get bright, flat values
+    that would look like change if they were not masked.
+    """
+    rng = np.random.default_rng(seed)
+    cleared = np.zeros(SHAPE, bool)
+    cleared[10:45, 15:70] = True
+
+    scenes = []
+    for t, date in enumerate(DATES):
+        scl = rng.choice(SCL_CLASSES, size=SHAPE).astype(np.uint8)
+        red = rng.integers(300, 600, SHAPE)
+        nir = rng.integers(2500, 3500, SHAPE)
+        if t >= 4:
+            nir = np.where(cleared, rng.integers(600, 900, SHAPE), nir)
+        bright = np.isin(scl, [8, 9, 11])
+        red = np.where(bright, 4000, red)
+        nir = np.where(bright, 4100, nir)
+        scenes.append({"B4": red, "B8": nir, "SCL": scl, "date": date})
+    return scenes
+
+
+def mine_box(col, row, cols, rows):
+    x0, y0 = GRID * (col, row)
+    x1, y1 = GRID * (col + cols, row + rows)
+    return shapely.box(x0, y1, x1, y0)
+
+
+def write_local_scenes(scenes, raw_dir):
+    """
+    One GeoTIFF per mine and date under raw_dir/<mine_id>/<date>.tif,
+    unmasked, so the local SCL mask does the masking.
+    """
+    for mine_id, (col, row, cols, rows) in MINES.items():
+        (raw_dir / mine_id).mkdir(parents=True)
+        transform = GRID * rasterio.Affine.translation(col, row)
+        for scene in scenes:
+            bands = [scene[b][row:row + rows, col:col + cols] for b in ("B4", "B8", "SCL")]
+            profile = {"driver": "GTiff", "width": cols, "height": rows, "count": 3,
+                       "dtype": "uint16", "crs": "EPSG:4326", "transform": transform}
+            with rasterio.open(raw_dir / mine_id / f"{scene['date']}.tif", "w", **profile) as dst:
+                dst.write(np.stack(bands).astype(np.uint16))
+                dst.descriptions = ("B4", "B8", "SCL")
+
+
+def run_gee(scenes):
+    fake_ee.reset()
+    fake_ee.use_grid(GRID, SHAPE)
+    fake_ee.COLLECTIONS["COPERNICUS/S2_SR_HARMONIZED"] = [
+        fake_ee.Image({b: s[b] for b in ("B4", "B8", "SCL")},
+                      {"date": s["date"], "CLOUDY_PIXEL_PERCENTAGE": 10})
+        for s in scenes
+    ]
+
+    aois = gpd.GeoDataFrame({"mine_id": list(MINES)},
+                            geometry=[mine_box(*box) for box in MINES.values()],
+                            crs="EPSG:4326")
+    s2 = gee.ndvi_collection(aois, "2022-01-01", "2022-12-31", max_cloud=20)
+    image = gee.area_severity_image(*gee.change_images(s2))
+    return gee.reduce_area_severity(image, aois)
+
+
+def test_local_and_gee_backends_agree(tmp_path):
+    scenes = synthetic_scenes()
+    write_local_scenes(scenes, tmp_path)
+
+    local_df = run_local(list(MINES), raw_dir=tmp_path, workers=1)
+    gee_df = run_gee(scenes)
+
+    merged = compare_backends(local_df, gee_df)
+    assert len(merged) == len(MINES)
+    assert merged["within_tolerance"].all(), merged.to_string()
+    assert (merged["area_ha_gee"] > 0).all()  # the check covers real change
+
+    # both paths see the same pixels, so beyond float32 round-off they match
+    assert merged["area_diff"].max() == 0
+    assert merged["severity_diff"].max() < 1e-5
+
+
+def test_clouds_and_snow_are_masked_in_both_backends(tmp_path):
+    scenes = synthetic_scenes()
+    write_local_scenes(scenes, tmp_path)
+
+    # with every scene unmasked the bright cloud/snow pixels would
+    # dominate the dNDVI, so agreement means both applied VALID_SCL
+    local_df = run_local(list(MINES), raw_dir=tmp_path, workers=1).set_index("mine_id")
+    gee_df = run_gee(scenes).set_index("mine_id")
+
+    for mine_id in MINES:
+        assert local_df.loc[mine_id, "severity"] == pytest.approx(
+            gee_df.loc[mine_id, "severity"], abs=1e-5)
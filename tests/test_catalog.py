@@ -0,0 +1,42 @@
+import geopandas as gpd
+import shapely
+
+from src.catalog import ArtifactCatalog, aoi_config_hashes
+from src.ingestion.sentinel_access import prepare_mine_aois
+
+CONFIG = {"collection": "COPERNICUS/S2_SR_HARMONIZED", "scale": 10}
+
+
+def mines():
+    return gpd.GeoDataFrame(
+        {"mine_id": ["M1", "M2"]},
+        geometry=[shapely.Polygon([(85.0, 23.0), (85.01, 23.0), (85.0, 23.01)]),
+                  shapely.box(85.2, 23.2, 85.21, 23.21)],
+        crs="EPSG:4326",
+    )
+
+
+def test_scenes_are_redone_for_mines_whose_aoi_changed(tmp_path):
+    catalog = ArtifactCatalog(tmp_path / "catalog.sqlite")
+    bbox = prepare_mine_aois(mines(), buffer_m=500, mode="bbox", cache_dir=None)
+    polygon = prepare_mine_aois(mines(), buffer_m=500, mode="polygon", cache_dir=None)
+    wider = prepare_mine_aois(mines(), buffer_m=1000, mode="bbox", cache_dir=None)
+
+    hashes = aoi_config_hashes(CONFIG, bbox)
+    catalog.record_many("s2_scene", hashes, [
+        {"mine_id": m, "date": "2022-01-05", "status": "complete"} for m in hashes
+    ])
+
+    done = {("M1", "2022-01-05"), ("M2", "2022-01-05")}
+    assert catalog.done_keys("s2_scene", aoi_config_hashes(CONFIG, bbox)) == done
+    assert catalog.done_keys("s2_scene", aoi_config_hashes(CONFIG, wider)) == set()
+
+    assert catalog.done_keys("s2_scene", aoi_config_hashes(CONFIG, polygon)) == set()
+
+    # only the edited mine is redone
+    edited = bbox.copy()
+    edited.loc[0, "geometry"] = edited.geometry[0].buffer(0.001)
+    assert catalog.done_keys("s2_scene", aoi_config_hashes(CONFIG, edited)) == {
+        ("M2", "2022-01-05")
+    }
+    catalog.close()
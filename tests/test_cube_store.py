@@ -0,0 +1,156 @@
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+
+from src.processing import cube_store
+from src.processing.cube_store import CUBE_BANDS, MineCube, load_baseline, update_cube
+from src.processing.sentinel_preprocess import temporal_normalization
+from src.processing.streaming_baseline import StreamingBaseline
+
+GRID = from_origin(500_000.0, 2_500_000.0, 10.0, 10.0)
+
+
+def write_scene(path, transform, shape, value, crs="EPSG:32644"):
+    data = np.full((len(CUBE_BANDS),) + shape, value, dtype=np.uint16)
+    data[CUBE_BANDS.index("SCL")] = 4
+    profile = {"driver": "GTiff", "width": shape[1], "height": shape[0],
+               "count": len(CUBE_BANDS), "dtype": "uint16", "crs": crs,
+               "transform": transform}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(data)
+        dst.descriptions = tuple(CUBE_BANDS)
+
+
+def test_off_grid_scene_is_reprojected_onto_cube(tmp_path):
+    raw, cubes = tmp_path / "raw", tmp_path / "cubes"
+    write_scene(raw / "M1" / "2022-01-01.tif", GRID, (20, 30), 1000)
+    # shifted by 5 pixels east and 40 columns wide
+    write_scene(raw / "M1" / "2022-02-01.tif", GRID * rasterio.Affine.translation(5, 0),
+                (20, 40), 2000)
+
+    cube = update_cube("M1", raw_dir=raw, cube_dir=cubes)
+
+    assert cube.shape == (2, len(CUBE_BANDS), 20, 30)
+    b4 = cube.band("B4")
+    assert (b4[0] == 1000).all()
+    assert (b4[1, :, 5:] == 2000).all()
+    assert (b4[1, :, :5] == cube.nodata).all()  # outside the shifted scene
+
+
+def test_scene_that_cannot_be_placed_fails_loudly(tmp_path):
+    raw, cubes = tmp_path / "raw", tmp_path / "cubes"
+    MineCube.create(cubes / "M1", 20, 30)  # no grid stored
+    write_scene(raw / "M1" / "2022-02-01.tif", GRID, (20, 40), 2000)
+
+    with pytest.raises(ValueError, match="no grid"):
+        update_cube("M1", raw_dir=raw, cube_dir=cubes)
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_temporal_normalization_keeps_float_dtype(dtype):
+    rng = np.random.default_rng(0)
+    stack = rng.random((7, 12, 9)).astype(dtype)
+    stack[rng.random(stack.shape) < 0.2] = np.nan
+
+    out = temporal_normalization(stack, block_rows=5)
+
+    assert out.dtype == dtype
+    np.testing.assert_array_equal(out, stack - np.nanmedian(stack, axis=0))
+
+
+def test_temporal_normalization_of_int16_cube_is_exact_in_float32():
+    rng = np.random.default_rng(1)
+    stack = rng.integers(-2000, 9000, (8, 12, 9)).astype(np.int16)
+
+    out = temporal_normalization(stack, block_rows=5)
+
+    assert out.dtype == np.float32
+    np.testing.assert_array_equal(out, stack - np.nanmedian(stack, axis=0))
+
+
+def write_ndvi_scene(path, red, nir, scl):
+    data = np.zeros((len(CUBE_BANDS),) + red.shape, dtype=np.uint16)
+    data[CUBE_BANDS.index("B4")] = red
+    data[CUBE_BANDS.index("B8")] = nir
+    data[CUBE_BANDS.index("SCL")] = scl
+    profile = {"driver": "GTiff", "width": red.shape[1], "height": red.shape[0],
+               "count": len(CUBE_BANDS), "dtype": "uint16", "crs": "EPSG:32644",
+               "transform": GRID}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(data)
+        dst.descriptions = tuple(CUBE_BANDS)
+
+
+def random_scenes(raw, n, shape=(12, 15), seed=0):
+    """
+    Scenes whose cloudy pixels (SCL 8) are bright and flat, so they
+    would drag the NDVI median towards 0 if they were not masked.
+    Returns the expected masked NDVI stack.
+    """
+    rng = np.random.default_rng(seed)
+    stack = []
+    for t in range(n):
+        red = rng.integers(300, 600, shape)
+        nir = rng.integers(2500, 3500, shape)
+        scl = np.where(rng.random(shape) < 0.4, 8, 4)
+        red[scl == 8], nir[scl == 8] = 4000, 4100
+        write_ndvi_scene(raw / "M1" / f"2022-{t + 1:02d}-01.tif", red, nir, scl)
+        ndvi = ((nir - red) / (nir + red)).astype(np.float32)
+        stack.append(np.where(scl == 8, np.nan, ndvi))
+    return np.stack(stack)
+
+
+def test_baseline_ignores_masked_pixels(tmp_path):
+    raw, cubes = tmp_path / "raw", tmp_path / "cubes"
+    stack = random_scenes(raw, 6)
+
+    update_cube("M1", raw_dir=raw, cube_dir=cubes)
+    baseline = load_baseline(MineCube.open(cubes / "M1"))
+
+    np.testing.assert_array_equal(baseline.n.reshape(stack.shape[1:]),
+                                  (~np.isnan(stack)).sum(axis=0))
+    diff = np.abs(baseline.median() - np.nanmedian(stack, axis=0))
+    assert np.nanmax(diff) <= baseline.error_bound + 1e-6
+
+
+def test_baseline_catches_up_after_an_interrupted_update(tmp_path, monkeypatch):
+    raw, cubes = tmp_path / "raw", tmp_path / "cubes"
+    stack = random_scenes(raw, 6)
+    scenes = sorted((raw / "M1").glob("*.tif"))
+    for path in scenes[2:]:
+        path.rename(path.with_suffix(".hold"))
+    update_cube("M1", raw_dir=raw, cube_dir=cubes)
+
+    # a scene that fails half-way: the baseline is saved for the rest
+    for path in scenes[2:4]:
+        path.with_suffix(".hold").rename(path)
+    real = cube_store.scene_ndvi
+    calls = iter([False, True])
+
+    def failing(*args, **kwargs):
+        if next(calls):
+            raise MemoryError
+        return real(*args, **kwargs)
+
+    monkeypatch.setattr(cube_store, "scene_ndvi", failing)
+    with pytest.raises(MemoryError):
+        update_cube("M1", raw_dir=raw, cube_dir=cubes)
+    monkeypatch.undo()
+
+    # the 4th scene is in the cube but not in the saved baseline
+    cube = MineCube.open(cubes / "M1")
+    saved = StreamingBaseline.load(cubes / "M1" / cube_store.BASELINE_FILE)
+    assert (cube.shape[0], saved.n_scenes) == (4, 3)
+
+    # the next run rebuilds it before adding new scenes
+    for path in scenes[4:]:
+        path.with_suffix(".hold").rename(path)
+    update_cube("M1", raw_dir=raw, cube_dir=cubes)
+
+    saved = StreamingBaseline.load(cubes / "M1" / cube_store.BASELINE_FILE)
+    assert saved.n_scenes == 6
+    np.testing.assert_array_equal(saved.n.reshape(stack.shape[1:]),
+                                  (~np.isnan(stack)).sum(axis=0))
@@ -0,0 +1,187 @@
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.ingestion.download_engine import (
+    CHECKSUM_SUFFIX, PART_SUFFIX, DownloadEngine, DownloadError, read_checksum
+)
+
+PAYLOAD = bytes(range(256)) * 1024  # 256 KiB
+SHA256 = hashlib.sha256(PAYLOAD).hexdigest()
+
+
+# -------------------------------
+# Local HTTP stand-in
+# -------------------------------
+
+class SceneServer(ThreadingHTTPServer):
+    """
+    Serves PAYLOAD with Range support. `plan` lists how to answer the
+    next requests ("ok", "drop" = cut the body halfway, or an HTTP
+    status code); once it is used up every request is answered "ok".
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SceneHandler)
+        self.plan = []
+        self.ranges = []
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/scene.tif"
+
+
+class SceneHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.ranges.append(self.headers.get("Range"))
+        action = server.plan.pop(0) if server.plan else "ok"
+
+        if isinstance(action, int):
+            self.send_response(action)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start = 0
+        if self.headers.get("Range"):
+            start = int(self.headers["Range"].split("=")[1].rstrip("-"))
+            if start >= len(PAYLOAD):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(PAYLOAD)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range",
+                             f"bytes {start}-{len(PAYLOAD) - 1}/{len(PAYLOAD)}")
+        else:
+            self.send_response(200)
+
+        body = PAYLOAD[start:]
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if action == "drop":
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            self.connection.shutdown(2)
+        else:
+            self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    server = SceneServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def engine():
+    with DownloadEngine(max_workers=2, max_retries=3, timeout=5, backoff=0) as engine:
+        yield engine
+
+
+# -------------------------------
+# Tests
+# -------------------------------
+
+def test_download_writes_file_and_checksum(server, engine, tmp_path):
+    out = tmp_path / "scene.tif"
+    result = engine.fetch(server.url, out, expected_sha256=SHA256)
+
+    assert result["status"] == "downloaded"
+    assert out.read_bytes() == PAYLOAD
+    assert read_checksum(out) == SHA256
+    assert not (tmp_path / ("scene.tif" + PART_SUFFIX)).exists()
+
+    again = engine.fetch(server.url, out)
+    assert again["status"] == "skipped"
+    assert len(server.ranges) == 1
+
+
+def test_resume_from_part_file_uses_range(server, engine, tmp_path):
+    out = tmp_path / "scene.tif"
+    part = tmp_path / ("scene.tif" + PART_SUFFIX)
+    part.write_bytes(PAYLOAD[:1000])
+
+    result = engine.fetch(server.url, out, expected_sha256=SHA256)
+
+    assert server.ranges == ["bytes=1000-"]
+    assert result["bytes"] == len(PAYLOAD) - 1000
+    assert out.read_bytes() == PAYLOAD
+
+
+def test_dropped_connection_resumes_on_retry(server, engine, tmp_path):
+    server.plan = ["drop"]
+    out = tmp_path / "scene.tif"
+
+    result = engine.fetch(server.url, out, expected_sha256=SHA256)
+
+    assert result["attempts"] == 2
+    assert server.ranges[0] is None
+    assert server.ranges[1].startswith("bytes=") and server.ranges[1] != "bytes=0-"
+    assert out.read_bytes() == PAYLOAD
+
+
+def test_416_means_part_file_is_complete(server, engine, tmp_path):
+    out = tmp_path / "scene.tif"
+    (tmp_path / ("scene.tif" + PART_SUFFIX)).write_bytes(PAYLOAD)
+
+    result = engine.fetch(server.url, out, expected_sha256=SHA256)
+
+    assert server.ranges == [f"bytes={len(PAYLOAD)}-"]
+    assert result["bytes"] == 0
+    assert out.read_bytes() == PAYLOAD
+
+
+def test_checksum_mismatch_never_renames(server, engine, tmp_path):
+    out = tmp_path / "scene.tif"
+
+    with pytest.raises(DownloadError, match="checksum mismatch"):
+        engine.fetch(server.url, out, expected_sha256="0" * 64)
+
+    assert len(server.ranges) == engine.max_retries
+    assert not out.exists()
+    assert not (tmp_path / ("scene.tif" + CHECKSUM_SUFFIX)).exists()
+    assert not (tmp_path / ("scene.tif" + PART_SUFFIX)).exists()
+
+
+def test_permanent_4xx_is_not_retried(server, engine, tmp_path):
+    server.plan = [404]
+
+    with pytest.raises(DownloadError):
+        engine.fetch(server.url, tmp_path / "scene.tif")
+
+    assert len(server.ranges) == 1
+
+
+@pytest.mark.parametrize("status", [408, 429, 503])
+def test_transient_errors_are_retried(server, engine, tmp_path, status):
+    server.plan = [status]
+    out = tmp_path / "scene.tif"
+
+    result = engine.fetch(server.url, out, expected_sha256=SHA256)
+
+    assert result["attempts"] == 2
+    assert out.read_bytes() == PAYLOAD
+
+
+def test_run_reports_failures_without_aborting(server, engine, tmp_path):
+    server.plan = [404]
+    jobs = [(server.url, tmp_path / "a.tif"), (server.url, tmp_path / "b.tif")]
+
+    results = {r["path"].name: r["status"] for r in engine.run(jobs)}
+
+    assert sorted(results.values()) == ["downloaded", "failed"]
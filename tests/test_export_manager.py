@@ -0,0 +1,102 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from src.ingestion.export_manager import DONE_STATE, ExportManager, LocalBackend
+
+
+@pytest.fixture
+def backend():
+    backend = LocalBackend()
+    yield backend
+    backend.close()
+
+
+def manager(backend, **kwargs):
+    kwargs = {"max_running": 2, "poll_interval": 0.01, "backoff_base": 0, **kwargs}
+    return ExportManager(backend, **kwargs)
+
+
+def flaky(failures):
+    """
+    Spec that raises `failures` times, then succeeds.
+    """
+    calls = []
+
+    def spec():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise RuntimeError(f"attempt {len(calls)} failed")
+    return spec
+
+
+def test_running_tasks_stay_within_max_running(backend):
+    m = manager(backend, max_running=3)
+    for i in range(10):
+        m.submit(f"scene_{i}", lambda: time.sleep(0.03), mine_id=f"M{i % 2}")
+
+    report = m.run()
+
+    assert (report["state"] == DONE_STATE).all()
+    assert backend.max_running_seen <= 3
+    assert list(report.columns) == ["mine_id", "name", "state", "task_id",
+                                    "attempts", "seconds", "error"]
+    assert report["seconds"].notna().all()
+
+
+def test_failed_tasks_are_retried_then_given_up(backend):
+    m = manager(backend, max_retries=2)
+    m.submit("recovers", flaky(2))
+    m.submit("broken", flaky(10))
+
+    report = m.run().set_index("name")
+
+    assert report.loc["recovers", "state"] == DONE_STATE
+    assert report.loc["recovers", "attempts"] == 3
+    assert pd.isna(report.loc["recovers", "error"])
+    assert report.loc["broken", "state"] == "FAILED"
+    assert report.loc["broken", "attempts"] == 3
+    assert report.loc["broken", "error"] == "attempt 3 failed"
+
+
+class ForgetfulBackend(LocalBackend):
+    """
+    Task list that never shows the first task started.
+    """
+
+    def list_statuses(self):
+        statuses = super().list_statuses()
+        statuses.pop("LOCAL_000001", None)
+        return statuses
+
+
+def test_task_missing_from_task_list_is_retried():
+    backend = ForgetfulBackend()
+    try:
+        m = manager(backend, max_unlisted_polls=3)
+        m.submit("lost", lambda: None)
+        report = m.run()
+    finally:
+        backend.close()
+
+    assert report.loc[0, "state"] == DONE_STATE
+    assert report.loc[0, "attempts"] == 2
+    assert report.loc[0, "task_id"] == "LOCAL_000002"
+
+
+def test_task_running_past_timeout_is_cancelled(backend):
+    release = threading.Event()
+    m = manager(backend, max_retries=1, task_timeout=0.05)
+    m.submit("stuck", lambda: release.wait(5))
+
+    try:
+        report = m.run()
+    finally:
+        release.set()
+
+    assert report.loc[0, "state"] == "FAILED"
+    assert report.loc[0, "attempts"] == 2
+    assert report.loc[0, "error"].startswith("timed out")
+    assert {t["state"] for t in backend.tasks.values()} == {"CANCELLED"}
@@ -0,0 +1,83 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.processing.grouped_reduce import group_keys, grouped_reduce
+from src.processing.sentinel_preprocess import compute_seasonal_baseline
+
+NODATA = -32768
+
+
+def int16_stack(n, shape=(10, 7), seed=0):
+    """
+    NDVI-like int16 stack with scattered NODATA and one pixel that
+    has no data at all.
+    """
+    rng = np.random.default_rng(seed)
+    stack = rng.integers(-2000, 9000, (n,) + shape).astype(np.int16)
+    stack[rng.random(stack.shape) < 0.25] = NODATA
+    stack[:, 0, 0] = NODATA
+    return stack
+
+
+def reference(stack, keys, reduce):
+    """
+    Plain per-group loop over a float copy with NaN for NODATA.
+    """
+    values = np.where(stack == NODATA, np.nan, stack.astype(np.float64))
+    groups = np.unique(keys)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return groups, np.stack([reduce(values[keys == g]) for g in groups])
+
+
+@pytest.mark.parametrize("by", ["month", "season", "isoweek"])
+@pytest.mark.parametrize("block_rows", [None, 3])
+def test_grouped_reduce_matches_per_group_loop(by, block_rows):
+    # two years, so equal keys are not adjacent in time
+    dates = pd.date_range("2022-01-03", "2023-12-31", freq="9D")
+    stack = int16_stack(len(dates))
+    keys = group_keys(dates, by)
+
+    groups, out = grouped_reduce(stack, keys, stats=["median", "percentile", "count"],
+                                 q=90, nodata=NODATA, block_rows=block_rows)
+
+    expected_groups, median = reference(stack, keys, lambda v: np.nanmedian(v, axis=0))
+    _, p90 = reference(stack, keys, lambda v: np.nanquantile(v, 0.9, axis=0))
+    _, count = reference(stack, keys, lambda v: (~np.isnan(v)).sum(axis=0))
+
+    np.testing.assert_array_equal(groups, expected_groups)
+    assert out["median"].dtype == np.float32
+    # float32 against a float64 loop
+    np.testing.assert_allclose(out["median"], median, rtol=1e-6, atol=1e-3)
+    np.testing.assert_allclose(out["percentile"], p90, rtol=1e-6, atol=1e-3)
+    np.testing.assert_array_equal(out["count"], count)
+    assert np.isnan(out["median"][:, 0, 0]).all()  # NODATA everywhere
+
+
+def test_group_keys():
+    dates = ["2022-01-03", "2022-05-01", "2022-10-31", "2022-11-01", "2023-01-01"]
+    assert list(group_keys(dates, "month")) == [1, 5, 10, 11, 1]
+    assert list(group_keys(dates, "season")) == ["dry", "wet", "wet", "dry", "dry"]
+    assert list(group_keys(dates, "isoweek")) == [1, 17, 44, 44, 52]
+    with pytest.raises(ValueError):
+        group_keys(dates, [1, 2])
+    with pytest.raises(ValueError):
+        group_keys(dates, "fortnight")
+
+
+def test_seasonal_baseline_of_sorted_float_stack():
+    # one year in date order: groups are contiguous, no reordering
+    dates = pd.date_range("2022-01-01", "2022-12-31", freq="6D")
+    scaled = int16_stack(len(dates), seed=1)
+    stack = np.where(scaled == NODATA, np.nan, scaled / 10_000).astype(np.float32)
+
+    baseline = compute_seasonal_baseline(dates, stack, block_rows=4, by="season")
+
+    wet = dates.month.isin(range(5, 11))
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        np.testing.assert_allclose(baseline["wet"], np.nanmedian(stack[wet], axis=0), rtol=1e-6)
+        np.testing.assert_allclose(baseline["dry"], np.nanmedian(stack[~wet], axis=0), rtol=1e-6)
@@ -0,0 +1,55 @@
+from datetime import date, timedelta
+
+import pandas as pd
+
+from src.reporting import history_store as history
+
+
+def ranked(risks, impact=1.0):
+    return pd.DataFrame({
+        "mine_id": list(risks),
+        "area_ha": [10.0] * len(risks),
+        "severity": [-0.3] * len(risks),
+        "risk": list(risks.values()),
+        "impact": [impact] * len(risks),
+    })
+
+
+def days_ago(n):
+    return (date.today() - timedelta(days=n)).isoformat()
+
+
+def test_runs_started_together_keep_their_own_files(tmp_path):
+    ids = {history.append_run(ranked({"M1": "HIGH", "M2": "LOW"}), "cfg", ("a", "b"),
+                              root=tmp_path)
+           for _ in range(3)}
+
+    assert len(ids) == 3
+    assert len(history.read_history(root=tmp_path)) == 6
+
+
+def test_latest_per_mine_and_risk_changes_use_the_default_window(tmp_path):
+    def run(n_days, risks, impact):
+        history.append_run(ranked(risks, impact), "cfg", ("a", "b"),
+                           run_id=f"{days_ago(n_days).replace('-', '')}T000000Z-x",
+                           run_date=days_ago(n_days), root=tmp_path)
+
+    run(400, {"OLD": "HIGH", "M1": "LOW"}, 1.0)
+    run(20, {"M1": "LOW", "M2": "HIGH"}, 2.0)
+    run(5, {"M1": "HIGH"}, 3.0)
+
+    latest = history.latest_per_mine(root=tmp_path).set_index("mine_id")
+    assert sorted(latest.index) == ["M1", "M2"]  # OLD is outside the window
+    assert latest.loc["M1", "impact"] == 3.0
+
+    everything = history.latest_per_mine(lookback_days=None, root=tmp_path)
+    assert sorted(everything["mine_id"]) == ["M1", "M2", "OLD"]
+
+    subset = history.latest_per_mine(["M2"], root=tmp_path)
+    assert list(subset["mine_id"]) == ["M2"]
+
+    changes = history.risk_changes(root=tmp_path)
+    assert list(changes["mine_id"]) == ["M1"]
+    assert changes.loc[0, "previous_risk"] == "LOW" and changes.loc[0, "risk"] == "HIGH"
+
+    assert history.risk_changes(since=days_ago(10), root=tmp_path).empty
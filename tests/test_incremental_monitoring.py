@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+
+from src.processing import incremental_monitoring as incremental
+from src.processing.cube_store import CUBE_BANDS, update_cube
+from src.processing.incremental_monitoring import MineState, StateStore, run_incremental
+
+GRID = from_origin(500_000.0, 2_500_000.0, 10.0, 10.0)
+SHAPE = (12, 15)
+DATES = ["2022-01-05", "2022-02-05", "2022-03-05", "2022-04-05", "2022-05-05"]
+
+
+def write_scene(raw, date, seed):
+    """
+    One scene; part of the mine loses vegetation from March on and
+    some pixels are cloudy (SCL 8).
+    """
+    rng = np.random.default_rng(seed)
+    data = np.zeros((len(CUBE_BANDS),) + SHAPE, dtype=np.uint16)
+    data[CUBE_BANDS.index("B4")] = rng.integers(300, 600, SHAPE)
+    nir = rng.integers(2500, 3500, SHAPE)
+    if date >= "2022-03-01":
+        nir[:6] = rng.integers(600, 900, (6, SHAPE[1]))
+    data[CUBE_BANDS.index("B8")] = nir
+    data[CUBE_BANDS.index("SCL")] = np.where(rng.random(SHAPE) < 0.2, 8, 4)
+
+    path = raw / "M1" / f"{date}.tif"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    profile = {"driver": "GTiff", "width": SHAPE[1], "height": SHAPE[0],
+               "count": len(CUBE_BANDS), "dtype": "uint16", "crs": "EPSG:32644",
+               "transform": GRID}
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(data)
+        dst.descriptions = tuple(CUBE_BANDS)
+
+
+@pytest.fixture
+def monitor(tmp_path, monkeypatch):
+    """
+    add(n) downloads the next n scenes into the cube; run() is one
+    incremental run, returning its row and the dates it scored.
+    """
+    raw, cubes = tmp_path / "raw", tmp_path / "cubes"
+    store = StateStore(tmp_path / "state")
+    scored = []
+    update = MineState.update
+
+    def recording_update(self, dndvi, acquisition_date):
+        scored.append(acquisition_date.isoformat())
+        update(self, dndvi, acquisition_date)
+
+    monkeypatch.setattr(MineState, "update", recording_update)
+    written = []
+
+    def add(n):
+        for date in DATES[len(written):len(written) + n]:
+            write_scene(raw, date, len(written))
+            written.append(date)
+        update_cube("M1", raw_dir=raw, cube_dir=cubes)
+
+    def run(**kwargs):
+        scored.clear()
+        row = run_incremental(["M1"], store, cube_dir=cubes, **kwargs).iloc[0]
+        return row, list(scored)
+
+    return add, run, store
+
+
+def test_second_run_scores_only_new_dates(monitor):
+    add, run, store = monitor
+    add(3)
+    row, scored = run()
+    assert scored == DATES[:3] and row["new_scenes"] == 3
+
+    # persisted: reloaded state and the index pick up where it stopped
+    state = store.load("M1")
+    assert state.n_scenes == 3 and state.last_date.isoformat() == DATES[2]
+    assert store.index() == {"M1": DATES[2]}
+    assert store.since(["M1"]) == "2022-03-06"
+    assert store.since(["M1", "M2"]) == incremental.DEFAULT_START
+
+    # nothing new: nothing scored, state file untouched
+    mtime = store.path("M1").stat().st_mtime_ns
+    row, scored = run()
+    assert scored == [] and row["new_scenes"] == 0 and row["n_scenes"] == 3
+    assert store.path("M1").stat().st_mtime_ns == mtime
+
+    add(1)
+    row, scored = run()
+    assert scored == [DATES[3]]
+    assert row["n_scenes"] == 4 and row["last_date"] == DATES[3]
+
+
+def test_resumed_run_matches_one_run_over_the_same_scenes(monitor):
+    add, run, store = monitor
+    add(2)
+    run()
+    add(3)
+    row, scored = run()
+    assert scored == DATES[2:]
+
+    resumed = store.load("M1")
+    full, _ = run(rebuild=True)
+    rebuilt = store.load("M1")
+
+    # which pixels were observed does not depend on the baseline
+    assert full["n_scenes"] == row["n_scenes"] == len(DATES)
+    np.testing.assert_array_equal(resumed.obs_count, rebuilt.obs_count)
+    assert (resumed.obs_count < len(DATES)).any()  # cloudy pixels skipped
+
+
+def test_threshold_change_rescores_everything(monitor):
+    add, run, _ = monitor
+    add(3)
+    run()
+    _, scored = run(threshold=-0.3)
+    assert scored == DATES[:3]
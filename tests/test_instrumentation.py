@@ -0,0 +1,63 @@
+import json
+
+import numpy as np
+import pytest
+
+from src import instrumentation
+from src.processing.parallel import fan_out
+
+MB = 2**20
+
+
+@pytest.fixture
+def recorder(tmp_path):
+    rec = instrumentation.enable(tmp_path)
+    yield rec
+    instrumentation.disable()
+
+
+def events(recorder, op):
+    recorder.flush()
+    lines = (recorder.out_dir / instrumentation.METRICS_FILE).read_text().splitlines()
+    return [e for e in map(json.loads, lines) if e["op"] == op]
+
+
+def test_scope_memory_is_per_scope(recorder):
+    with instrumentation.scope(phase="big"):
+        kept = np.ones(64 * MB // 8)
+    with instrumentation.scope(phase="small"):
+        np.ones(1000).sum()
+
+    memory = {e["phase"]: e for e in events(recorder, "memory")}
+    assert memory["big"]["rss_delta"] > 48 * MB
+    # a high-water mark read at the end would report `big` again here
+    assert abs(memory["small"]["rss_delta"]) < 8 * MB
+    assert memory["small"]["peak_growth"] < 8 * MB
+    assert "mining_scope_rss_delta_bytes{phase=\"big\"}" in recorder.prometheus()
+    del kept
+
+
+@instrumentation.timed("test.square")
+def square(x):
+    return x * x
+
+
+def test_worker_metrics_reach_the_parent(recorder):
+    with instrumentation.scope(phase="area_severity"):
+        results = dict(fan_out(square, {"A": (2,), "B": (3,)}, workers=2))
+
+    assert results == {"A": 4, "B": 9}
+    timed = events(recorder, "test.square")
+    assert sorted(e["mine_id"] for e in timed) == ["A", "B"]
+    assert all(e["phase"] == "area_severity" for e in timed)
+    assert sorted(e["mine_id"] for e in events(recorder, "mine")) == ["A", "B"]
+    assert len(events(recorder, "memory")) == 3  # two mines and the phase
+
+
+def test_buffered_events_replay_into_totals(recorder):
+    result, collected = instrumentation.collect(square, 4, mine_id="C")
+    assert result == 16 and collected
+
+    instrumentation.replay(collected)
+    key = ("test.square", (("mine_id", "C"),))
+    assert recorder.totals[key]["calls"] == 1
@@ -0,0 +1,43 @@
+import geopandas as gpd
+import shapely
+
+from src.ingestion.load_mines import load_mine_polygons
+
+
+def write_layer(vector_dir):
+    """
+    Three mines: a triangle whose bounds overlap the query box while
+    its shape does not, one inside it and one far away.
+    """
+    vector_dir.mkdir()
+    gdf = gpd.GeoDataFrame(
+        {"name": ["triangle", "inside", "far"], "area": [1.0, 2.0, 3.0]},
+        geometry=[shapely.Polygon([(0, 0), (10, 0), (0, 10)]),
+                  shapely.box(1, 1, 2, 2),
+                  shapely.box(50, 50, 51, 51)],
+        crs="EPSG:4326",
+    )
+    gdf.to_file(vector_dir / "mines.shp")
+    return vector_dir
+
+
+def test_cached_and_uncached_reads_return_the_same_mines(tmp_path):
+    vector_dir = write_layer(tmp_path / "vectors")
+    cache_dir = tmp_path / "cache"
+    box = (7, 7, 9, 9)  # inside the triangle's bounds, outside its shape
+
+    queries = [{}, {"bbox": box}, {"bbox": (0.5, 0.5, 9, 9)},
+               {"mine_ids": ["MINE_0002"], "columns": ["area"]}]
+    load_mine_polygons(vector_dir, cache_dir=cache_dir)  # builds the cache
+
+    for query in queries:
+        uncached = load_mine_polygons(vector_dir, cache_dir=None, **query)
+        cached = load_mine_polygons(vector_dir, cache_dir=cache_dir, **query)
+
+        assert list(cached.columns) == list(uncached.columns)
+        assert list(cached.index) == list(uncached.index)
+        assert list(cached["mine_id"]) == list(uncached["mine_id"])
+        assert cached.crs == uncached.crs
+        assert cached.geometry.geom_equals(uncached.geometry).all()
+
+    assert load_mine_polygons(vector_dir, cache_dir=cache_dir, bbox=box).empty
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+
+from src.ingestion.cog import read_preview
+from src.processing.change_detection_local import mine_change_metrics
+from src.reporting.map_previews import write_preview
+
+SHAPE = (40, 50)
+DATES = [f"2022-{month:02d}-15" for month in range(1, 9)]
+
+
+@pytest.fixture
+def scenes(tmp_path):
+    """
+    B4 / B8 / SCL scenes of one mine whose left half loses
+    vegetation from the sixth date on.
+    """
+    rng = np.random.default_rng(0)
+    profile = {"driver": "GTiff", "width": SHAPE[1], "height": SHAPE[0], "count": 3,
+               "dtype": "uint16", "crs": "EPSG:4326",
+               "transform": from_origin(85.0, 23.0, 1e-4, 1e-4)}
+    paths = []
+    for t, date in enumerate(DATES):
+        red = rng.integers(300, 600, SHAPE)
+        nir = rng.integers(2500, 3500, SHAPE)
+        if t >= 5:
+            nir[:, :25] = rng.integers(600, 900, (SHAPE[0], 25))
+        scl = np.full(SHAPE, 4)
+        scl[:5] = 8  # a cloudy strip, masked in every scene
+        path = tmp_path / f"{date}.tif"
+        with rasterio.open(path, "w", **profile) as dst:
+            dst.write(np.stack([red, nir, scl]).astype(np.uint16))
+            dst.descriptions = ("B4", "B8", "SCL")
+        paths.append(path)
+    return paths
+
+
+@pytest.mark.filterwarnings("ignore::rasterio.errors.NotGeoreferencedWarning")
+def test_compact_map_previews_match_float(scenes, tmp_path):
+    maps = {}
+    for compact in (False, True):
+        maps[compact] = tmp_path / f"change_{'int16' if compact else 'float32'}.tif"
+        mine_change_metrics(scenes, change_map=maps[compact], compact=compact)
+
+    with rasterio.open(maps[True]) as src:
+        assert src.dtypes[0] == "int16" and src.scales[0] == pytest.approx(1e-4)
+
+    # read_preview applies the scale: values are dNDVI, not int16 counts
+    dndvi = {c: read_preview(p, max_size=25, indexes=1)[0] for c, p in maps.items()}
+    assert dndvi[True].dtype == np.float32
+    assert np.array_equal(dndvi[True].mask, dndvi[False].mask)
+    assert np.abs(dndvi[True] - dndvi[False]).max() < 1e-3
+    assert dndvi[True].min() < -0.15
+
+    # the change count band has scale 1 and stays as stored
+    counts, _ = read_preview(maps[True], max_size=25, indexes=[1, 2])
+    assert counts[1].max() == len(DATES) - 5
+
+    stats = {c: write_preview(p, tmp_path / "previews") for c, p in maps.items()}
+    assert stats[True]["mean_dndvi"] == pytest.approx(stats[False]["mean_dndvi"], abs=1e-3)
+    assert stats[True]["valid_pct"] == stats[False]["valid_pct"]
+
+    with rasterio.open(stats[True]["preview"]) as a, rasterio.open(stats[False]["preview"]) as b:
+        assert np.abs(a.read().astype(int) - b.read().astype(int)).max() <= 2
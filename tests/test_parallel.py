@@ -0,0 +1,59 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from src.processing import parallel
+from src.processing import sentinel_preprocess as prep
+
+
+def mine_stacks(dtype):
+    rng = np.random.default_rng(0)
+    stacks = {}
+    for i, (t, h, w) in enumerate([(12, 20, 30), (8, 9, 7), (15, 40, 25)]):
+        stack = rng.integers(-2000, 9000, (t, h, w))
+        stacks[f"M{i}"] = stack.astype(dtype)
+    return stacks
+
+
+def mine_dates(stacks):
+    return {key: [date(2022, 1, 1) + timedelta(days=20 * i) for i in range(len(stack))]
+            for key, stack in stacks.items()}
+
+
+@pytest.mark.parametrize("dtype", [np.int16, np.float64])
+def test_normalize_mines_matches_serial(dtype):
+    stacks = mine_stacks(dtype)
+
+    pooled = prep.normalize_mines(stacks, block_rows=8, workers=2)
+
+    assert sorted(pooled) == sorted(stacks)
+    for key, stack in stacks.items():
+        expected = prep.temporal_normalization(stack)
+        assert pooled[key].dtype == expected.dtype
+        np.testing.assert_array_equal(pooled[key], expected)
+
+
+def test_seasonal_baselines_and_valid_masks_match_serial():
+    stacks = {k: v.astype(np.float32) for k, v in mine_stacks(np.int16).items()}
+    dates = mine_dates(stacks)
+
+    baselines = prep.seasonal_baselines(dates, stacks, workers=2, by="season")
+    masks = prep.valid_masks({k: v > 0 for k, v in stacks.items()}, workers=2, min_count=3)
+
+    for key, stack in stacks.items():
+        expected = prep.compute_seasonal_baseline(dates[key], stack, by="season")
+        assert baselines[key].keys() == expected.keys()
+        for group in expected:
+            np.testing.assert_array_equal(baselines[key][group], expected[group])
+        np.testing.assert_array_equal(masks[key], prep.build_valid_mask(stack > 0, min_count=3))
+
+
+def worker_gdal_threads():
+    return parallel.gdal_threads()
+
+
+def test_pool_workers_share_the_cpus_for_gdal():
+    results = dict(parallel.fan_out(worker_gdal_threads, {"A": (), "B": ()}, workers=2))
+    assert set(results.values()) == {max(1, parallel.WORKERS // 2)}
+    assert parallel.gdal_threads() == parallel.WORKERS  # parent unchanged
@@ -0,0 +1,92 @@
+import os
+
+import pytest
+
+from src.pipeline import ArtifactStore, Phase, run_dag
+
+
+@pytest.fixture
+def dag(tmp_path):
+    """
+    source -> double -> total, where `source` reads a file and
+    `double` also fingerprints a directory of scenes.
+    """
+    calls = []
+    data = tmp_path / "value.txt"
+    data.write_text("1")
+    scenes = tmp_path / "scenes"
+    scenes.mkdir()
+
+    def source(config):
+        calls.append("source")
+        return int(data.read_text())
+
+    def double(config, source):
+        calls.append("double")
+        return 2 * source + len(list(scenes.iterdir()))
+
+    def total(config, double):
+        calls.append("total")
+        return double + config["offset"]
+
+    phases = [
+        Phase("source", source),
+        Phase("double", double, inputs=["source"],
+              sources=lambda config, source: scenes.iterdir()),
+        Phase("total", total, inputs=["double"], config=["offset"]),
+    ]
+    store = ArtifactStore(tmp_path / "artifacts")
+
+    def run(force=(), offset=0):
+        calls.clear()
+        report = run_dag(phases, {"offset": offset}, store=store, force=force)
+        return report, list(calls)
+
+    return run, data, scenes, store
+
+
+def test_second_run_is_fully_cached(dag):
+    run, *_ = dag
+    assert run()[1] == ["source", "double", "total"]
+    report, calls = run()
+    assert calls == [] and {r["status"] for r in report.values()} == {"cached"}
+
+
+def test_forced_phase_with_new_output_reruns_downstream(dag):
+    run, data, _, store = dag
+    run()
+    data.write_text("5")
+
+    report, calls = run(force={"source"})
+
+    assert calls == ["source", "double", "total"]
+    assert store.load("total", report["total"]["key"]) == 10
+    assert run()[1] == []
+
+
+def test_forced_phase_with_same_output_keeps_downstream(dag):
+    run, *_ = dag
+    run()
+    report, calls = run(force={"source"})
+    assert calls == ["source"]
+    assert report["double"]["status"] == report["total"]["status"] == "cached"
+
+
+def test_new_source_files_rerun_phase(dag):
+    run, _, scenes, _ = dag
+    run()
+    (scenes / "2022-01-01.tif").write_bytes(b"x")
+
+    assert run()[1] == ["double", "total"]
+
+    # an edited scene (size / mtime) counts as new data too
+    (scenes / "2022-01-01.tif").write_bytes(b"xy")
+    os.utime(scenes / "2022-01-01.tif", ns=(1, 1))
+    assert run()[1] == ["double"]  # same count, so the same value
+
+
+def test_config_change_reruns_only_that_phase(dag):
+    run, *_ = dag
+    run()
+    assert run(offset=3)[1] == ["total"]
+
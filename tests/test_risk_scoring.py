@@ -0,0 +1,94 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.processing.risk_scoring import (
+    RISK_CLASSES, IndexableSkiplist, RiskRanking, classify_risk, impact_score, rank_key
+)
+
+
+def check(skiplist, expected, rng):
+    assert len(skiplist) == len(expected)
+    assert list(skiplist) == expected
+    for pos, key in enumerate(expected):
+        assert skiplist.rank(key) == pos
+        assert skiplist.slice(pos, pos + 1) == [key]  # n-th key
+    for _ in range(20):
+        start, stop = sorted(rng.randrange(len(expected) + 3) for _ in range(2))
+        assert skiplist.slice(start, stop) == expected[start:stop]
+
+
+@pytest.mark.parametrize("bulk", [False, True])
+def test_skiplist_matches_sorted_list(bulk):
+    rng = random.Random(0)
+    # few distinct scores, so many keys tie on the score and sort by id
+    keys = [(rng.randrange(10), f"M{i:03d}") for i in range(300)]
+    expected = sorted(keys[:150])
+    skiplist = IndexableSkiplist.from_sorted(expected) if bulk else IndexableSkiplist()
+    if not bulk:
+        for key in keys[:150]:
+            skiplist.insert(key)
+    check(skiplist, expected, rng)
+
+    for step, key in enumerate(keys[150:]):
+        skiplist.insert(key)
+        expected = sorted(expected + [key])
+        victim = [expected[0], expected[-1], rng.choice(expected)][step % 3]  # head, tail, any
+        skiplist.remove(victim)
+        expected.remove(victim)
+        if step % 10 == 0:
+            check(skiplist, expected, rng)
+    check(skiplist, expected, rng)
+
+    while expected:
+        victim = expected.pop(0 if len(expected) % 2 else -1)
+        skiplist.remove(victim)
+    assert len(skiplist) == 0 and list(skiplist) == [] and skiplist.slice(0, 5) == []
+
+    with pytest.raises(KeyError):
+        skiplist.remove((0, "M000"))
+    with pytest.raises(KeyError):
+        skiplist.rank((0, "M000"))
+
+
+def test_ranking_follows_updates_and_removals():
+    rng = random.Random(1)
+    areas = [0.0, 10.0, 30.0, 150.0]
+    severities = [None, -0.01, -0.1, -0.2, np.nan]
+
+    def scores():
+        return rng.choice(areas), rng.choice(severities)
+
+    metrics = pd.DataFrame(
+        [{"mine_id": f"M{i:03d}", "area_ha": a, "severity": s}
+         for i, (a, s) in enumerate(scores() for _ in range(60))]
+    )
+    ranking = RiskRanking(metrics)
+    rows = {r["mine_id"]: (r["area_ha"], r["severity"]) for r in metrics.to_dict("records")}
+
+    for step in range(200):
+        order = sorted(rows, key=lambda m: rank_key(m, impact_score(*rows[m])))
+        if step % 4 == 3:
+            mine_id = order[0] if step % 8 == 3 else order[-1]  # head or tail
+            ranking.remove(mine_id)
+            del rows[mine_id]
+        else:
+            mine_id = f"M{rng.randrange(80):03d}"
+            rows[mine_id] = scores()
+            ranking.update(mine_id, *rows[mine_id])
+
+    order = sorted(rows, key=lambda m: rank_key(m, impact_score(*rows[m])))
+    risk = {m: classify_risk(a, 0.0 if s is None or s != s else s) for m, (a, s) in rows.items()}
+
+    assert len(ranking) == len(rows)
+    assert list(ranking.table()["mine_id"]) == order
+    assert all(ranking.rank_of(m) == i + 1 for i, m in enumerate(order))
+    assert list(ranking.top(7)["mine_id"]) == order[:7]
+    for r in RISK_CLASSES:
+        in_class = [m for m in order if risk[m] == r]
+        top = ranking.top(5, risk=r)
+        assert list(top["mine_id"]) == in_class[:5]
+        assert list(top["rank"]) == [order.index(m) + 1 for m in in_class[:5]]
+        assert ranking.counts()[r] == len(in_class)
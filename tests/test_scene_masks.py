@@ -0,0 +1,203 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+import rasterio
+import shapely
+from rasterio.transform import from_origin
+from rasterio.windows import Window
+
+import fake_ee
+from src.catalog import ArtifactCatalog
+from src.ingestion import download_sentinel2_gee as download
+from src.processing import change_detection_local as local
+from src.processing.masks import (
+    PackedMask, load_scene_mask, pack_mask, save_scene_mask, scene_mask_path
+)
+
+GRID = from_origin(85.0, 23.0, 1e-4, 1e-4)
+SHAPE = (40, 60)
+
+
+def test_packed_mask_window_unpacks_only_those_rows():
+    rng = np.random.default_rng(0)
+    mask = rng.random((37, 29)) < 0.5
+    packed = PackedMask(pack_mask(mask), mask.shape)
+
+    for col, row, width, height in [(0, 0, 29, 37), (3, 5, 10, 7), (28, 36, 1, 1)]:
+        np.testing.assert_array_equal(packed.window(Window(col, row, width, height)),
+                                      mask[row:row + height, col:col + width])
+
+
+def test_stale_masks_are_ignored(tmp_path):
+    image = tmp_path / "2022-01-01.tif"
+    mask = np.ones((4, 5), bool)
+
+    save_scene_mask(image, mask, valid_classes=[4, 5, 6, 7, 11])
+    assert load_scene_mask(image) is None  # built from other SCL classes
+
+    save_scene_mask(image, mask)
+    assert load_scene_mask(image, shape=(5, 4)) is None
+    np.testing.assert_array_equal(load_scene_mask(image, shape=(4, 5)).array(), mask)
+
+
+def write_region(path, seed):
+    rng = np.random.default_rng(seed)
+    scl = rng.choice([4, 5, 8, 9, 3], size=SHAPE).astype(np.uint16)
+    red = rng.integers(300, 600, SHAPE)
+    nir = rng.integers(2500, 3500, SHAPE)
+    if seed >= 3:
+        nir[10:30, 10:50] = 700  # persistent loss
+    data = np.stack([red, nir, scl]).astype(np.uint16)
+    data[:, (scl == 8)] = 0  # Earth Engine writes masked pixels as 0
+
+    profile = {"driver": "GTiff", "width": SHAPE[1], "height": SHAPE[0], "count": 3,
+               "dtype": "uint16", "crs": "EPSG:4326", "transform": GRID}
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(data)
+        dst.descriptions = ("B4", "B8", "SCL")
+
+
+@pytest.fixture
+def split_scenes(tmp_path, monkeypatch):
+    monkeypatch.setattr(download, "RAW_DATA_DIR", tmp_path / "raw")
+
+    x0, y1 = GRID * (5, 5)
+    x1, y0 = GRID * (55, 35)
+    members = gpd.GeoDataFrame(
+        {"mine_id": ["M1"]},
+        geometry=[shapely.Polygon([(x0, y0), (x1, y0), (x1, y1), (x0 + 0.002, y1)])],
+        crs="EPSG:4326",
+    )
+    paths = []
+    for t in range(6):
+        region = tmp_path / f"region_{t}.tif"
+        write_region(region, t)
+        date = f"2022-0{t + 1}-01"
+        paths.append(download.split_region_scene(region, members, date)["M1"])
+    return paths
+
+
+def test_split_region_scene_writes_masks_used_by_local_backend(split_scenes):
+    paths = split_scenes
+    assert all(scene_mask_path(p).exists() for p in paths)
+
+    with_masks = local.mine_change_metrics(paths, min_persistence=2, block_rows=16, block_cols=16)
+    for p in paths:
+        scene_mask_path(p).unlink()
+    from_scl = local.mine_change_metrics(paths, min_persistence=2, block_rows=16, block_cols=16)
+
+    assert with_masks["area_ha"] > 0
+    assert with_masks["area_ha"] == from_scl["area_ha"]
+    assert with_masks["severity"] == pytest.approx(from_scl["severity"], abs=1e-7)
+
+
+def test_local_backend_reads_stored_mask_instead_of_scl(split_scenes):
+    paths = split_scenes
+    for p in paths:
+        with rasterio.open(p) as src:
+            save_scene_mask(p, np.zeros(src.shape, bool))
+
+    metrics = local.mine_change_metrics(paths, min_persistence=2)
+
+    assert metrics["area_ha"] == 0 and metrics["severity"] is None
+
+
+def test_split_region_scene_reprojects_aoi_to_utm_region(tmp_path, monkeypatch):
+    # single-tile Earth Engine downloads come back in the tile's UTM zone
+    monkeypatch.setattr(download, "RAW_DATA_DIR", tmp_path / "raw")
+    x0, y1 = GRID * (5, 5)
+    x1, y0 = GRID * (55, 35)
+    polygon = shapely.Polygon([(x0, y0), (x1, y0), (x1, y1), (x0 + 0.002, y1)])
+    members = gpd.GeoDataFrame({"mine_id": ["BOX", "POLY"]},
+                               geometry=[polygon.envelope, polygon], crs="EPSG:4326")
+    utm = members.to_crs("EPSG:32645")
+
+    left, bottom, right, top = utm.total_bounds
+    width, height = int((right - left) // 10) + 40, int((top - bottom) // 10) + 40
+    profile = {"driver": "GTiff", "width": width, "height": height, "count": 3,
+               "dtype": "uint16", "crs": "EPSG:32645",
+               "transform": from_origin(left - 200, top + 200, 10, 10)}
+    region = tmp_path / "region_utm.tif"
+    with rasterio.open(region, "w", **profile) as dst:
+        dst.write(np.stack([np.full((height, width), v, np.uint16) for v in (400, 3000, 4)]))
+        dst.descriptions = ("B4", "B8", "SCL")
+
+    written = download.split_region_scene(region, members, "2022-01-01")
+
+    for mine_id, geom in zip(utm["mine_id"], utm.geometry):
+        path = written[mine_id]
+        assert path is not None
+        valid = load_scene_mask(path).array()
+        # about one valid 10 m pixel per 100 m² of AOI
+        assert valid.sum() == pytest.approx(geom.area / 100, rel=0.1)
+        with rasterio.open(path) as src:
+            assert src.crs.to_epsg() == 32645
+            assert shapely.box(*src.bounds).buffer(10).contains(geom)
+
+
+def test_download_scenes_redoes_crops_made_for_another_aoi(tmp_path, monkeypatch):
+    monkeypatch.setattr(download, "RAW_DATA_DIR", tmp_path / "raw")
+    monkeypatch.setattr(download, "REGION_DATA_DIR", tmp_path / "regions")
+    monkeypatch.setattr(download, "update_cube", lambda *args, **kwargs: None)
+    monkeypatch.setattr(download, "scene_image", lambda ids, prepare: fake_ee.Image({}))
+    monkeypatch.setattr(download, "fetch_scene_metadata_many", lambda collections: pd.DataFrame(
+        [{"mine_id": region_id, "date": "2022-01-01", "image_id": "S2_A"}
+         for region_id in collections]
+    ))
+    fake_ee.reset()
+    fake_ee.COLLECTIONS["COPERNICUS/S2_SR_HARMONIZED"] = []
+
+    downloads = []
+
+    class Engine:
+        def __init__(self, **kwargs):
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            pass
+
+        def run(self, jobs):
+            for _, path in jobs:
+                downloads.append(path)
+                write_region(path, 0)
+                yield {"path": path, "status": "downloaded"}
+
+    monkeypatch.setattr(download, "DownloadEngine", Engine)
+
+    x0, y1 = GRID * (5, 5)
+    x1, y0 = GRID * (55, 35)
+    polygon = shapely.Polygon([(x0, y0), (x1, y0), (x1, y1), (x0 + 0.002, y1)])
+
+    def aois(geom):
+        return gpd.GeoDataFrame({"mine_id": ["M1"]}, geometry=[geom], crs="EPSG:4326")
+
+    def valid_pixels():
+        return int(load_scene_mask(tmp_path / "raw" / "M1" / "2022-01-01.tif").array().sum())
+
+    catalog = ArtifactCatalog(tmp_path / "catalog.sqlite")
+    scene = tmp_path / "raw" / "M1" / "2022-01-01.tif"
+
+    # a crop from before the catalog existed is adopted, not downloaded
+    write_region(tmp_path / "legacy.tif", 0)
+    download.split_region_scene(tmp_path / "legacy.tif", aois(polygon), "2022-01-01")
+    download.download_scenes(aois(polygon), catalog=catalog)
+    assert downloads == []
+    polygon_pixels = valid_pixels()
+
+    # a new AOI for the mine re-crops it from a fresh region download
+    download.download_scenes(aois(polygon.envelope), catalog=catalog)
+    assert len(downloads) == 1 and scene.exists()
+    assert valid_pixels() > polygon_pixels
+
+    # ... once; after that it is catalogued under the new AOI
+    download.download_scenes(aois(polygon.envelope), catalog=catalog)
+    assert len(downloads) == 1
+
+    # back to the polygon: its catalog rows went with the replaced crop
+    download.download_scenes(aois(polygon), catalog=catalog)
+    assert len(downloads) == 2 and valid_pixels() == polygon_pixels
+    catalog.close()
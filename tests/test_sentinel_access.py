@@ -0,0 +1,54 @@
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from src.ingestion.sentinel_access import (
+    buffer_mines_simplified, prepare_mine_aois, simplify_to_budget
+)
+
+
+def jagged_mine(lon, lat, radius_deg, n=400, seed=0):
+    """
+    Star-shaped polygon with `n` vertices and deep notches.
+    """
+    rng = np.random.default_rng(seed)
+    angles = np.linspace(0, 2 * np.pi, n, endpoint=False)
+    r = radius_deg * rng.uniform(0.3, 1.0, n)
+    return shapely.Polygon(np.c_[lon + r * np.cos(angles), lat + r * np.sin(angles)])
+
+
+def mines():
+    return gpd.GeoDataFrame(
+        {"mine_id": ["BIG", "SMALL"]},
+        geometry=[jagged_mine(85.0, 23.0, 0.05), jagged_mine(85.3, 23.1, 0.002, seed=1)],
+        crs="EPSG:4326",
+    )
+
+
+def test_tolerance_stops_at_max_tolerance():
+    geom = shapely.buffer(shapely.Point(0, 0), 10_000, quad_segs=256)
+    out, tolerance = simplify_to_budget([geom], max_vertices=4, max_tolerance=40)
+    assert tolerance[0] == 40
+    assert shapely.get_num_coordinates(out[0]) > 4  # over budget, not over-simplified
+
+
+def test_polygon_aois_cover_their_mine_within_budget():
+    gdf = mines()
+    for buffer_m in (20, 500):
+        aois, tolerance = buffer_mines_simplified(gdf, buffer_m=buffer_m, max_vertices=16)
+
+        assert (tolerance <= buffer_m / 2).all()
+        assert (shapely.get_num_coordinates(aois.values) <= 16).all()
+        assert shapely.covers(aois.values, gdf.geometry.values).all()
+
+
+def test_uncoverable_mine_falls_back_to_its_bbox(tmp_path):
+    gdf = mines()
+    polygons = prepare_mine_aois(gdf, buffer_m=20, mode="polygon", max_vertices=16,
+                                 cache_dir=tmp_path)
+    bboxes = prepare_mine_aois(gdf, buffer_m=20, mode="bbox", cache_dir=tmp_path)
+
+    # 16 vertices cannot trace the big jagged mine within 10 m
+    big = polygons.geometry.iloc[0]
+    assert shapely.get_num_coordinates(big) == 5
+    np.testing.assert_allclose(big.bounds, bboxes.geometry.iloc[0].bounds)
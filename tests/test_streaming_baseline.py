@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from src.processing.streaming_baseline import StreamingBaseline
+
+
+def ndvi_stack(n, shape=(20, 25), seed=0, missing=0.3):
+    rng = np.random.default_rng(seed)
+    stack = rng.uniform(-1, 1, (n,) + shape).astype(np.float32)
+    stack[rng.random(stack.shape) < missing] = np.nan
+    stack[:, 0, 0] = np.nan  # never observed
+    return stack
+
+
+@pytest.mark.filterwarnings("ignore:All-NaN slice")
+@pytest.mark.parametrize("n, bins", [(1, 128), (6, 128), (37, 128), (37, 32), (300, 64)])
+def test_median_within_half_a_bin_of_nanmedian(n, bins):
+    stack = ndvi_stack(n, seed=n)
+
+    baseline = StreamingBaseline(stack.shape[1:], bins=bins)
+    for scene in stack:
+        baseline.update(scene)
+
+    exact = np.nanmedian(stack, axis=0)
+    median = baseline.median()
+
+    np.testing.assert_array_equal(np.isnan(median), np.isnan(exact))
+    assert np.nanmax(np.abs(median - exact)) <= baseline.error_bound + 1e-6
+    assert baseline.error_bound == pytest.approx(1 / bins)
+    assert baseline.error_report(stack)["max_abs_error"] <= baseline.error_bound + 1e-6
+
+
+def test_counts_widen_past_uint8_and_survive_save(tmp_path):
+    # every observation of a pixel in one bin, so a uint8 count would wrap
+    stack = np.full((300, 4, 5), 0.3, dtype=np.float32)
+    stack[::2, 1] = np.nan
+
+    baseline = StreamingBaseline.from_stack(stack)
+    assert baseline.counts.dtype == np.uint16
+
+    baseline.save(tmp_path / "baseline.npz")
+    loaded = StreamingBaseline.load(tmp_path / "baseline.npz")
+
+    assert loaded.n_scenes == 300
+    np.testing.assert_array_equal(loaded.n.reshape(4, 5), (~np.isnan(stack)).sum(axis=0))
+    np.testing.assert_allclose(loaded.median(), 0.3, atol=loaded.error_bound)